@@ -1,584 +1,79 @@
+import asyncio
 import os
-import sqlite3
 import json
 import base64
 import hashlib
-import paramiko
 import threading
-import time
+from mikrotik_cache import result_cache
+from mikrotik_fanout import RouterFanout
+from mikrotik_api import API_PORT, API_SSL_PORT
+from mikrotik_ssh import MikroTikSSH, create_router_client, create_profile_client
+from mikrotik_async import AsyncMikroTikAPI, AsyncRouterClient, AsyncRequestScheduler
+from mikrotik_records import UserTable, UserPager
+import usage_store
+from uma_db import UMA_DB
+from mikrotik_logging import setup_logging, set_debug, debug_enabled, log_buffer
+from mikrotik_timing import timings
+from mikrotik_active import ActiveSessionMonitor
 import toga
 from toga.style import Pack
 from toga.style.pack import COLUMN, ROW, CENTER, LEFT, RIGHT
 
-# Database class for handling SQLite operations
-class UMA_DB:
-    def __init__(self, db_path="uma_database.db"):
-        self.db_path = db_path
-        self.init_db()
-
-    def init_db(self):
-        """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Create main_POS table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS main_POS (
-            m_no INTEGER PRIMARY KEY AUTOINCREMENT,
-            m_name TEXT,
-            mvalue1 TEXT,
-            mvalue2 TEXT,
-            mvalue3 TEXT,
-            mvalue4 TEXT,
-            mvalue5 TEXT,
-            mvalue6 TEXT,
-            mvalue7 TEXT,
-            mvalue8 TEXT
-        )
-        """)
-
-        # Create help_POS table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS help_POS (
-            h_no INTEGER PRIMARY KEY AUTOINCREMENT,
-            h_name TEXT,
-            hvalue1 TEXT,
-            hvalue2 TEXT,
-            hvalue3 TEXT,
-            hvalue4 TEXT,
-            hvalue5 TEXT,
-            hvalue6 TEXT,
-            hvalue7 TEXT,
-            hvalue8 TEXT
-        )
-        """)
-
-        # Create print_POS table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS print_POS (
-            p_no INTEGER PRIMARY KEY AUTOINCREMENT,
-            p_accounte TEXT,
-            p_days TEXT,
-            p_houer TEXT,
-            p_price TEXT,
-            p_defuser TEXT,
-            p_profile TEXT,
-            p_printin TEXT
-        )
-        """)
-
-        # Create ready_code_POS table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS ready_code_POS (
-            r_no INTEGER PRIMARY KEY AUTOINCREMENT,
-            r_code TEXT,
-            r_comdate TEXT,
-            r_getdate TEXT,
-            r_status TEXT,
-            r_buttom TEXT
-        )
-        """)
-
-        conn.commit()
-        conn.close()
-
-    def get_help_value(self, h_no, h_value):
-        """Get help value from database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        column_map = {
-            1: "hvalue1",
-            2: "hvalue2",
-            3: "hvalue3",
-            4: "hvalue4",
-            5: "hvalue5",
-            6: "hvalue6",
-            7: "hvalue7",
-            8: "hvalue8"
-        }
-
-        column = column_map.get(h_value, "hvalue1")
-
-        cursor.execute(f"SELECT {column} FROM help_POS WHERE h_no = ?", (h_no,))
-        result = cursor.fetchone()
-
-        conn.close()
-
-        if result:
-            return result[0]
-        return ""
-
-    def get_help_value_main(self, m_no, m_value):
-        """Get main value from database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        column_map = {
-            1: "mvalue1",
-            2: "mvalue2",
-            3: "mvalue3",
-            4: "mvalue4",
-            5: "mvalue5",
-            6: "mvalue6",
-            7: "mvalue7",
-            8: "mvalue8"
-        }
-
-        column = column_map.get(m_value, "mvalue1")
-
-        cursor.execute(f"SELECT {column} FROM main_POS WHERE m_no = ?", (m_no,))
-        result = cursor.fetchone()
-
-        conn.close()
-
-        if result:
-            return result[0]
-        return ""
-
-    def save_main_settings(self, ip, username, password, connection_type, port=22):
-        """Save main settings to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Check if record exists
-        cursor.execute("SELECT * FROM main_POS WHERE m_no = 1")
-        exists = cursor.fetchone()
-
-        if exists:
-            # Update existing record
-            cursor.execute("""
-            UPDATE main_POS SET
-                mvalue1 = ?, mvalue2 = ?, mvalue3 = ?, mvalue4 = ?, mvalue5 = ?
-            WHERE m_no = 1
-            """, (ip, username, password, connection_type, str(port)))
-        else:
-            # Insert new record
-            cursor.execute("""
-            INSERT INTO main_POS (m_name, mvalue1, mvalue2, mvalue3, mvalue4, mvalue5)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """, ("settings", ip, username, password, connection_type, str(port)))
-
-        conn.commit()
-        conn.close()
-
-    def get_main_settings(self):
-        """Get main settings from database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT mvalue1, mvalue2, mvalue3, mvalue4, mvalue5 FROM main_POS WHERE m_no = 1")
-        result = cursor.fetchone()
-
-        conn.close()
-
-        if result:
-            return {
-                "ip": result[0],
-                "username": result[1],
-                "password": result[2],
-                "connection_type": result[3],
-                "port": int(result[4]) if result[4] else 22
-            }
-        return {
-            "ip": "",
-            "username": "",
-            "password": "",
-            "connection_type": "ssh",
-            "port": 22
-        }
-
-# MikroTik SSH handler
-class MikroTikSSH:
-    def __init__(self, host, username, password, port=22):
-        self.host = host
-        self.username = username
-        self.password = password
-        self.port = port
-        self.timeout = 30
-        self.ssh = None
-
-    def connect(self):
-        """Connect to MikroTik device via SSH"""
-        try:
-            self.ssh = paramiko.SSHClient()
-            self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self.ssh.connect(self.host, port=self.port, username=self.username, password=self.password, timeout=self.timeout)
-            return True
-        except Exception as e:
-            print(f"Connection error: {str(e)}")
-            return False
-
-    def disconnect(self):
-        """Disconnect from MikroTik device"""
-        if self.ssh:
-            self.ssh.close()
-            self.ssh = None
-
-    def execute_command(self, command):
-        """Execute command on MikroTik device"""
-        print(f"Executing command: {command}")
-        if not self.ssh:
-            print("No SSH connection, attempting to connect...")
-            if not self.connect():
-                print("Failed to connect via SSH")
-                return None
-            print("SSH connection established")
-
-        try:
-            stdin, stdout, stderr = self.ssh.exec_command(command)
-            # Set a timeout for reading output
-            stdout.channel.settimeout(10)  # 10 seconds timeout
-            output = stdout.read().decode('utf-8')
-            error = stderr.read().decode('utf-8')
-
-            print(f"Command output: {output[:200]}...")  # Print first 200 chars
-            if error:
-                print(f"Command error: {error}")
-                return None
-
-            return output
-        except Exception as e:
-            print(f"Command execution error: {str(e)}")
-            # Check if it's a timeout error
-            if "timed out" in str(e).lower():
-                print("Command execution timed out")
-                # Try to close the connection and reconnect
-                try:
-                    self.disconnect()
-                    self.connect()
-                except:
-                    pass
-            return None
-
-    def get_hotspot_users(self):
-        """Get hotspot users from MikroTik device"""
-        output = self.execute_command("/ip hotspot user print")
-        if not output:
-            return []
-
-        print(f"Raw output: {output[:500]}...")  # Print first 500 chars for debugging
-
-        users = []
-        lines = output.strip().split('\n')
-        # Find the header line to determine column positions
-        header_line = None
-        for line in lines:
-            if "NAME" in line and "PROFILE" in line:
-                header_line = line
-                break
-
-        if not header_line:
-            print("Could not find header line in output")
-            return users
-
-        # Extract column positions
-        name_pos = header_line.find("NAME")
-        address_pos = header_line.find("ADDRESS")
-        profile_pos = header_line.find("PROFILE")
-        uptime_pos = header_line.find("UPTIME")
-
-        print(f"Column positions: name={name_pos}, address={address_pos}, profile={profile_pos}, uptime={uptime_pos}")
-
-        # Process data lines
-        for line in lines:
-            print(f"Processing line: {line}")
-            # Skip header, separator, and comment lines
-            if line.startswith("Flags") or line.startswith("---") or line.startswith("#") or not line.strip() or "NAME" in line and "PROFILE" in line:
-                print(f"Skipping header/comment line")
-                continue
-
-            # Check if this is a data line (has enough length)
-            if len(line) > name_pos:
-                try:
-                    # Extract name
-                    name = ""
-                    if address_pos > name_pos:
-                        name = line[name_pos:address_pos].strip()
-
-                    # Extract profile
-                    profile = ""
-                    if uptime_pos > profile_pos and len(line) > profile_pos:
-                        profile = line[profile_pos:uptime_pos].strip()
-
-                    # Extract uptime
-                    uptime = ""
-                    if len(line) > uptime_pos:
-                        uptime = line[uptime_pos:].strip()
-
-                    if name:  # Only add if we have a name
-                        user = {
-                            "name": name,
-                            "password": "",  # Password is not shown in print output
-                            "profile": profile,
-                            "uptime": uptime
-                        }
-                        print(f"Adding user to list: {user}")
-                        users.append(user)
-                    else:
-                        print(f"Skipping user with no name")
-                except Exception as e:
-                    print(f"Error processing line: {line}. Error: {str(e)}")
-
-        print(f"Returning {len(users)} users")
-        return users
-
-    def get_hotspot_users_filtered(self, search_term):
-        """Get filtered hotspot users from MikroTik device"""
-        # Use server-side filtering with where clause
-        output = self.execute_command(f'/ip hotspot user print where name="{search_term}"')
-        if not output:
-            return []
-
-        print(f"Raw filtered output: {output[:500]}...")  # Print first 500 chars for debugging
-
-        users = []
-        lines = output.strip().split('\n')
-
-        # Find the header line to determine column positions
-        header_line = None
-        for line in lines:
-            if "NAME" in line and "PROFILE" in line:
-                header_line = line
-                break
-
-        if not header_line:
-            print("Could not find header line in output")
-            return users
-
-        # Extract column positions
-        name_pos = header_line.find("NAME")
-        address_pos = header_line.find("ADDRESS")
-        profile_pos = header_line.find("PROFILE")
-        uptime_pos = header_line.find("UPTIME")
-
-        print(f"Column positions: name={name_pos}, address={address_pos}, profile={profile_pos}, uptime={uptime_pos}")
-
-        # Process data lines
-        for line in lines:
-            print(f"Processing line: {line}")
-            # Skip header, separator, and comment lines
-            if line.startswith("Flags") or line.startswith("---") or line.startswith("#") or not line.strip() or "NAME" in line and "PROFILE" in line:
-                print(f"Skipping header/comment line")
-                continue
-
-            # Check if this is a data line (has enough length)
-            if len(line) > name_pos:
-                try:
-                    # Extract name
-                    name = ""
-                    if address_pos > name_pos:
-                        name = line[name_pos:address_pos].strip()
-
-                    # Extract profile
-                    profile = ""
-                    if uptime_pos > profile_pos and len(line) > profile_pos:
-                        profile = line[profile_pos:uptime_pos].strip()
-
-                    # Extract uptime
-                    uptime = ""
-                    if len(line) > uptime_pos:
-                        uptime = line[uptime_pos:].strip()
-
-                    if name:  # Only add if we have a name
-                        user = {
-                            "name": name,
-                            "password": "",  # Password is not shown in print output
-                            "profile": profile,
-                            "uptime": uptime
-                        }
-                        print(f"Adding user to list: {user}")
-                        users.append(user)
-                    else:
-                        print(f"Skipping user with no name")
-                except Exception as e:
-                    print(f"Error processing line: {line}. Error: {str(e)}")
-            else:
-                print(f"Line too short: {line}")
-
-        print(f"Returning {len(users)} users")
-        return users
-
-    def get_user_manager_users(self):
-        """Get user manager users from MikroTik device with complete details"""
-        output = self.execute_command("/tool user-manager user print")
-        if not output:
-            return []
-
-        users = []
-        lines = output.strip().split('\n')
-
-        # Process output lines in table format
-        print("Processing output in table format")
-
-        # Skip header lines
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            print(f"Processing line: {line}")
-
-            # Skip header and separator lines
-            if line.startswith("Flags") or line.startswith("---") or line.startswith("#") or not line.strip():
-                print(f"Skipping header/comment line")
-                i += 1
-                continue
-
-            # Parse the line to extract user information
-            user = {
-                "name": "",
-                "password": "",
-                "group": "",
-                "uptime": "",
-                "upload": "",
-                "download": "",
-                "transfer": "",
-                "profile": "",
-                "last_seen": "",
-                "disabled": "false"
-            }
-
-            # Check if this line contains user information
-            if "username=" in line:
-                # Extract username
-                parts = line.split()
-                for part in parts:
-                    if "=" in part:
-                        key, value = part.split("=", 1)
-                        if key == "username":
-                            user["name"] = value.strip('"')
-                        elif key == "customer":
-                            user["group"] = value.strip('"')
-                        elif key == "password":
-                            user["password"] = value.strip('"')
-                        elif key == "uptime-used":
-                            user["uptime"] = value.strip('"')
-                        elif key == "upload-used":
-                            user["upload"] = value.strip('"')
-                        elif key == "download-used":
-                            user["download"] = value.strip('"')
-                        elif key == "actual-profile":
-                            user["profile"] = value.strip('"')
-                        elif key == "last-seen":
-                            user["last_seen"] = value.strip('"')
-
-                # Calculate transfer total
-                if user["upload"] and user["download"]:
-                    try:
-                        upload_mb = int(user["upload"]) / (1024 * 1024)
-                        download_mb = int(user["download"]) / (1024 * 1024)
-                        user["transfer"] = f"{upload_mb + download_mb:.2f} ميجا"
-                    except:
-                        user["transfer"] = ""
-
-                # Only add if we have at least a name
-                if user["name"]:
-                    print(f"Adding user to list: {user}")
-                    users.append(user)
-                else:
-                    print(f"Skipping user with no name: {user}")
-
-            i += 1
-
-        print(f"Returning {len(users)} users")
-        return users
-
-    def get_user_manager_users_filtered(self, search_term):
-        """Get filtered user manager users from MikroTik device"""
-        print(f"Searching for user manager users with term: {search_term}")
-
-        # Use server-side filtering with where clause
-        script = f'/tool user-manager user print where username~"{search_term}"'
-        print(f"Script to execute: {script}")
-
-        output = self.execute_command(script)
-        if not output:
-            print("No output received from command")
-            return []
-
-        print(f"Raw filtered output: {output[:500]}...")  # Print first 500 chars for debugging
-
-        users = []
-        lines = output.strip().split('\n')
-        print(f"Number of lines in output: {len(lines)}")
-
-        # Process output lines in table format
-        print("Processing output in table format")
-
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            print(f"Processing line: {line}")
-
-            # Skip header and separator lines
-            if line.startswith("Flags") or line.startswith("---") or line.startswith("#") or not line.strip():
-                print(f"Skipping header/comment line")
-                i += 1
-                continue
-
-            # Parse the line to extract user information
-            user = {
-                "name": "",
-                "password": "",
-                "group": "",
-                "uptime": "",
-                "upload": "",
-                "download": "",
-                "transfer": "",
-                "profile": "",
-                "last_seen": "",
-                "disabled": "false"
-            }
-
-            # Check if this line contains user information
-            if "username=" in line:
-                # Extract username
-                parts = line.split()
-                for part in parts:
-                    if "=" in part:
-                        key, value = part.split("=", 1)
-                        if key == "username":
-                            user["name"] = value.strip('"')
-                        elif key == "customer":
-                            user["group"] = value.strip('"')
-                        elif key == "password":
-                            user["password"] = value.strip('"')
-                        elif key == "uptime-used":
-                            user["uptime"] = value.strip('"')
-                        elif key == "upload-used":
-                            user["upload"] = value.strip('"')
-                        elif key == "download-used":
-                            user["download"] = value.strip('"')
-                        elif key == "actual-profile":
-                            user["profile"] = value.strip('"')
-                        elif key == "last-seen":
-                            user["last_seen"] = value.strip('"')
-
-                # Calculate transfer total
-                if user["upload"] and user["download"]:
-                    try:
-                        upload_mb = int(user["upload"]) / (1024 * 1024)
-                        download_mb = int(user["download"]) / (1024 * 1024)
-                        user["transfer"] = f"{upload_mb + download_mb:.2f} ميجا"
-                    except:
-                        user["transfer"] = ""
-
-                # Only add if we have at least a name
-                if user["name"]:
-                    print(f"Adding user to list: {user}")
-                    users.append(user)
-                else:
-                    print(f"Skipping user with no name: {user}")
-
-            i += 1
-
-        print(f"Returning {len(users)} users")
-        return users
+# The Toga app searches User Manager names by partial match, like its API transport
+USER_MANAGER_MATCH = "~"
+
+def create_toga_profile_client(profile):
+    """Create the client for a saved router profile with the Toga app's match mode"""
+    return create_profile_client(profile, USER_MANAGER_MATCH)
+
+def create_async_router_client(host, username, password, port=22, connection_type="ssh"):
+    """Create an awaitable client for the Toga event loop (native asyncio for the API)"""
+    if connection_type in ("api", "api-ssl") or port in (API_PORT, API_SSL_PORT):
+        use_ssl = connection_type == "api-ssl" or port == API_SSL_PORT
+        return AsyncMikroTikAPI(host, username, password, port, use_ssl=use_ssl)
+    return AsyncRouterClient(lambda: MikroTikSSH(host, username, password, port, USER_MANAGER_MATCH))
+
+# Result table columns per search type: (heading, UserTable field)
+RESULT_COLUMNS = {
+    "hotspot": (
+        ("الاسم", "name"),
+        ("الملف الشخصي", "profile"),
+        ("مدة التشغيل", "uptime"),
+        ("التحميل", "bytes_out"),
+        ("الرفع", "bytes_in")
+    ),
+    "userman": (
+        ("الاسم", "name"),
+        ("المجموعة", "group"),
+        ("الملف الشخصي", "profile"),
+        ("مدة التشغيل", "uptime"),
+        ("التحميل", "download"),
+        ("الرفع", "upload"),
+        ("آخر ظهور", "last_seen")
+    )
+}
 
 # Main application window
 class UMAMobileApp(toga.App):
     def startup(self):
+        # Log to the console and the debug tab; debug messages stay off until enabled there
+        setup_logging()
         self.db = UMA_DB()
         self.api = None
+        self.connection = None
+        # Search waiting for the router, cancelled when a new one starts
+        self.search_task = None
+        # Live searches per router: coalesced, cancellable and rate limited
+        self.scheduler = AsyncRequestScheduler()
+        # Worker pool for searching all saved routers at once
+        self.fanout = RouterFanout()
+        # Set to stop the running search of all routers
+        self.fanout_cancelled = None
+        # Poller of the online users tab while it is watching, and its table rows by session id
+        self.active_monitor = None
+        # Samples the users' byte counters of the connected router every 15 minutes
+        self.usage_sampler = None
+        self.active_rows = {}
 
         # Create a main window with a name
         self.main_window = toga.MainWindow(title=self.name)
@@ -589,17 +84,26 @@ class UMAMobileApp(toga.App):
         # Create tabs
         self.connection_tab = toga.Box(style=Pack(direction=COLUMN, padding=10))
         self.search_tab = toga.Box(style=Pack(direction=COLUMN, padding=10))
+        self.active_tab = toga.Box(style=Pack(direction=COLUMN, padding=10))
         self.settings_tab = toga.Box(style=Pack(direction=COLUMN, padding=10))
+        self.debug_tab = toga.Box(style=Pack(direction=COLUMN, padding=10))
+        self.performance_tab = toga.Box(style=Pack(direction=COLUMN, padding=10))
 
         # Add tabs to tab group
         self.tab_group.add("الاتصال", self.connection_tab)
         self.tab_group.add("البحث", self.search_tab)
+        self.tab_group.add("المتصلون", self.active_tab)
         self.tab_group.add("الإعدادات", self.settings_tab)
+        self.tab_group.add("التشخيص", self.debug_tab)
+        self.tab_group.add("الأداء", self.performance_tab)
 
         # Initialize tabs
         self.init_connection_tab()
         self.init_search_tab()
+        self.init_active_tab()
         self.init_settings_tab()
+        self.init_debug_tab()
+        self.init_performance_tab()
 
         # Add tab group to main window
         self.main_window.content = self.tab_group
@@ -655,6 +159,14 @@ class UMAMobileApp(toga.App):
         )
         connection_box.add(self.connect_button)
 
+        # Add router button (used by the all-routers search)
+        self.add_router_button = toga.Button(
+            "إضافة إلى قائمة الأجهزة",
+            on_press=self.add_router_profile,
+            style=Pack(padding=10)
+        )
+        connection_box.add(self.add_router_button)
+
         # Status label
         self.status_label = toga.Label(
             "الحالة: غير متصل",
@@ -667,7 +179,7 @@ class UMAMobileApp(toga.App):
     def init_search_tab(self):
         """Initialize search tab"""
         # Search form
-        search_box = toga.Box(style=Pack(direction=COLUMN, padding=10))
+        search_box = toga.Box(style=Pack(direction=COLUMN, padding=10, flex=1))
 
         # Search type
         type_box = toga.Box(style=Pack(direction=ROW, padding=5))
@@ -684,7 +196,7 @@ class UMAMobileApp(toga.App):
         # Search term
         search_term_box = toga.Box(style=Pack(direction=ROW, padding=5))
         search_term_label = toga.Label("اسم المستخدم:", style=Pack(text_align=RIGHT, width=100))
-        self.search_term_input = toga.TextInput(style=Pack(flex=1))
+        self.search_term_input = toga.TextInput(on_change=self.cancel_search, style=Pack(flex=1))
         search_term_box.add(search_term_label)
         search_term_box.add(self.search_term_input)
         search_box.add(search_term_box)
@@ -697,6 +209,22 @@ class UMAMobileApp(toga.App):
         )
         search_box.add(self.search_button)
 
+        # Search all routers button
+        self.search_all_button = toga.Button(
+            "بحث في كل الأجهزة",
+            on_press=self.search_all_routers,
+            style=Pack(padding=10)
+        )
+        search_box.add(self.search_all_button)
+
+        # Top consumers button
+        self.top_consumers_button = toga.Button(
+            "الأكثر استهلاكاً (30 يوم)",
+            on_press=self.show_top_consumers,
+            style=Pack(padding=10)
+        )
+        search_box.add(self.top_consumers_button)
+
         # Info text
         info_text = """تعليمات الاستخدام:
 - اترك حقل البحث فارغاً لعرض جميع المستخدمين
@@ -710,8 +238,120 @@ class UMAMobileApp(toga.App):
         )
         search_box.add(info_label)
 
+        # Results: one page of a table at a time
+        self.pager = None
+        self.result_fields = [field for _, field in RESULT_COLUMNS["hotspot"]]
+        self.sort_fields = {heading: field for heading, field in RESULT_COLUMNS["hotspot"]}
+        self.sort_reverse = False
+        self.results_status = toga.Label("", style=Pack(text_align=RIGHT, padding=5))
+        search_box.add(self.results_status)
+
+        # Background job progress and cancel
+        progress_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        self.search_progress = toga.ProgressBar(max=None, style=Pack(flex=1))
+        cancel_button = toga.Button("إلغاء", on_press=self.cancel_jobs, style=Pack(padding_left=5))
+        progress_box.add(self.search_progress)
+        progress_box.add(cancel_button)
+        search_box.add(progress_box)
+
+        sort_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        sort_label = toga.Label("ترتيب حسب:", style=Pack(text_align=RIGHT, width=100))
+        self.sort_selection = toga.Selection(items=[heading for heading, _ in RESULT_COLUMNS["hotspot"]],
+                                             on_change=self.sort_results, style=Pack(flex=1))
+        reverse_button = toga.Button("عكس", on_press=self.reverse_sort, style=Pack(padding_left=5))
+        sort_box.add(sort_label)
+        sort_box.add(self.sort_selection)
+        sort_box.add(reverse_button)
+        search_box.add(sort_box)
+
+        self.results_box = toga.Box(style=Pack(direction=COLUMN, flex=1))
+        self.results_table = toga.Table(
+            headings=[heading for heading, _ in RESULT_COLUMNS["hotspot"]],
+            accessors=[field for _, field in RESULT_COLUMNS["hotspot"]],
+            style=Pack(flex=1)
+        )
+        self.results_box.add(self.results_table)
+        search_box.add(self.results_box)
+
+        page_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        previous_button = toga.Button("السابق", on_press=self.previous_page, style=Pack(flex=1))
+        self.page_label = toga.Label("", style=Pack(text_align=CENTER, flex=1))
+        next_button = toga.Button("التالي", on_press=self.next_page, style=Pack(flex=1))
+        page_box.add(previous_button)
+        page_box.add(self.page_label)
+        page_box.add(next_button)
+        search_box.add(page_box)
+
         self.search_tab.add(search_box)
 
+    def init_active_tab(self):
+        """Initialize online users tab"""
+        active_box = toga.Box(style=Pack(direction=COLUMN, padding=10, flex=1))
+
+        # Start/stop watching and the number of sessions
+        controls_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        self.active_button = toga.Button("بدء المراقبة", on_press=self.toggle_active_monitor, style=Pack(flex=1))
+        self.active_label = toga.Label("", style=Pack(text_align=CENTER, flex=1))
+        controls_box.add(self.active_button)
+        controls_box.add(self.active_label)
+        active_box.add(controls_box)
+
+        # Sessions table, updated row by row on every poll
+        self.active_table = toga.Table(
+            headings=["المستخدم", "العنوان", "MAC", "مدة الاتصال", "التحميل", "الرفع"],
+            accessors=["user", "address", "mac_address", "uptime", "bytes_out", "bytes_in"],
+            style=Pack(flex=1)
+        )
+        active_box.add(self.active_table)
+
+        self.active_tab.add(active_box)
+
+    async def toggle_active_monitor(self, widget):
+        """Start or stop watching the active hotspot sessions"""
+        if self.active_monitor:
+            self.active_monitor.stop()
+            self.active_monitor = None
+            self.active_button.text = "بدء المراقبة"
+            return
+        if not self.connection:
+            self.main_window.error_dialog(
+                "خطأ",
+                "الرجاء الاتصال بالجهاز أولاً"
+            )
+            return
+
+        # The monitor polls on its own thread; changes are handed back to the event loop
+        loop = asyncio.get_running_loop()
+        self.active_table.data = []
+        self.active_rows = {}
+        monitor = None
+
+        def on_change(added, removed, changed, updated):
+            loop.call_soon_threadsafe(self.apply_active_changes, monitor, added, removed, changed + updated)
+
+        monitor = self.active_monitor = ActiveSessionMonitor(create_router_client(*self.connection), on_change)
+        monitor.start()
+        self.active_button.text = "إيقاف المراقبة"
+
+    def apply_active_changes(self, monitor, added, removed, changed):
+        """Apply one poll's differences to the sessions table without rebuilding it"""
+        if self.active_monitor is not monitor:
+            return
+        with timings.span("render.active"):
+            for key in removed:
+                row = self.active_rows.pop(key, None)
+                if row is not None:
+                    self.active_table.data.remove(row)
+            for session in changed:
+                row = self.active_rows.get(session["id"])
+                if row is not None:
+                    for field, value in session.items():
+                        if getattr(row, field, None) != value:
+                            setattr(row, field, value)
+            for session in added:
+                self.active_rows[session["id"]] = self.active_table.data.append(session)
+        self.active_label.text = f"{len(self.active_rows)} متصل"
+
     def init_settings_tab(self):
         """Initialize settings tab"""
         # Settings form
@@ -746,6 +386,119 @@ class UMAMobileApp(toga.App):
 
         self.settings_tab.add(settings_box)
 
+    def init_debug_tab(self):
+        """Initialize debug tab"""
+        debug_box = toga.Box(style=Pack(direction=COLUMN, padding=10, flex=1))
+
+        # Cache counters
+        self.cache_stats_label = toga.Label(
+            result_cache.summary(),
+            style=Pack(padding=10)
+        )
+        debug_box.add(self.cache_stats_label)
+
+        # Refresh button
+        refresh_button = toga.Button(
+            "تحديث",
+            on_press=self.refresh_debug,
+            style=Pack(padding=10)
+        )
+        debug_box.add(refresh_button)
+
+        # Clear cache button
+        clear_button = toga.Button(
+            "مسح الذاكرة المؤقتة",
+            on_press=self.clear_result_cache,
+            style=Pack(padding=10)
+        )
+        debug_box.add(clear_button)
+
+        # Debug messages are off by default: formatting them costs time on large listings
+        self.debug_log_switch = toga.Switch(
+            "سجل التصحيح",
+            value=debug_enabled(),
+            on_change=self.toggle_debug_log,
+            style=Pack(padding=10)
+        )
+        debug_box.add(self.debug_log_switch)
+
+        # Clear log button
+        clear_log_button = toga.Button(
+            "مسح السجل",
+            on_press=self.clear_log,
+            style=Pack(padding=10)
+        )
+        debug_box.add(clear_log_button)
+
+        # Latest log lines
+        self.log_view = toga.MultilineTextInput(
+            value=log_buffer.text(),
+            readonly=True,
+            style=Pack(flex=1, padding=10)
+        )
+        debug_box.add(self.log_view)
+
+        self.debug_tab.add(debug_box)
+
+    def refresh_debug(self, widget=None):
+        """Show the latest cache counters and log lines"""
+        self.cache_stats_label.text = result_cache.summary()
+        self.log_view.value = log_buffer.text()
+
+    def clear_result_cache(self, widget):
+        """Drop every cached router result"""
+        result_cache.invalidate()
+        self.refresh_debug()
+
+    def toggle_debug_log(self, widget):
+        """Turn debug messages on or off"""
+        set_debug(widget.value)
+
+    def clear_log(self, widget):
+        """Forget the buffered log lines"""
+        log_buffer.clear()
+        self.refresh_debug()
+
+    def init_performance_tab(self):
+        """Initialize performance tab"""
+        performance_box = toga.Box(style=Pack(direction=COLUMN, padding=10, flex=1))
+
+        # p50/p95 per router and stage
+        self.timings_view = toga.MultilineTextInput(
+            value=timings.summary(),
+            readonly=True,
+            style=Pack(flex=1, padding=10)
+        )
+        performance_box.add(self.timings_view)
+
+        # Refresh, export and reset buttons
+        buttons_box = toga.Box(style=Pack(direction=ROW, padding=5))
+        buttons_box.add(toga.Button("تحديث", on_press=self.refresh_timings, style=Pack(flex=1, padding=5)))
+        buttons_box.add(toga.Button("تصدير JSON", on_press=self.export_timings, style=Pack(flex=1, padding=5)))
+        buttons_box.add(toga.Button("إعادة تعيين", on_press=self.reset_timings, style=Pack(flex=1, padding=5)))
+        performance_box.add(buttons_box)
+
+        self.performance_tab.add(performance_box)
+
+    def refresh_timings(self, widget=None):
+        """Show the latest timing statistics"""
+        self.timings_view.value = timings.summary()
+
+    def export_timings(self, widget):
+        """Save the timing statistics next to the database so they can be attached to a ticket"""
+        path = os.path.join(os.path.dirname(os.path.abspath(self.db.db_path)), "uma_timings.json")
+        try:
+            timings.export_json(path)
+        except OSError as e:
+            self.main_window.error_dialog("خطأ", f"فشل التصدير: {str(e)}")
+            return
+        self.main_window.info_dialog("تصدير", path)
+
+    def reset_timings(self, widget):
+        """Start measuring from scratch"""
+        timings.reset()
+        self.refresh_timings()
+
     def load_settings(self):
         """Load settings from database"""
         settings = self.db.get_main_settings()
@@ -772,7 +525,31 @@ class UMAMobileApp(toga.App):
             "تم حفظ الإعدادات بنجاح"
         )
 
-    def connect_to_device(self, widget):
+    def add_router_profile(self, widget):
+        """Save the entered router to the list searched by 'all routers'"""
+        ip = self.ip_input.value
+        username = self.username_input.value
+        password = self.password_input.value
+
+        if not ip or not username or not password:
+            self.main_window.error_dialog(
+                "خطأ",
+                "الرجاء إدخال جميع بيانات الاتصال"
+            )
+            return
+
+        try:
+            port = int(self.port_input.value)
+        except ValueError:
+            port = 22
+
+        self.db.save_router_profile(ip, ip, username, password, "ssh", port)
+        self.main_window.info_dialog(
+            "نجاح",
+            "تمت إضافة الجهاز"
+        )
+
+    async def connect_to_device(self, widget):
         """Connect to MikroTik device"""
         ip = self.ip_input.value
         username = self.username_input.value
@@ -791,30 +568,53 @@ class UMAMobileApp(toga.App):
         except ValueError:
             port = 22
 
-        self.api = MikroTikSSH(ip, username, password, port)
-
-        # Test connection in a separate thread
-        def test_connection():
-            self.status_label.text = "الحالة: جاري الاتصال..."
-            success = self.api.connect()
-
-            # Update UI in main thread
-            if success:
-                self.status_label.text = "الحالة: متصل ✅"
-                self.main_window.info_dialog(
-                    "نجاح",
-                    "تم الاتصال بالجهاز بنجاح"
-                )
-            else:
-                self.status_label.text = "الحالة: فشل الاتصال ❌"
-                self.main_window.error_dialog(
-                    "خطأ",
-                    "فشل الاتصال بالجهاز"
-                )
-
-        threading.Thread(target=test_connection, daemon=True).start()
-
-    def search_users(self, widget):
+        # Hand the previous session back to the pool before switching devices
+        self.cancel_search()
+        if self.usage_sampler:
+            self.usage_sampler.stop()
+            self.usage_sampler = None
+        if self.api:
+            await self.api.disconnect()
+        self.api = create_async_router_client(ip, username, password, port)
+        self.connection = (ip, username, password, port)
+
+        # Handlers run on Toga's event loop, so widgets can be updated directly
+        self.status_label.text = "الحالة: جاري الاتصال..."
+        success = await self.api.connect()
+
+        if success:
+            self.status_label.text = "الحالة: متصل ✅"
+            connection = self.connection
+            self.usage_sampler = usage_store.UsageSampler(self.db.users_sync, lambda: create_router_client(*connection))
+            self.usage_sampler.start()
+            self.main_window.info_dialog(
+                "نجاح",
+                "تم الاتصال بالجهاز بنجاح"
+            )
+        else:
+            self.status_label.text = "الحالة: فشل الاتصال ❌"
+            self.main_window.error_dialog(
+                "خطأ",
+                "فشل الاتصال بالجهاز"
+            )
+
+    def cancel_search(self, widget=None):
+        """Cancel the search still waiting for the router (e.g. the search term changed)"""
+        if self.search_task and not self.search_task.done():
+            self.search_task.cancel()
+        self.search_task = None
+        if self.api:
+            self.scheduler.cancel(self.api.host, "search")
+
+    def cancel_jobs(self, widget):
+        """Stop the running searches and keep the rows already shown"""
+        self.cancel_search()
+        if self.fanout_cancelled:
+            self.fanout_cancelled.set()
+        self.search_progress.stop()
+        self.results_status.text = "تم الإلغاء"
+
+    async def search_users(self, widget):
         """Search for users"""
         if not self.api:
             self.main_window.error_dialog(
@@ -826,23 +626,124 @@ class UMAMobileApp(toga.App):
         search_term = self.search_term_input.value
         search_type = self.search_type.value
 
-        # Search in a separate thread
+        # A newer search replaces the one still in flight; the scheduler keeps an
+        # identical router command running and cancels a different one
+        if self.search_task and not self.search_task.done():
+            self.search_task.cancel()
+        self.search_task = asyncio.ensure_future(self.fetch_users(search_term, search_type))
+        self.search_progress.max = None
+        self.search_progress.start()
+        try:
+            users = await self.search_task
+        except asyncio.CancelledError:
+            return
+        finally:
+            self.search_progress.stop()
+
+        # Refresh the mirror in the background on its own connection
+        sync_client = create_router_client(*self.connection)
+        self.db.sync_users_cache(sync_client, search_type, disconnect=True)
+
+        self.display_search_results(users, search_type)
+
+    async def fetch_users(self, search_term, search_type):
+        """Answer a search from the local mirror, or from the router if it was never synced"""
+        users = self.db.search_users_cache(self.api.host, search_type, search_term, partial=True)
+        if users is not None:
+            return users
+
+        # Identical searches in flight share one router command
+        task = self.scheduler.submit(self.api.host, (search_type, search_term),
+                                     lambda: self.fetch_live_users(search_term, search_type), group="search")
+        return await asyncio.shield(task)
+
+    async def fetch_live_users(self, search_term, search_type):
+        """Fetch users from the router, showing rows in batches as they arrive"""
+        def show_progress(users):
+            self.show_partial_results(users, search_type)
+
+        if search_type == "hotspot":
+            return await self.api.get_hotspot_users_filtered(search_term, show_progress)
+        return await self.api.get_user_manager_users_filtered(search_term, show_progress)
+
+    def show_partial_results(self, users, search_type):
+        """Show the rows of a running search received so far"""
+        self.results_status.text = f"تم استلام {len(users)} مستخدم..."
+        # The pager views the growing table, so later batches only redraw the page
+        if self.pager and self.pager.users is users:
+            self.show_page()
+        else:
+            self.show_results(UserPager(users), RESULT_COLUMNS[search_type])
+
+    def show_top_consumers(self, widget):
+        """Chart the users who used the most bytes over the last 30 days"""
+        if not self.connection:
+            self.main_window.error_dialog(
+                "خطأ",
+                "الرجاء الاتصال بالجهاز أولاً"
+            )
+            return
+        consumers = self.db.top_consumers(self.connection[0], self.search_type.value)
+        self.main_window.info_dialog(
+            "الأكثر استهلاكاً",
+            usage_store.format_top_consumers(consumers)
+        )
+
+    async def search_all_routers(self, widget):
+        """Search every saved router at once"""
+        profiles = self.db.get_router_profiles()
+        if not profiles:
+            self.main_window.error_dialog(
+                "خطأ",
+                "لا توجد أجهزة محفوظة"
+            )
+            return
+
+        search_term = self.search_term_input.value
+        search_type = self.search_type.value
+
+        # The fan-out runs on its worker pool; answers are handed back to the event loop
+        loop = asyncio.get_running_loop()
+        answers = asyncio.Queue()
+        if self.fanout_cancelled:
+            self.fanout_cancelled.set()
+        cancelled = self.fanout_cancelled = threading.Event()
+        self.search_progress.max = len(profiles)
+        self.search_progress.value = 0
+
         def search():
-            if search_type == "hotspot":
-                if search_term:
-                    users = self.api.get_hotspot_users_filtered(search_term)
-                else:
-                    users = self.api.get_hotspot_users()
-            else:
-                if search_term:
-                    users = self.api.get_user_manager_users_filtered(search_term)
-                else:
-                    users = self.api.get_user_manager_users()
-
-            # Display results in main thread
-            self.display_search_results(users, search_type)
-
-        threading.Thread(target=search, daemon=True).start()
+            try:
+                for answer in self.fanout.search(profiles, search_type, search_term or None, create_toga_profile_client, cancelled):
+                    loop.call_soon_threadsafe(answers.put_nowait, answer)
+            finally:
+                loop.call_soon_threadsafe(answers.put_nowait, None)
+
+        loop.run_in_executor(None, search)
+
+        # Merge every router's users into one table with a router column
+        merged = UserTable()
+        routers = []
+        errors = []
+        done = 0
+        self.show_results(UserPager(merged, extra={"router": routers}), (("الجهاز", "router"),) + RESULT_COLUMNS[search_type])
+        while True:
+            answer = await answers.get()
+            if answer is None or cancelled.is_set():
+                break
+            profile, users, error = answer
+            done += 1
+            self.search_progress.value = done
+            for user in users:
+                merged.append(user.values())
+                routers.append(profile["name"])
+            if error:
+                errors.append(f"{profile['name']}: {error}")
+
+            self.status_label.text = f"الحالة: {done}/{len(profiles)} أجهزة"
+            self.results_status.text = f"تم العثور على {len(merged)} مستخدم في {done}/{len(profiles)} أجهزة"
+            if errors:
+                self.results_status.text += "\n" + "\n".join(errors)
+            self.show_page()
 
     def display_search_results(self, users, search_type):
         """Display search results"""
@@ -853,42 +754,68 @@ class UMAMobileApp(toga.App):
             )
             return
 
-        # Create result text
-        result_text = f"تم العثور على {len(users)} مستخدم:\n\n"
-
-        for i, user in enumerate(users, 1):
-            result_text += f"المستخدم {i}:\n"
-
-            if search_type == "hotspot":
-                result_text += f"   الاسم: {user.get('name', '')}\n"
-                result_text += f"   الملف الشخصي: {user.get('profile', '')}\n"
-                if user.get('uptime'):
-                    result_text += f"   مدة التشغيل: {user.get('uptime', '')}\n"
-                if user.get('bytes-out'):
-                    result_text += f"   التحميل: {user.get('bytes-out', '')}\n"
-                if user.get('bytes-in'):
-                    result_text += f"   الرفع: {user.get('bytes-in', '')}\n"
-            else:
-                result_text += f"   الاسم: {user.get('name', '')}\n"
-                if user.get('group'):
-                    result_text += f"   المجموعة: {user.get('group', '')}\n"
-                result_text += f"   الملف الشخصي: {user.get('profile', '')}\n"
-                if user.get('uptime'):
-                    result_text += f"   مدة التشغيل: {user.get('uptime', '')}\n"
-                if user.get('download'):
-                    result_text += f"   التحميل: {user.get('download', '')}\n"
-                if user.get('upload'):
-                    result_text += f"   الرفع: {user.get('upload', '')}\n"
-                if user.get('last-seen'):
-                    result_text += f"   آخر ظهور: {user.get('last-seen', '')}\n"
-
-            result_text += "\n" + "─" * 50 + "\n\n"
-
-        # Show results in dialog
-        self.main_window.info_dialog(
-            "نتائج البحث",
-            result_text
-        )
+        self.results_status.text = f"تم العثور على {len(users)} مستخدم - {usage_store.format_listing_usage(users, search_type)}"
+        # Keep the page the user is on if the rows were already shown while arriving
+        if self.pager and self.pager.users is users:
+            self.show_page()
+        else:
+            self.show_results(UserPager(users), RESULT_COLUMNS[search_type])
+
+    def show_results(self, pager, columns):
+        """Show a result set in a fresh table with the given (heading, field) columns"""
+        # Changing the sort choices fires on_change; nothing to sort until the new pager is set
+        self.pager = None
+        self.sort_selection.items = [heading for heading, _ in columns]
+
+        self.result_fields = [field for _, field in columns]
+        self.sort_fields = {heading: field for heading, field in columns}
+        self.sort_reverse = False
+
+        # Table columns are fixed at creation, so each result set gets its own table
+        with timings.span("render.table"):
+            table = toga.Table(
+                headings=[heading for heading, _ in columns],
+                accessors=self.result_fields,
+                style=Pack(flex=1)
+            )
+            self.results_box.remove(self.results_table)
+            self.results_box.add(table)
+            self.results_table = table
+
+        self.pager = pager
+        self.show_page()
+
+    def show_page(self):
+        """Render only the current page of the result set"""
+        if not self.pager:
+            return
+        with timings.span("render.page"):
+            self.results_table.data = self.pager.page_rows(self.result_fields)
+        self.page_label.text = f"صفحة {self.pager.page + 1} / {self.pager.page_count()}"
+
+    def previous_page(self, widget):
+        """Show the previous page of results"""
+        if self.pager:
+            self.pager.set_page(self.pager.page - 1)
+            self.show_page()
+
+    def next_page(self, widget):
+        """Show the next page of results"""
+        if self.pager:
+            self.pager.set_page(self.pager.page + 1)
+            self.show_page()
+
+    def sort_results(self, widget):
+        """Sort the stored records by the chosen column"""
+        field = self.sort_fields.get(self.sort_selection.value) if self.pager else None
+        if field:
+            self.pager.sort(field, self.sort_reverse)
+            self.show_page()
+
+    def reverse_sort(self, widget):
+        """Flip the sort order"""
+        self.sort_reverse = not self.sort_reverse
+        self.sort_results(widget)
 
 def main():
     return UMAMobileApp("UMA", "com.example.uma")
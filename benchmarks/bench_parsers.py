@@ -0,0 +1,217 @@
+import os
+import re
+import sys
+import time
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mikrotik_parsers import iter_terse_rows, HOTSPOT_USERS_TERSE, USER_MANAGER_USERS_TERSE
+from mikrotik_records import UserTable
+from fixtures import hotspot_print_output, hotspot_terse_output, user_manager_terse_output
+
+# Lines starting with these are never user rows
+SKIP_PREFIXES = ("Flags", "---", "#")
+
+# Describes one RouterOS print table: how to spot its header and which columns to keep
+class TableSpec:
+    def __init__(self, markers, fields, defaults=None, required="name"):
+        self.markers = markers
+        self.fields = fields
+        self.defaults = defaults or {}
+        self.required = required
+
+    def is_header(self, line):
+        """Check if line is the header of this table"""
+        return all(marker in line for marker in self.markers)
+
+# Column layout compiled once from a header line into slice objects
+class TableParser:
+    def __init__(self, header_line, spec):
+        self.header_line = header_line
+        self.defaults = spec.defaults
+
+        # Every column runs up to the start of the next header title
+        columns = [(match.start(), match.group()) for match in re.finditer(r"\S+", header_line)]
+        keys = []
+        slices = []
+        for i, (start, title) in enumerate(columns):
+            key = spec.fields.get(title)
+            if key:
+                end = columns[i + 1][0] if i + 1 < len(columns) else None
+                keys.append(key)
+                slices.append(slice(start, end))
+        self.keys = tuple(keys)
+        self.slices = tuple(slices)
+        self.required_index = self.keys.index(spec.required) if spec.required in self.keys else None
+
+    def parse(self, line):
+        """Parse a data line into a record, or None if the required column is empty"""
+        values = [line[column].strip() for column in self.slices]
+        if self.required_index is not None and not values[self.required_index]:
+            return None
+        record = dict(zip(self.keys, values))
+        if self.defaults:
+            record.update(self.defaults)
+        return record
+
+def iter_table_records(lines, spec):
+    """Find the header on the fly and yield one record per data line"""
+    parser = None
+    for line in lines:
+        if parser is None:
+            if spec.is_header(line):
+                parser = TableParser(line, spec)
+            continue
+
+        # Skip separator, comment and repeated header lines
+        if not line.strip() or line.startswith(SKIP_PREFIXES) or line == parser.header_line:
+            continue
+
+        record = parser.parse(line)
+        if record:
+            yield record
+
+HOTSPOT_USERS_TABLE = TableSpec(
+    ("NAME", "PROFILE"),
+    {"NAME": "name", "PROFILE": "profile", "UPTIME": "uptime"},
+    {"password": ""}  # Password is not shown in print output
+)
+
+def legacy_parse_hotspot(output):
+    """The per-method loop MikroTikSSH.get_hotspot_users used before the compiled parser"""
+    users = []
+    lines = output.strip().split('\n')
+    header_line = None
+    for line in lines:
+        if "NAME" in line and "PROFILE" in line:
+            header_line = line
+            break
+
+    if not header_line:
+        return users
+
+    name_pos = header_line.find("NAME")
+    address_pos = header_line.find("ADDRESS")
+    profile_pos = header_line.find("PROFILE")
+    uptime_pos = header_line.find("UPTIME")
+
+    for line in lines:
+        print(f"Processing line: {line}")
+        if line.startswith("Flags") or line.startswith("---") or line.startswith("#") or not line.strip() or "NAME" in line and "PROFILE" in line:
+            print(f"Skipping header/comment line")
+            continue
+
+        if len(line) > name_pos:
+            name = ""
+            if address_pos > name_pos:
+                name = line[name_pos:address_pos].strip()
+            profile = ""
+            if uptime_pos > profile_pos and len(line) > profile_pos:
+                profile = line[profile_pos:uptime_pos].strip()
+            uptime = ""
+            if len(line) > uptime_pos:
+                uptime = line[uptime_pos:].strip()
+            if name:
+                user = {"name": name, "password": "", "profile": profile, "uptime": uptime}
+                print(f"Adding user to list: {user}")
+                users.append(user)
+    return users
+
+def compiled_parse_hotspot(output):
+    """The compiled column-table parser 'print' listings went through before 'print terse'"""
+    return list(iter_table_records(output.splitlines(), HOTSPOT_USERS_TABLE))
+
+def terse_parse_hotspot(output):
+    """The single-pass key=value tokenizer used for 'print terse' output"""
+    table = UserTable()
+    for _ in iter_terse_rows(output.splitlines(), HOTSPOT_USERS_TERSE, table):
+        pass
+    return table
+
+def legacy_parse_user_manager(output):
+    """The split()/if-elif key=value loop app.py used for user manager output"""
+    users = []
+    for line in output.strip().split('\n'):
+        line = line.strip()
+        print(f"Processing line: {line}")
+        if line.startswith("Flags") or line.startswith("---") or line.startswith("#") or not line.strip():
+            continue
+
+        user = {"name": "", "password": "", "group": "", "uptime": "", "upload": "", "download": "",
+                "transfer": "", "profile": "", "last_seen": "", "disabled": "false"}
+        if "username=" in line:
+            for part in line.split():
+                if "=" in part:
+                    key, value = part.split("=", 1)
+                    if key == "username":
+                        user["name"] = value.strip('"')
+                    elif key == "customer":
+                        user["group"] = value.strip('"')
+                    elif key == "password":
+                        user["password"] = value.strip('"')
+                    elif key == "uptime-used":
+                        user["uptime"] = value.strip('"')
+                    elif key == "upload-used":
+                        user["upload"] = value.strip('"')
+                    elif key == "download-used":
+                        user["download"] = value.strip('"')
+                    elif key == "actual-profile":
+                        user["profile"] = value.strip('"')
+                    elif key == "last-seen":
+                        user["last_seen"] = value.strip('"')
+
+            if user["upload"] and user["download"]:
+                try:
+                    upload_mb = int(user["upload"]) / (1024 * 1024)
+                    download_mb = int(user["download"]) / (1024 * 1024)
+                    user["transfer"] = f"{upload_mb + download_mb:.2f} ميجا"
+                except:
+                    user["transfer"] = ""
+
+            if user["name"]:
+                print(f"Adding user to list: {user}")
+                users.append(user)
+    return users
+
+def terse_parse_user_manager(output):
+    """The single-pass key=value tokenizer used for 'print terse' output"""
+    table = UserTable()
+    for _ in iter_terse_rows(output.splitlines(), USER_MANAGER_USERS_TERSE, table):
+        pass
+    return table
+
+def measure(parse, output, repeat):
+    """Return the best rows/sec over repeat runs"""
+    best = None
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(parse(output))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return rows, rows / best
+
+def compare(title, legacy, new, output, repeat, new_output=None):
+    """Print legacy vs new rows/sec for one fixture (new_output when new reads another format)"""
+    # Legacy code prints every line; send it to /dev/null so only the parse cost is compared
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        legacy_rows, legacy_rate = measure(legacy, output, repeat)
+    new_rows, new_rate = measure(new, output if new_output is None else new_output, repeat)
+
+    assert legacy_rows == new_rows, (legacy_rows, new_rows)
+    print(f"{title} ({legacy_rows} rows, {len(output) / 1024:.0f} KiB)")
+    print(f"  legacy: {legacy_rate:12,.0f} rows/sec")
+    print(f"  new:    {new_rate:12,.0f} rows/sec ({new_rate / legacy_rate:.1f}x)")
+
+def main(count=50000, repeat=3):
+    compare("hotspot table, compiled parser", legacy_parse_hotspot, compiled_parse_hotspot,
+            hotspot_print_output(count), repeat)
+    # Reference only: the column parser slices three text fields, the tokenizer fills every typed column
+    compare("hotspot, column parser vs terse tokenizer", compiled_parse_hotspot, terse_parse_hotspot,
+            hotspot_print_output(count), repeat, hotspot_terse_output(count))
+    compare("user manager key=value, terse tokenizer", legacy_parse_user_manager, terse_parse_user_manager,
+            user_manager_terse_output(count), repeat)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,50 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import users_cache
+from mikrotik_parsers import iter_terse_rows, HOTSPOT_USERS_TERSE
+from fixtures import hotspot_terse_output
+
+def like_search(conn, router, kind, search_term):
+    """Substring search with a plain LIKE scan, as used without FTS5"""
+    users = users_cache.UserTable()
+    query = f"SELECT {', '.join(users_cache.CACHE_COLUMNS)} FROM users_cache WHERE u_router = ? AND u_type = ? AND u_name LIKE ?"
+    for values in conn.execute(query, (router, kind, f"%{search_term}%")):
+        users.append(values)
+    return users
+
+def timed(function, repeat=20):
+    """Best wall time of function() in milliseconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(count=100000):
+    with tempfile.TemporaryDirectory() as directory:
+        conn = sqlite3.connect(os.path.join(directory, "bench.db"))
+        users_cache.init_users_cache(conn.cursor())
+        rows = list(iter_terse_rows(hotspot_terse_output(count).splitlines(), HOTSPOT_USERS_TERSE))
+        users_cache.sync_users_cache(conn, "bench", "hotspot", rows)
+
+        index = users_cache.UserSearchIndex()
+        start = time.perf_counter()
+        index.load(conn, "bench", "hotspot")
+        print(f"{count} cached hotspot users (index build {(time.perf_counter() - start) * 1000:.0f} ms)")
+
+        for term in ("u", "user12", "ser123", "99"):
+            print(f"  {term!r:10} type-ahead {timed(lambda: index.search(conn, 'bench', 'hotspot', term)):7.2f} ms"
+                  f"   full match {timed(lambda: users_cache.search_users_cache(conn, 'bench', 'hotspot', term, True), 5):7.2f} ms"
+                  f"   LIKE scan {timed(lambda: like_search(conn, 'bench', 'hotspot', term), 5):7.2f} ms")
+        conn.close()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
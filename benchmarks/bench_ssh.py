@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from mikrotik_ssh import MikroTikSSH
+from mikrotik_cache import result_cache
+from mikrotik_pool import ssh_pool
+from mikrotik_parsers import iter_terse_rows, HOTSPOT_USERS_TERSE
+from mikrotik_records import UserTable
+from fixtures import hotspot_terse_output
+from fake_router import FakeRouter
+
+# Reference results kept in the repository; re-record with --update-baseline after an intended change
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+# Metrics where a larger value is better; everything else is a time or a size
+HIGHER_IS_BETTER = ("parse_rows_per_sec",)
+
+def best_of(function, repeat):
+    """Best wall time of function() in milliseconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def parse_throughput(count, repeat):
+    """Rows per second of the terse parser on an in-memory output"""
+    lines = hotspot_terse_output(count).splitlines()
+
+    def parse():
+        table = UserTable()
+        for _ in iter_terse_rows(lines, HOTSPOT_USERS_TERSE, table):
+            pass
+
+    return count / (best_of(parse, repeat) / 1000)
+
+def fetch(client, search_term):
+    """One end-to-end search, bypassing the result cache"""
+    result_cache.invalidate()
+    users = client.get_hotspot_users_filtered(search_term)
+    if client.last_error:
+        raise RuntimeError(client.last_error)
+    return users
+
+def peak_memory(client):
+    """Peak traced allocation in MiB while fetching the full listing"""
+    result_cache.invalidate()
+    tracemalloc.start()
+    try:
+        users = fetch(client, None)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    result_cache.invalidate()
+    del users
+    return peak / 1024 / 1024
+
+def run_size(count, latency, bandwidth, repeat):
+    """Measure every metric against a fake router holding count hotspot users"""
+    with FakeRouter(hotspot_users=count, latency=latency, bandwidth=bandwidth) as router:
+        port = router.sock.getsockname()[1]
+        client = MikroTikSSH("127.0.0.1", "admin", "", port)
+        try:
+            if not client.connect():
+                raise RuntimeError("Could not connect to the fake router")
+            # The first listing builds the router's output; keep it out of the numbers
+            fetch(client, None)
+            results = {
+                "list_ms": best_of(lambda: fetch(client, None), repeat),
+                "search_ms": best_of(lambda: fetch(client, f"user{count // 2}"), repeat),
+                "parse_rows_per_sec": parse_throughput(count, repeat),
+                "peak_mib": peak_memory(client)
+            }
+        finally:
+            client.disconnect()
+            ssh_pool.close_all()
+    return {metric: round(value, 3) for metric, value in results.items()}
+
+def compare(results, baseline, tolerance):
+    """Print every metric next to its baseline and return the regressions"""
+    regressions = []
+    for size, metrics in results.items():
+        print(f"{size} users")
+        for metric, value in metrics.items():
+            base = baseline.get(size, {}).get(metric)
+            line = f"  {metric:<20} {value:>14,.3f}"
+            if base:
+                change = value / base - 1
+                worse = -change if metric in HIGHER_IS_BETTER else change
+                line += f"   baseline {base:>14,.3f} ({change:+.0%})"
+                if worse > tolerance:
+                    line += "  REGRESSION"
+                    regressions.append((size, metric))
+            print(line)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end MikroTikSSH benchmark against a fake RouterOS SSH server")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--latency", type=float, default=0.0, help="router answer delay in seconds")
+    parser.add_argument("--bandwidth", type=float, default=None, help="wire speed in bytes per second")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown before reporting a regression")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+
+    results = {str(count): run_size(count, args.latency, args.bandwidth, args.repeat) for count in args.sizes}
+
+    baseline = {}
+    recorded = os.path.exists(args.baseline)
+    if recorded:
+        with open(args.baseline, encoding="utf-8") as f:
+            stored = json.load(f)
+        if (stored.get("latency"), stored.get("bandwidth")) == (args.latency, args.bandwidth):
+            baseline = stored.get("results", {})
+        else:
+            print("Baseline was recorded with another latency/bandwidth; not comparing")
+        if (stored.get("python"), stored.get("platform")) != (platform.python_version(), platform.platform()):
+            print(f"Baseline was recorded on Python {stored.get('python')}, {stored.get('platform')}; "
+                  "timings from another machine are only indicative")
+    regressions = compare(results, baseline, args.tolerance)
+
+    # The first run on a checkout without a baseline (or --update-baseline) records one
+    if args.update_baseline or not recorded:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "latency": args.latency,
+                "bandwidth": args.bandwidth,
+                "results": results
+            }, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.tolerance:.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
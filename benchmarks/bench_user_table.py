@@ -0,0 +1,45 @@
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mikrotik_parsers import iter_terse_values, iter_terse_rows, USER_MANAGER_USERS_TERSE
+from mikrotik_records import UserTable, USER_FIELDS, format_transfer
+from fixtures import user_manager_terse_output
+
+def build_dicts(lines):
+    """One dict per user, as the fetch methods returned before UserTable"""
+    users = []
+    for values in iter_terse_values(lines, USER_MANAGER_USERS_TERSE):
+        user = dict(zip(USER_FIELDS, values))
+        user["transfer"] = format_transfer(int(user["upload"]), int(user["download"]))
+        users.append(user)
+    return users
+
+def build_table(lines):
+    """Columnar UserTable"""
+    table = UserTable()
+    for _ in iter_terse_rows(lines, USER_MANAGER_USERS_TERSE, table):
+        pass
+    return table
+
+def retained(build, lines):
+    """Bytes still allocated by the result of build"""
+    tracemalloc.start()
+    result = build(lines)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+def main(count=50000):
+    lines = user_manager_terse_output(count).splitlines()
+    dict_size = retained(build_dicts, lines)
+    table_size = retained(build_table, lines)
+    print(f"{count} user manager users")
+    print(f"  list of dicts: {dict_size / 1024 / 1024:8.1f} MiB")
+    print(f"  UserTable:     {table_size / 1024 / 1024:8.1f} MiB ({dict_size / table_size:.1f}x smaller)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,145 @@
+import socket
+import threading
+import time
+
+from mikrotik_api import encode_sentence, read_sentence, parse_attributes
+from fixtures import hotspot_api_records, user_manager_api_records
+
+# Local stand-in for a RouterOS device answering API sentences (plain TCP, no SSL)
+class FakeApiRouter:
+    def __init__(self, hotspot_users=1000, user_manager_users=1000, username="admin", password="",
+                 latency=0.0, chunk_size=32768, buffer_size=None):
+        self.hotspot_users = {user["name"]: user for user in hotspot_api_records(hotspot_users)}
+        self.user_manager_users = user_manager_api_records(user_manager_users)
+        self.username = username
+        self.password = password
+        # Seconds before the router starts answering each command
+        self.latency = latency
+        # Replies are written in pieces of this size, so listings arrive streamed
+        self.chunk_size = chunk_size
+        # Socket buffer bytes per direction, None for the system default; small buffers
+        # make a client that writes without reading stall quickly
+        self.buffer_size = buffer_size
+        self.commands = 0
+        self.sock = None
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Listen on a free local port and return it"""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.buffer_size:
+            # Set on the listening socket so accepted connections start with it
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.buffer_size)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.buffer_size)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(16)
+        threading.Thread(target=self.accept, daemon=True).start()
+        return self.sock.getsockname()[1]
+
+    def accept(self):
+        while True:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.connections.append(client)
+            threading.Thread(target=self.serve, args=(client,), daemon=True).start()
+
+    def stop(self):
+        """Stop listening and drop every open connection"""
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            connection.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def serve(self, connection):
+        """Answer sentences one at a time until the client goes away"""
+        stream = connection.makefile("rb")
+        logged_in = False
+        try:
+            while True:
+                words = read_sentence(stream)
+                if not words:
+                    continue
+                with self.lock:
+                    self.commands += 1
+                tag = next((word for word in words[1:] if word.startswith(".tag=")), None)
+                if words[0] == "/login":
+                    replies, logged_in = self.login(parse_attributes(words[1:]))
+                elif not logged_in:
+                    replies = [["!fatal", "not logged in"]]
+                else:
+                    replies = self.respond(words[0], words[1:])
+                if self.latency:
+                    time.sleep(self.latency)
+                data = b"".join(encode_sentence(reply + ([tag] if tag and reply[0] != "!fatal" else []))
+                                for reply in replies)
+                for start in range(0, len(data), self.chunk_size):
+                    connection.sendall(data[start:start + self.chunk_size])
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            stream.close()
+            connection.close()
+
+    def login(self, attrs):
+        """Post-6.43 login: name and password in one sentence"""
+        if attrs.get("name") == self.username and attrs.get("password", "") == self.password:
+            return [["!done"]], True
+        return [["!trap", "=message=invalid user name or password (6)"], ["!done"]], False
+
+    def respond(self, command, words):
+        """Reply sentences (lists of words) for one command"""
+        attrs = parse_attributes(words)
+        queries = {word[1:].partition("=")[0]: word[1:].partition("=")[2] for word in words if word.startswith("?")}
+        with self.lock:
+            if command == "/ip/hotspot/user/print":
+                users = self.hotspot_users.values()
+                if "name" in queries:
+                    users = [user for user in users if user["name"] == queries["name"]]
+                return [record_reply(user) for user in users] + [["!done"]]
+            if command == "/tool/user-manager/user/print":
+                return [record_reply(user) for user in self.user_manager_users] + [["!done"]]
+            if command == "/ip/hotspot/active/print":
+                return [["!done"]]
+            if command == "/ip/hotspot/user/add":
+                name = attrs.get("name", "")
+                if not name or name in self.hotspot_users:
+                    return trap("failure: already have user with this name")
+                self.hotspot_users[name] = dict(attrs, **{".id": f"*{len(self.hotspot_users) + 1:X}"})
+                return [["!done", "=ret=" + self.hotspot_users[name][".id"]]]
+            if command in ("/ip/hotspot/user/remove", "/ip/hotspot/user/set", "/ip/hotspot/user/reset-counters"):
+                name = attrs.get("numbers", "")
+                if name not in self.hotspot_users:
+                    return trap("no such item")
+                if command.endswith("/remove"):
+                    del self.hotspot_users[name]
+                elif command.endswith("/set"):
+                    self.hotspot_users[name].update((key, value) for key, value in attrs.items() if key != "numbers")
+                return [["!done"]]
+        return trap("no such command")
+
+def record_reply(record):
+    """!re sentence words for one record"""
+    return ["!re"] + [f"={key}={value}" for key, value in record.items()]
+
+def trap(message):
+    """A failed command: !trap with the message, then !done"""
+    return [["!trap", f"=message={message}"], ["!done"]]
@@ -0,0 +1,136 @@
+import re
+import socket
+import threading
+import time
+
+import paramiko
+
+from fixtures import hotspot_terse_output, user_manager_terse_output
+
+# 'where name="x"' / 'where username="x"' filters appended by MikroTikSSH
+WHERE_PATTERN = re.compile(r'where (name|username)="([^"]*)"')
+
+# Host key shared by every fake router; generating one takes a while
+host_key = None
+
+def get_host_key():
+    """Generate the server host key on first use"""
+    global host_key
+    if host_key is None:
+        host_key = paramiko.RSAKey.generate(2048)
+    return host_key
+
+# paramiko server side of one SSH connection: accepts any login and runs exec requests
+class FakeRouterSession(paramiko.ServerInterface):
+    def __init__(self, router):
+        self.router = router
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED_OR_CHANNEL_TYPE_NOT_SUPPORTED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.router.respond, args=(channel, command.decode("utf-8")), daemon=True).start()
+        return True
+
+# Local stand-in for a RouterOS device answering the user print commands over SSH
+class FakeRouter:
+    def __init__(self, hotspot_users=1000, user_manager_users=1000, latency=0.0, bandwidth=None, chunk_size=32768):
+        self.hotspot_users = hotspot_users
+        self.user_manager_users = user_manager_users
+        # Seconds before the router starts answering (its own print time plus the round trip)
+        self.latency = latency
+        # Bytes per second on the wire, None for unlimited
+        self.bandwidth = bandwidth
+        self.chunk_size = chunk_size
+        self.outputs = {}
+        self.commands = 0
+        self.sock = None
+        self.transports = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Listen on a free local port and return it"""
+        get_host_key()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(16)
+        threading.Thread(target=self.accept, daemon=True).start()
+        return self.sock.getsockname()[1]
+
+    def accept(self):
+        while True:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(client)
+            transport.add_server_key(get_host_key())
+            transport.start_server(server=FakeRouterSession(self))
+            with self.lock:
+                self.transports.append(transport)
+
+    def stop(self):
+        """Stop listening and drop every open connection"""
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        with self.lock:
+            transports, self.transports = self.transports, []
+        for transport in transports:
+            transport.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def output(self, command):
+        """Terse print output for a command, built once per command type"""
+        if "/ip hotspot user print" in command:
+            kind, build, count = "hotspot", hotspot_terse_output, self.hotspot_users
+        elif "/tool user-manager user print" in command:
+            kind, build, count = "userman", user_manager_terse_output, self.user_manager_users
+        else:
+            return ""
+
+        with self.lock:
+            output = self.outputs.get(kind)
+            if output is None:
+                output = self.outputs[kind] = build(count)
+
+        match = WHERE_PATTERN.search(command)
+        if match:
+            token = f" {match.group(1)}={match.group(2)} "
+            output = "".join(line + "\r\n" for line in output.split("\r\n") if token in line + " ")
+        return output
+
+    def respond(self, channel, command):
+        """Answer one exec request after the latency, throttled to the bandwidth"""
+        with self.lock:
+            self.commands += 1
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            data = self.output(command).encode("utf-8")
+            for start in range(0, len(data), self.chunk_size):
+                chunk = data[start:start + self.chunk_size]
+                channel.sendall(chunk)
+                if self.bandwidth:
+                    time.sleep(len(chunk) / self.bandwidth)
+            channel.send_exit_status(0)
+            # EOF rather than close: the exec reply may still be on its way to the client,
+            # which closes the channel once it has read everything
+            channel.shutdown_write()
+        except Exception:
+            channel.close()
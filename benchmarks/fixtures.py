@@ -0,0 +1,55 @@
+# Synthetic RouterOS print outputs used by the benchmarks
+
+def hotspot_print_output(count):
+    """Build '/ip hotspot user print' table output with count users"""
+    lines = [
+        "Flags: * - default, X - disabled, D - dynamic ",
+        " #   SERVER   NAME                 ADDRESS         PROFILE      UPTIME"
+    ]
+    for i in range(count):
+        lines.append(f"{i:>2}   all      {'user%d' % i:<20} {'':<15} {'default':<12} {i % 24}h{i % 60}m{i % 60}s")
+    return "\r\n".join(lines) + "\r\n"
+
+def hotspot_terse_output(count):
+    """Build '/ip hotspot user print terse' output with count users"""
+    lines = []
+    for i in range(count):
+        flags = "X " if i % 50 == 0 else ""
+        lines.append(f" {i} {flags}server=all name=user{i} password=pw{i} profile=default uptime={i % 24}h{i % 60}m{i % 60}s bytes-in={i * 1024} bytes-out={i * 4096} comment=\"batch {i // 1000}\"")
+    return "\r\n".join(lines) + "\r\n"
+
+def user_manager_terse_output(count):
+    """Build '/tool user-manager user print terse' output with count users"""
+    lines = []
+    for i in range(count):
+        lines.append(f" {i} customer=admin username=um{i} password=\"pw {i}\" uptime-used={i % 86400}s download-used={i * 2048} upload-used={i * 1024} last-seen=never actual-profile=p1")
+    return "\r\n".join(lines) + "\r\n"
+
+def hotspot_api_records(count):
+    """Build the '/ip/hotspot/user/print' API replies (key -> value dicts) for count users"""
+    return [{
+        ".id": f"*{i + 1:X}",
+        "name": f"user{i}",
+        "password": f"pw{i}",
+        "profile": "default",
+        "uptime": f"{i % 24}h{i % 60}m{i % 60}s",
+        "bytes-in": str(i * 1024),
+        "bytes-out": str(i * 4096),
+        "comment": f"batch {i // 1000}",
+        "disabled": "true" if i % 50 == 0 else "false"
+    } for i in range(count)]
+
+def user_manager_api_records(count):
+    """Build the '/tool/user-manager/user/print' API replies for count users"""
+    return [{
+        ".id": f"*{i + 1:X}",
+        "customer": "admin",
+        "username": f"um{i}",
+        "password": f"pw {i}",
+        "uptime-used": f"{i % 86400}s",
+        "download-used": str(i * 2048),
+        "upload-used": str(i * 1024),
+        "last-seen": "never",
+        "actual-profile": "p1",
+        "disabled": "false"
+    } for i in range(count)]
@@ -1,551 +1,80 @@
 import os
-import sqlite3
 import json
 import base64
 import hashlib
-import paramiko
 import threading
-import time
+from mikrotik_pool import ssh_pool
+from mikrotik_cache import result_cache
+from mikrotik_fanout import RouterFanout, fetch_users
+from mikrotik_scheduler import RequestScheduler
+from mikrotik_ssh import create_router_client, create_profile_client
+import usage_store
+from uma_db import UMA_DB
+from mikrotik_logging import setup_logging, set_debug, debug_enabled, log_buffer
+from mikrotik_timing import timings
+from mikrotik_active import ActiveSessionMonitor
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.uix.textinput import TextInput
 from kivy.uix.scrollview import ScrollView
-from kivy.uix.gridlayout import GridLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 from kivy.uix.popup import Popup
+from kivy.uix.progressbar import ProgressBar
 from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
 from kivy.core.window import Window
 from kivy.metrics import dp
-
-# Database class for handling SQLite operations
-class UMA_DB:
-    def __init__(self, db_path="uma_database.db"):
-        self.db_path = db_path
-        self.init_db()
-
-    def init_db(self):
-        """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Create main_POS table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS main_POS (
-            m_no INTEGER PRIMARY KEY AUTOINCREMENT,
-            m_name TEXT,
-            mvalue1 TEXT,
-            mvalue2 TEXT,
-            mvalue3 TEXT,
-            mvalue4 TEXT,
-            mvalue5 TEXT,
-            mvalue6 TEXT,
-            mvalue7 TEXT,
-            mvalue8 TEXT
-        )
-        """)
-
-        # Create help_POS table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS help_POS (
-            h_no INTEGER PRIMARY KEY AUTOINCREMENT,
-            h_name TEXT,
-            hvalue1 TEXT,
-            hvalue2 TEXT,
-            hvalue3 TEXT,
-            hvalue4 TEXT,
-            hvalue5 TEXT,
-            hvalue6 TEXT,
-            hvalue7 TEXT,
-            hvalue8 TEXT
-        )
-        """)
-
-        # Create print_POS table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS print_POS (
-            p_no INTEGER PRIMARY KEY AUTOINCREMENT,
-            p_accounte TEXT,
-            p_days TEXT,
-            p_houer TEXT,
-            p_price TEXT,
-            p_defuser TEXT,
-            p_profile TEXT,
-            p_printin TEXT
-        )
-        """)
-
-        # Create ready_code_POS table
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS ready_code_POS (
-            r_no INTEGER PRIMARY KEY AUTOINCREMENT,
-            r_code TEXT,
-            r_comdate TEXT,
-            r_getdate TEXT,
-            r_status TEXT,
-            r_buttom TEXT
-        )
-        """)
-
-        conn.commit()
-        conn.close()
-
-    def get_help_value(self, h_no, h_value):
-        """Get help value from database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        column_map = {
-            1: "hvalue1",
-            2: "hvalue2",
-            3: "hvalue3",
-            4: "hvalue4",
-            5: "hvalue5",
-            6: "hvalue6",
-            7: "hvalue7",
-            8: "hvalue8"
-        }
-
-        column = column_map.get(h_value, "hvalue1")
-
-        cursor.execute(f"SELECT {column} FROM help_POS WHERE h_no = ?", (h_no,))
-        result = cursor.fetchone()
-
-        conn.close()
-
-        if result:
-            return result[0]
-        return ""
-
-    def get_help_value_main(self, m_no, m_value):
-        """Get main value from database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        column_map = {
-            1: "mvalue1",
-            2: "mvalue2",
-            3: "mvalue3",
-            4: "mvalue4",
-            5: "mvalue5",
-            6: "mvalue6",
-            7: "mvalue7",
-            8: "mvalue8"
-        }
-
-        column = column_map.get(m_value, "mvalue1")
-
-        cursor.execute(f"SELECT {column} FROM main_POS WHERE m_no = ?", (m_no,))
-        result = cursor.fetchone()
-
-        conn.close()
-
-        if result:
-            return result[0]
-        return ""
-
-    def save_main_settings(self, ip, username, password, connection_type, port=22):
-        """Save main settings to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Check if record exists
-        cursor.execute("SELECT * FROM main_POS WHERE m_no = 1")
-        exists = cursor.fetchone()
-
-        if exists:
-            # Update existing record
-            cursor.execute("""
-            UPDATE main_POS SET
-                mvalue1 = ?, mvalue2 = ?, mvalue3 = ?, mvalue4 = ?, mvalue5 = ?
-            WHERE m_no = 1
-            """, (ip, username, password, connection_type, str(port)))
+from kivy.clock import Clock
+
+# Recycled result row: three lines of one user, or a single header line
+class UserResultRow(RecycleDataViewBehavior, BoxLayout):
+    # (title, field) of each line, set by the subclasses
+    lines = ()
+
+    def __init__(self, **kwargs):
+        super().__init__(orientation='vertical', padding=dp(5), **kwargs)
+        self.labels = []
+        for _ in range(3):
+            label = Label(size_hint_y=None, height=dp(30))
+            self.labels.append(label)
+            self.add_widget(label)
+
+    def refresh_view_attrs(self, rv, index, data):
+        """Fill the labels from one data item ({'user': UserRow} or {'header': text})"""
+        user = data.get('user')
+        if user is None:
+            texts = (data.get('header', ''), '', '')
         else:
-            # Insert new record
-            cursor.execute("""
-            INSERT INTO main_POS (m_name, mvalue1, mvalue2, mvalue3, mvalue4, mvalue5)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """, ("settings", ip, username, password, connection_type, str(port)))
-
-        conn.commit()
-        conn.close()
-
-    def get_main_settings(self):
-        """Get main settings from database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT mvalue1, mvalue2, mvalue3, mvalue4, mvalue5 FROM main_POS WHERE m_no = 1")
-        result = cursor.fetchone()
-
-        conn.close()
-
-        if result:
-            return {
-                "ip": result[0],
-                "username": result[1],
-                "password": result[2],
-                "connection_type": result[3],
-                "port": int(result[4]) if result[4] else 22
-            }
-        return {
-            "ip": "",
-            "username": "",
-            "password": "",
-            "connection_type": "ssh",
-            "port": 22
-        }
-
-# MikroTik SSH handler
-class MikroTikSSH:
-    def __init__(self, host, username, password, port=22):
-        self.host = host
-        self.username = username
-        self.password = password
-        self.port = port
-        self.timeout = 30
-        self.ssh = None
-
-    def connect(self):
-        """Connect to MikroTik device via SSH"""
-        try:
-            self.ssh = paramiko.SSHClient()
-            self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self.ssh.connect(self.host, port=self.port, username=self.username, password=self.password, timeout=self.timeout)
-            return True
-        except Exception as e:
-            print(f"Connection error: {str(e)}")
-            return False
-
-    def disconnect(self):
-        """Disconnect from MikroTik device"""
-        if self.ssh:
-            self.ssh.close()
-            self.ssh = None
-
-    def execute_command(self, command):
-        """Execute command on MikroTik device"""
-        print(f"Executing command: {command}")
-        if not self.ssh:
-            print("No SSH connection, attempting to connect...")
-            if not self.connect():
-                print("Failed to connect via SSH")
-                return None
-            print("SSH connection established")
-
-        try:
-            stdin, stdout, stderr = self.ssh.exec_command(command)
-            # Set a timeout for reading output
-            stdout.channel.settimeout(10)  # 10 seconds timeout
-            output = stdout.read().decode('utf-8')
-            error = stderr.read().decode('utf-8')
-
-            print(f"Command output: {output[:200]}...")  # Print first 200 chars
-            if error:
-                print(f"Command error: {error}")
-                return None
-
-            return output
-        except Exception as e:
-            print(f"Command execution error: {str(e)}")
-            # Check if it's a timeout error
-            if "timed out" in str(e).lower():
-                print("Command execution timed out")
-                # Try to close the connection and reconnect
-                try:
-                    self.disconnect()
-                    self.connect()
-                except:
-                    pass
-            return None
-
-    def get_hotspot_users(self):
-        """Get hotspot users from MikroTik device"""
-        output = self.execute_command("/ip hotspot user print")
-        if not output:
-            return []
-
-        print(f"Raw output: {output[:500]}...")  # Print first 500 chars for debugging
-
-        users = []
-        lines = output.strip().split('\n')
-        # Find the header line to determine column positions
-        header_line = None
-        for line in lines:
-            if "NAME" in line and "PROFILE" in line:
-                header_line = line
-                break
-
-        if not header_line:
-            print("Could not find header line in output")
-            return users
-
-        # Extract column positions
-        name_pos = header_line.find("NAME")
-        address_pos = header_line.find("ADDRESS")
-        profile_pos = header_line.find("PROFILE")
-        uptime_pos = header_line.find("UPTIME")
-
-        print(f"Column positions: name={name_pos}, address={address_pos}, profile={profile_pos}, uptime={uptime_pos}")
-
-        # Process data lines
-        for line in lines:
-            print(f"Processing line: {line}")
-            # Skip header, separator, and comment lines
-            if line.startswith("Flags") or line.startswith("---") or line.startswith("#") or not line.strip() or "NAME" in line and "PROFILE" in line:
-                print(f"Skipping header/comment line")
-                continue
-
-            # Check if this is a data line (has enough length)
-            if len(line) > name_pos:
-                try:
-                    # Extract name
-                    name = ""
-                    if address_pos > name_pos:
-                        name = line[name_pos:address_pos].strip()
-
-                    # Extract profile
-                    profile = ""
-                    if uptime_pos > profile_pos and len(line) > profile_pos:
-                        profile = line[profile_pos:uptime_pos].strip()
-
-                    # Extract uptime
-                    uptime = ""
-                    if len(line) > uptime_pos:
-                        uptime = line[uptime_pos:].strip()
-
-                    if name:  # Only add if we have a name
-                        user = {
-                            "name": name,
-                            "password": "",  # Password is not shown in print output
-                            "profile": profile,
-                            "uptime": uptime
-                        }
-                        print(f"Adding user to list: {user}")
-                        users.append(user)
-                    else:
-                        print(f"Skipping user with no name")
-                except Exception as e:
-                    print(f"Error processing line: {line}. Error: {str(e)}")
-
-        print(f"Returning {len(users)} users")
-        return users
-
-    def get_hotspot_users_filtered(self, search_term):
-        """Get filtered hotspot users from MikroTik device"""
-        # Use server-side filtering with where clause
-        output = self.execute_command(f'/ip hotspot user print where name="{search_term}"')
-        if not output:
-            return []
-
-        print(f"Raw filtered output: {output[:500]}...")  # Print first 500 chars for debugging
-
-        users = []
-        lines = output.strip().split('\n')
-
-        # Find the header line to determine column positions
-        header_line = None
-        for line in lines:
-            if "NAME" in line and "PROFILE" in line:
-                header_line = line
-                break
-
-        if not header_line:
-            print("Could not find header line in output")
-            return users
-
-        # Extract column positions
-        name_pos = header_line.find("NAME")
-        address_pos = header_line.find("ADDRESS")
-        profile_pos = header_line.find("PROFILE")
-        uptime_pos = header_line.find("UPTIME")
-
-        print(f"Column positions: name={name_pos}, address={address_pos}, profile={profile_pos}, uptime={uptime_pos}")
-
-        # Process data lines
-        for line in lines:
-            print(f"Processing line: {line}")
-            # Skip header, separator, and comment lines
-            if line.startswith("Flags") or line.startswith("---") or line.startswith("#") or not line.strip() or "NAME" in line and "PROFILE" in line:
-                print(f"Skipping header/comment line")
-                continue
-
-            # Check if this is a data line (has enough length)
-            if len(line) > name_pos:
-                try:
-                    # Extract name
-                    name = ""
-                    if address_pos > name_pos:
-                        name = line[name_pos:address_pos].strip()
-
-                    # Extract profile
-                    profile = ""
-                    if uptime_pos > profile_pos and len(line) > profile_pos:
-                        profile = line[profile_pos:uptime_pos].strip()
-
-                    # Extract uptime
-                    uptime = ""
-                    if len(line) > uptime_pos:
-                        uptime = line[uptime_pos:].strip()
-
-                    if name:  # Only add if we have a name
-                        user = {
-                            "name": name,
-                            "password": "",  # Password is not shown in print output
-                            "profile": profile,
-                            "uptime": uptime
-                        }
-                        print(f"Adding user to list: {user}")
-                        users.append(user)
-                    else:
-                        print(f"Skipping user with no name")
-                except Exception as e:
-                    print(f"Error processing line: {line}. Error: {str(e)}")
-
-        print(f"Returning {len(users)} users")
-        return users
-
-    def get_user_manager_users(self):
-        """Get user manager users from MikroTik device"""
-        output = self.execute_command("/tool user-manager user print")
-        if not output:
-            return []
-
-        print(f"Raw output: {output[:500]}...")  # Print first 500 chars for debugging
-
-        users = []
-        lines = output.strip().split('\n')
-        # Find the header line to determine column positions
-        header_line = None
-        for line in lines:
-            if "USERNAME" in line and "PASSWORD" in line:
-                header_line = line
-                break
-
-        if not header_line:
-            print("Could not find header line in output")
-            return users
-
-        # Extract column positions
-        username_pos = header_line.find("USERNAME")
-        password_pos = header_line.find("PASSWORD")
-        uptime_pos = header_line.find("UPTIME")
-
-        print(f"Column positions: username={username_pos}, password={password_pos}, uptime={uptime_pos}")
-
-        # Process data lines
-        for line in lines:
-            print(f"Processing line: {line}")
-            # Skip header, separator, and comment lines
-            if line.startswith("Flags") or line.startswith("---") or line.startswith("#") or not line.strip() or "USERNAME" in line and "PASSWORD" in line:
-                print(f"Skipping header/comment line")
-                continue
-
-            # Check if this is a data line (has enough length)
-            if len(line) > username_pos:
-                try:
-                    # Extract username
-                    username = ""
-                    if password_pos > username_pos:
-                        username = line[username_pos:password_pos].strip()
-
-                    # Extract password
-                    password = ""
-                    if uptime_pos > password_pos and len(line) > password_pos:
-                        password = line[password_pos:uptime_pos].strip()
-
-                    # Extract uptime
-                    uptime = ""
-                    if len(line) > uptime_pos:
-                        uptime = line[uptime_pos:].strip()
-
-                    if username:  # Only add if we have a username
-                        user = {
-                            "name": username,
-                            "password": password,
-                            "uptime": uptime
-                        }
-                        print(f"Adding user to list: {user}")
-                        users.append(user)
-                    else:
-                        print(f"Skipping user with no username")
-                except Exception as e:
-                    print(f"Error processing line: {line}. Error: {str(e)}")
-
-        print(f"Returning {len(users)} users")
-        return users
-
-    def get_user_manager_users_filtered(self, search_term):
-        """Get filtered user manager users from MikroTik device"""
-        # Use server-side filtering with where clause
-        output = self.execute_command(f'/tool user-manager user print where username="{search_term}"')
-        if not output:
-            return []
-
-        print(f"Raw filtered output: {output[:500]}...")  # Print first 500 chars for debugging
-
-        users = []
-        lines = output.strip().split('\n')
-
-        # Find the header line to determine column positions
-        header_line = None
-        for line in lines:
-            if "USERNAME" in line and "PASSWORD" in line:
-                header_line = line
-                break
-
-        if not header_line:
-            print("Could not find header line in output")
-            return users
-
-        # Extract column positions
-        username_pos = header_line.find("USERNAME")
-        password_pos = header_line.find("PASSWORD")
-        uptime_pos = header_line.find("UPTIME")
-
-        print(f"Column positions: username={username_pos}, password={password_pos}, uptime={uptime_pos}")
-
-        # Process data lines
-        for line in lines:
-            print(f"Processing line: {line}")
-            # Skip header, separator, and comment lines
-            if line.startswith("Flags") or line.startswith("---") or line.startswith("#") or not line.strip() or "USERNAME" in line and "PASSWORD" in line:
-                print(f"Skipping header/comment line")
-                continue
-
-            # Check if this is a data line (has enough length)
-            if len(line) > username_pos:
-                try:
-                    # Extract username
-                    username = ""
-                    if password_pos > username_pos:
-                        username = line[username_pos:password_pos].strip()
-
-                    # Extract password
-                    password = ""
-                    if uptime_pos > password_pos and len(line) > password_pos:
-                        password = line[password_pos:uptime_pos].strip()
-
-                    # Extract uptime
-                    uptime = ""
-                    if len(line) > uptime_pos:
-                        uptime = line[uptime_pos:].strip()
-
-                    if username:  # Only add if we have a username
-                        user = {
-                            "name": username,
-                            "password": password,
-                            "uptime": uptime
-                        }
-                        print(f"Adding user to list: {user}")
-                        users.append(user)
-                    else:
-                        print(f"Skipping user with no username")
-                except Exception as e:
-                    print(f"Error processing line: {line}. Error: {str(e)}")
-
-        print(f"Returning {len(users)} users")
-        return users
+            texts = tuple(f"{title}: {user[field]}" for title, field in self.lines)
+        for label, text in zip(self.labels, texts):
+            label.text = text
+        return super().refresh_view_attrs(rv, index, data)
+
+class HotspotResultRow(UserResultRow):
+    lines = (("Name", "name"), ("Profile", "profile"), ("Uptime", "uptime"))
+
+class UserManagerResultRow(UserResultRow):
+    lines = (("Username", "name"), ("Password", "password"), ("Uptime", "uptime"))
+
+class ActiveSessionRow(UserResultRow):
+    lines = (("User", "user"), ("Address", "address"), ("Uptime", "uptime"))
+
+def create_results_view(viewclass):
+    """Virtualised result list: only the rows on screen get widgets"""
+    results_view = RecycleView()
+    rows_layout = RecycleBoxLayout(orientation='vertical', spacing=dp(10), size_hint_y=None,
+                                   default_size=(None, dp(100)), default_size_hint=(1, None))
+    rows_layout.bind(minimum_height=rows_layout.setter('height'))
+    results_view.add_widget(rows_layout)
+    results_view.viewclass = viewclass
+    return results_view
+
+def results_data(users):
+    """RecycleView data for a result set; rows stay views over the UserTable"""
+    return [{'user': user} for user in users]
 
 # Main App class
 class UMAApp(App):
@@ -553,9 +82,28 @@ class UMAApp(App):
         # Set app title
         self.title = "UMA - MikroTik User Manager"
 
+        # Log to the console and the debug tab; debug messages stay off until enabled there
+        setup_logging()
+
         # Initialize database
         self.db = UMA_DB()
 
+        # Worker pool for searching all saved routers at once
+        self.fanout = RouterFanout()
+
+        # Live searches per router: coalesced, cancellable and rate limited
+        self.scheduler = RequestScheduler()
+        self.pending_searches = {}
+        # Rows of each running search already shown in its results list
+        self.shown_rows = {}
+        # Set to stop the running search of all routers
+        self.fanout_cancelled = None
+        # Poller of the online users tab while it is watching
+        self.active_monitor = None
+        # Samples the users' byte counters of the configured router every 15 minutes
+        self.usage_sampler = usage_store.UsageSampler(self.db.users_sync, self.usage_client)
+        self.usage_sampler.start()
+
         # Create main layout
         self.main_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
 
@@ -572,16 +120,52 @@ class UMAApp(App):
         self.create_hotspot_tab()
         self.tab_panel.add_widget(self.hotspot_tab)
 
+        # Create online users tab
+        self.active_tab = TabbedPanelItem(text='المتصلون')
+        self.create_active_tab()
+        self.tab_panel.add_widget(self.active_tab)
+
         # Create user manager tab
         self.user_manager_tab = TabbedPanelItem(text='User Manager')
         self.create_user_manager_tab()
         self.tab_panel.add_widget(self.user_manager_tab)
 
+        # Create debug tab
+        self.debug_tab = TabbedPanelItem(text='Debug')
+        self.create_debug_tab()
+        self.tab_panel.add_widget(self.debug_tab)
+
+        # Create performance tab
+        self.performance_tab = TabbedPanelItem(text='الأداء')
+        self.create_performance_tab()
+        self.tab_panel.add_widget(self.performance_tab)
+
         # Add tab panel to main layout
         self.main_layout.add_widget(self.tab_panel)
 
+        # Background job bar: progress, rows received so far and cancel
+        job_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(40), spacing=dp(10))
+        self.job_progress = ProgressBar(max=1, value=0)
+        self.job_label = Label(text='', size_hint_x=0.4)
+        cancel_button = Button(text='إلغاء', size_hint_x=0.2)
+        cancel_button.bind(on_press=self.cancel_jobs)
+        job_layout.add_widget(self.job_progress)
+        job_layout.add_widget(self.job_label)
+        job_layout.add_widget(cancel_button)
+        self.main_layout.add_widget(job_layout)
+
         return self.main_layout
 
+    def on_stop(self):
+        # Close pooled SSH sessions and database connections when the app exits
+        if self.active_monitor:
+            self.active_monitor.stop()
+        self.usage_sampler.stop()
+        self.fanout.shutdown()
+        self.scheduler.shutdown()
+        ssh_pool.close_all()
+        self.db.close()
+
     def create_settings_tab(self):
         # Create settings layout
         settings_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
@@ -634,6 +218,11 @@ class UMAApp(App):
         save_button.bind(on_press=self.save_settings)
         settings_layout.add_widget(save_button)
 
+        # Add router button (used by the all-routers search)
+        add_router_button = Button(text='إضافة إلى قائمة الأجهزة', size_hint_y=None, height=dp(50))
+        add_router_button.bind(on_press=self.add_router_profile)
+        settings_layout.add_widget(add_router_button)
+
         # Add settings layout to settings tab
         self.settings_content = ScrollView()
         self.settings_content.add_widget(settings_layout)
@@ -647,6 +236,7 @@ class UMAApp(App):
         search_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(40))
         search_label = Label(text='Search:', size_hint_x=0.3)
         self.hotspot_search_input = TextInput(multiline=False)
+        self.hotspot_search_input.bind(text=self.typeahead_hotspot_users)
         search_layout.add_widget(search_label)
         search_layout.add_widget(self.hotspot_search_input)
         hotspot_layout.add_widget(search_layout)
@@ -656,17 +246,84 @@ class UMAApp(App):
         search_button.bind(on_press=self.search_hotspot_users)
         hotspot_layout.add_widget(search_button)
 
-        # Results area
-        self.hotspot_results_layout = GridLayout(cols=1, spacing=dp(10), size_hint_y=None)
-        self.hotspot_results_layout.bind(minimum_height=self.hotspot_results_layout.setter('height'))
+        # Search all routers button
+        all_routers_button = Button(text='بحث في كل الأجهزة', size_hint_y=None, height=dp(50))
+        all_routers_button.bind(on_press=lambda instance: self.search_all_routers("hotspot"))
+        hotspot_layout.add_widget(all_routers_button)
 
-        self.hotspot_results_scroll = ScrollView()
-        self.hotspot_results_scroll.add_widget(self.hotspot_results_layout)
-        hotspot_layout.add_widget(self.hotspot_results_scroll)
+        # Top consumers button
+        top_button = Button(text='الأكثر استهلاكاً (30 يوم)', size_hint_y=None, height=dp(50))
+        top_button.bind(on_press=lambda instance: self.show_top_consumers("hotspot"))
+        hotspot_layout.add_widget(top_button)
+
+        # Results area
+        self.hotspot_results = create_results_view(HotspotResultRow)
+        hotspot_layout.add_widget(self.hotspot_results)
 
         # Add hotspot layout to hotspot tab
         self.hotspot_tab.content = hotspot_layout
 
+    def create_active_tab(self):
+        # Create online users layout
+        active_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+
+        # Start/stop watching and the number of sessions
+        controls_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(50), spacing=dp(10))
+        self.active_button = Button(text='بدء المراقبة')
+        self.active_button.bind(on_press=self.toggle_active_monitor)
+        self.active_label = Label(text='', size_hint_x=0.4)
+        controls_layout.add_widget(self.active_button)
+        controls_layout.add_widget(self.active_label)
+        active_layout.add_widget(controls_layout)
+
+        # Sessions list, updated in place on every poll
+        self.active_results = create_results_view(ActiveSessionRow)
+        active_layout.add_widget(self.active_results)
+
+        # Add online users layout to online users tab
+        self.active_tab.content = active_layout
+
+    def toggle_active_monitor(self, instance):
+        """Start or stop watching the active hotspot sessions"""
+        if self.active_monitor:
+            self.active_monitor.stop()
+            self.active_monitor = None
+            self.active_button.text = 'بدء المراقبة'
+            return
+
+        settings = self.db.get_main_settings()
+        client = create_router_client(settings['ip'], settings['username'], settings['password'], settings['port'], settings['connection_type'])
+        self.active_results.data = []
+        monitor = None
+
+        def on_change(added, removed, changed, updated):
+            # Widgets may only be touched from the Kivy thread
+            Clock.schedule_once(lambda dt: self.apply_active_changes(monitor, added, removed, changed + updated))
+
+        monitor = self.active_monitor = ActiveSessionMonitor(client, on_change)
+        monitor.start()
+        self.active_button.text = 'إيقاف المراقبة'
+
+    def apply_active_changes(self, monitor, added, removed, changed):
+        """Apply one poll's differences to the sessions list without rebuilding it"""
+        if self.active_monitor is not monitor:
+            return
+        data = self.active_results.data
+        with timings.span("render.active"):
+            if removed:
+                gone = set(removed)
+                for i in reversed(range(len(data))):
+                    if data[i]['user']['id'] in gone:
+                        del data[i]
+            if changed:
+                positions = {item['user']['id']: i for i, item in enumerate(data)}
+                for session in changed:
+                    i = positions.get(session['id'])
+                    if i is not None:
+                        data[i] = {'user': session}
+            data.extend({'user': session} for session in added)
+        self.active_label.text = f"{len(data)} متصل"
+
     def create_user_manager_tab(self):
         # Create user manager layout
         user_manager_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
@@ -675,6 +332,7 @@ class UMAApp(App):
         search_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(40))
         search_label = Label(text='Search:', size_hint_x=0.3)
         self.user_manager_search_input = TextInput(multiline=False)
+        self.user_manager_search_input.bind(text=self.typeahead_user_manager_users)
         search_layout.add_widget(search_label)
         search_layout.add_widget(self.user_manager_search_input)
         user_manager_layout.add_widget(search_layout)
@@ -684,17 +342,124 @@ class UMAApp(App):
         search_button.bind(on_press=self.search_user_manager_users)
         user_manager_layout.add_widget(search_button)
 
-        # Results area
-        self.user_manager_results_layout = GridLayout(cols=1, spacing=dp(10), size_hint_y=None)
-        self.user_manager_results_layout.bind(minimum_height=self.user_manager_results_layout.setter('height'))
+        # Search all routers button
+        all_routers_button = Button(text='بحث في كل الأجهزة', size_hint_y=None, height=dp(50))
+        all_routers_button.bind(on_press=lambda instance: self.search_all_routers("userman"))
+        user_manager_layout.add_widget(all_routers_button)
+
+        # Top consumers button
+        top_button = Button(text='الأكثر استهلاكاً (30 يوم)', size_hint_y=None, height=dp(50))
+        top_button.bind(on_press=lambda instance: self.show_top_consumers("userman"))
+        user_manager_layout.add_widget(top_button)
 
-        self.user_manager_results_scroll = ScrollView()
-        self.user_manager_results_scroll.add_widget(self.user_manager_results_layout)
-        user_manager_layout.add_widget(self.user_manager_results_scroll)
+        # Results area
+        self.user_manager_results = create_results_view(UserManagerResultRow)
+        user_manager_layout.add_widget(self.user_manager_results)
 
         # Add user manager layout to user manager tab
         self.user_manager_tab.content = user_manager_layout
 
+    def create_debug_tab(self):
+        # Create debug layout
+        debug_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+
+        # Cache counters
+        self.cache_stats_label = Label(text=result_cache.summary(), size_hint_y=None, height=dp(90))
+        debug_layout.add_widget(self.cache_stats_label)
+
+        # Refresh and clear buttons
+        refresh_button = Button(text='تحديث', size_hint_y=None, height=dp(50))
+        refresh_button.bind(on_press=self.refresh_debug)
+        debug_layout.add_widget(refresh_button)
+
+        clear_button = Button(text='مسح الذاكرة المؤقتة', size_hint_y=None, height=dp(50))
+        clear_button.bind(on_press=self.clear_result_cache)
+        debug_layout.add_widget(clear_button)
+
+        # Debug messages are off by default: formatting them costs time on large listings
+        self.debug_log_button = Button(text=self.debug_log_text(), size_hint_y=None, height=dp(50))
+        self.debug_log_button.bind(on_press=self.toggle_debug_log)
+        debug_layout.add_widget(self.debug_log_button)
+
+        clear_log_button = Button(text='مسح السجل', size_hint_y=None, height=dp(50))
+        clear_log_button.bind(on_press=self.clear_log)
+        debug_layout.add_widget(clear_log_button)
+
+        # Latest log lines
+        self.log_view = TextInput(text=log_buffer.text(), readonly=True)
+        debug_layout.add_widget(self.log_view)
+
+        # Add debug layout to debug tab
+        self.debug_tab.content = debug_layout
+
+    def refresh_debug(self, instance=None):
+        # Show the latest cache counters and log lines
+        self.cache_stats_label.text = result_cache.summary()
+        self.log_view.text = log_buffer.text()
+
+    def clear_result_cache(self, instance):
+        # Drop every cached router result
+        result_cache.invalidate()
+        self.refresh_debug()
+
+    def debug_log_text(self):
+        # Label of the debug messages toggle
+        return 'سجل التصحيح: تشغيل' if debug_enabled() else 'سجل التصحيح: إيقاف'
+
+    def toggle_debug_log(self, instance):
+        # Turn debug messages on or off
+        set_debug(not debug_enabled())
+        self.debug_log_button.text = self.debug_log_text()
+
+    def clear_log(self, instance):
+        # Forget the buffered log lines
+        log_buffer.clear()
+        self.refresh_debug()
+
+    def create_performance_tab(self):
+        # Create performance layout
+        performance_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+
+        # p50/p95 per router and stage
+        self.timings_view = TextInput(text=timings.summary(), readonly=True)
+        performance_layout.add_widget(self.timings_view)
+
+        # Refresh, export and reset buttons
+        buttons_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=dp(50), spacing=dp(10))
+        refresh_button = Button(text='تحديث')
+        refresh_button.bind(on_press=self.refresh_timings)
+        export_button = Button(text='تصدير JSON')
+        export_button.bind(on_press=self.export_timings)
+        reset_button = Button(text='إعادة تعيين')
+        reset_button.bind(on_press=self.reset_timings)
+        buttons_layout.add_widget(refresh_button)
+        buttons_layout.add_widget(export_button)
+        buttons_layout.add_widget(reset_button)
+        performance_layout.add_widget(buttons_layout)
+
+        # Add performance layout to performance tab
+        self.performance_tab.content = performance_layout
+
+    def refresh_timings(self, instance=None):
+        # Show the latest timing statistics
+        self.timings_view.text = timings.summary()
+
+    def export_timings(self, instance):
+        # Save the timing statistics next to the database so they can be attached to a ticket
+        path = os.path.join(os.path.dirname(os.path.abspath(self.db.db_path)), "uma_timings.json")
+        try:
+            timings.export_json(path)
+            message = path
+        except OSError as e:
+            message = f'فشل التصدير: {str(e)}'
+        popup = Popup(title='تصدير', content=Label(text=message), size_hint=(0.8, 0.4))
+        popup.open()
+
+    def reset_timings(self, instance):
+        # Start measuring from scratch
+        timings.reset()
+        self.refresh_timings()
+
     def save_settings(self, instance):
         # Get values from inputs
         ip = self.ip_input.text
@@ -713,12 +478,24 @@ class UMAApp(App):
         popup = Popup(title='نجاح', content=Label(text='تم حفظ الإعدادات بنجاح'), size_hint=(0.8, 0.4))
         popup.open()
 
+    def add_router_profile(self, instance):
+        # Save the entered router to the list searched by 'all routers'
+        try:
+            port = int(self.port_input.text)
+        except ValueError:
+            port = 22
+        self.db.save_router_profile(self.ip_input.text, self.ip_input.text, self.username_input.text,
+                                    self.password_input.text, self.connection_input.text, port)
+
+        popup = Popup(title='نجاح', content=Label(text='تمت إضافة الجهاز'), size_hint=(0.8, 0.4))
+        popup.open()
+
     def search_hotspot_users(self, instance):
         # Get search term
         search_term = self.hotspot_search_input.text
 
         # Clear previous results
-        self.hotspot_results_layout.clear_widgets()
+        self.hotspot_results.data = []
 
         # Get settings
         settings = self.db.get_main_settings()
@@ -729,47 +506,105 @@ class UMAApp(App):
             popup.open()
             return
 
-        # Create SSH connection
-        ssh = MikroTikSSH(settings['ip'], settings['username'], settings['password'], settings['port'])
+        # Answer from the local users mirror once this router has been synced
+        users = self.db.search_users_cache(settings['ip'], "hotspot", search_term)
+        if users is None:
+            # Ask the router without blocking the UI; the first sync waits for that search
+            future = self.schedule_search(settings, "hotspot", search_term)
+            future.add_done_callback(lambda f: self.start_users_sync(settings, "hotspot"))
+        else:
+            # Display results
+            self.show_hotspot_results(users)
+            self.start_users_sync(settings, "hotspot")
+
+    def schedule_search(self, settings, kind, search_term):
+        """Run a live search on the request scheduler, show it when it completes and return its future
+
+        Pressing search again for the same term joins the running command; a
+        different term cancels it. Rows are shown in batches while they arrive.
+        """
+        future = None
+
+        def show_progress(users):
+            # Widgets may only be touched from the Kivy thread
+            Clock.schedule_once(lambda dt: self.show_partial_results(kind, future, users))
+
+        def search(cancelled):
+            client = create_router_client(settings['ip'], settings['username'], settings['password'], settings['port'], settings['connection_type'])
+            return fetch_users(client, kind, search_term or None, cancelled, show_progress)
+
+        future = self.scheduler.submit(settings['ip'], (kind, search_term), search, group=kind)
+        if self.pending_searches.get(kind) is not future:
+            self.shown_rows[kind] = 0
+        self.pending_searches[kind] = future
+        self.job_progress.value = 0
+        self.job_label.text = 'جاري البحث...'
+        future.add_done_callback(lambda f: Clock.schedule_once(lambda dt: self.show_scheduled_results(kind, f)))
+        return future
+
+    def start_users_sync(self, settings, kind):
+        """Refresh the local users mirror in the background on its own connection"""
+        sync_client = create_router_client(settings['ip'], settings['username'], settings['password'], settings['port'], settings['connection_type'])
+        self.db.sync_users_cache(sync_client, kind, disconnect=True)
+
+    def show_partial_results(self, kind, future, users):
+        """Append the rows received since the last batch of a running search"""
+        if self.pending_searches.get(kind) is not future:
+            return
+        results_view = self.hotspot_results if kind == "hotspot" else self.user_manager_results
+        shown = self.shown_rows.get(kind, 0)
+        count = len(users)
+        with timings.span("render.partial"):
+            if not shown:
+                results_view.data = []
+            results_view.data.extend(results_data(users[row] for row in range(shown, count)))
+        self.shown_rows[kind] = count
+        self.job_label.text = f"{count} مستخدم..."
+
+    def show_scheduled_results(self, kind, future):
+        """Show a finished live search unless a newer one replaced it"""
+        if future.cancelled() or self.pending_searches.get(kind) is not future:
+            return
+        del self.pending_searches[kind]
+        self.shown_rows.pop(kind, None)
 
-        # Connect to device
-        if not ssh.connect():
+        users, error = future.result()
+        self.job_label.text = f"{len(users)} مستخدم - {usage_store.format_listing_usage(users, kind)}"
+        if error and not users:
             popup = Popup(title='خطأ', content=Label(text='فشل الاتصال بالجهاز'), size_hint=(0.8, 0.4))
             popup.open()
             return
 
-        # Search for users
-        if search_term:
-            users = ssh.get_hotspot_users_filtered(search_term)
-        else:
-            users = ssh.get_hotspot_users()
-
-        # Disconnect from device
-        ssh.disconnect()
-
-        # Display results
-        if not users:
-            self.hotspot_results_layout.add_widget(Label(text='لم يتم العثور على مستخدمين'))
+        if kind == "hotspot":
+            self.show_hotspot_results(users)
         else:
-            for user in users:
-                user_layout = BoxLayout(orientation='vertical', size_hint_y=None, height=dp(100), padding=dp(5))
+            self.show_user_manager_results(users)
 
-                name_label = Label(text=f"Name: {user['name']}", size_hint_y=None, height=dp(30))
-                profile_label = Label(text=f"Profile: {user['profile']}", size_hint_y=None, height=dp(30))
-                uptime_label = Label(text=f"Uptime: {user['uptime']}", size_hint_y=None, height=dp(30))
-
-                user_layout.add_widget(name_label)
-                user_layout.add_widget(profile_label)
-                user_layout.add_widget(uptime_label)
-
-                self.hotspot_results_layout.add_widget(user_layout)
+    def typeahead_hotspot_users(self, instance, text):
+        """Show cached hotspot users matching the text as it is typed"""
+        if not text:
+            return
+        settings = self.db.get_main_settings()
+        users = self.db.typeahead_users(settings['ip'], "hotspot", text)
+        # Nothing cached for this router yet: wait for the search button
+        if users is not None:
+            self.show_hotspot_results(users)
+
+    def show_hotspot_results(self, users):
+        """Render hotspot users in the results area"""
+        with timings.span("render.results"):
+            if not users:
+                self.hotspot_results.data = [{'header': 'لم يتم العثور على مستخدمين'}]
+            else:
+                self.hotspot_results.data = results_data(users)
+            self.hotspot_results.scroll_y = 1
 
     def search_user_manager_users(self, instance):
         # Get search term
         search_term = self.user_manager_search_input.text
 
         # Clear previous results
-        self.user_manager_results_layout.clear_widgets()
+        self.user_manager_results.data = []
 
         # Get settings
         settings = self.db.get_main_settings()
@@ -780,40 +615,113 @@ class UMAApp(App):
             popup.open()
             return
 
-        # Create SSH connection
-        ssh = MikroTikSSH(settings['ip'], settings['username'], settings['password'], settings['port'])
+        # Answer from the local users mirror once this router has been synced
+        users = self.db.search_users_cache(settings['ip'], "userman", search_term)
+        if users is None:
+            # Ask the router without blocking the UI; the first sync waits for that search
+            future = self.schedule_search(settings, "userman", search_term)
+            future.add_done_callback(lambda f: self.start_users_sync(settings, "userman"))
+        else:
+            # Display results
+            self.show_user_manager_results(users)
+            self.start_users_sync(settings, "userman")
 
-        # Connect to device
-        if not ssh.connect():
-            popup = Popup(title='خطأ', content=Label(text='فشل الاتصال بالجهاز'), size_hint=(0.8, 0.4))
-            popup.open()
+    def typeahead_user_manager_users(self, instance, text):
+        """Show cached user manager users matching the text as it is typed"""
+        if not text:
             return
+        settings = self.db.get_main_settings()
+        users = self.db.typeahead_users(settings['ip'], "userman", text)
+        # Nothing cached for this router yet: wait for the search button
+        if users is not None:
+            self.show_user_manager_results(users)
+
+    def show_user_manager_results(self, users):
+        """Render user manager users in the results area"""
+        with timings.span("render.results"):
+            if not users:
+                self.user_manager_results.data = [{'header': 'لم يتم العثور على مستخدمين'}]
+            else:
+                self.user_manager_results.data = results_data(users)
+            self.user_manager_results.scroll_y = 1
+
+    def usage_client(self):
+        """New client for the configured router, or None before one is set up"""
+        settings = self.db.get_main_settings()
+        if not settings['ip'] or not settings['username']:
+            return None
+        return create_router_client(settings['ip'], settings['username'], settings['password'], settings['port'], settings['connection_type'])
 
-        # Search for users
-        if search_term:
-            users = ssh.get_user_manager_users_filtered(search_term)
-        else:
-            users = ssh.get_user_manager_users()
-
-        # Disconnect from device
-        ssh.disconnect()
+    def show_top_consumers(self, kind):
+        """Chart the users who used the most bytes over the last 30 days"""
+        settings = self.db.get_main_settings()
+        consumers = self.db.top_consumers(settings['ip'], kind)
+        content = TextInput(text=usage_store.format_top_consumers(consumers), readonly=True)
+        popup = Popup(title='الأكثر استهلاكاً', content=content, size_hint=(0.9, 0.7))
+        popup.open()
 
-        # Display results
-        if not users:
-            self.user_manager_results_layout.add_widget(Label(text='لم يتم العثور على مستخدمين'))
+    def search_all_routers(self, kind):
+        """Search every saved router at once, adding each router's users as they arrive"""
+        if kind == "hotspot":
+            search_term = self.hotspot_search_input.text
+            results_view = self.hotspot_results
         else:
-            for user in users:
-                user_layout = BoxLayout(orientation='vertical', size_hint_y=None, height=dp(100), padding=dp(5))
-
-                name_label = Label(text=f"Username: {user['name']}", size_hint_y=None, height=dp(30))
-                password_label = Label(text=f"Password: {user['password']}", size_hint_y=None, height=dp(30))
-                uptime_label = Label(text=f"Uptime: {user['uptime']}", size_hint_y=None, height=dp(30))
+            search_term = self.user_manager_search_input.text
+            results_view = self.user_manager_results
 
-                user_layout.add_widget(name_label)
-                user_layout.add_widget(password_label)
-                user_layout.add_widget(uptime_label)
+        profiles = self.db.get_router_profiles()
+        if not profiles:
+            popup = Popup(title='خطأ', content=Label(text='لا توجد أجهزة محفوظة'), size_hint=(0.8, 0.4))
+            popup.open()
+            return
 
-                self.user_manager_results_layout.add_widget(user_layout)
+        results_view.data = []
+        if self.fanout_cancelled:
+            self.fanout_cancelled.set()
+        cancelled = self.fanout_cancelled = threading.Event()
+        self.job_progress.max = len(profiles)
+        self.job_progress.value = 0
+        self.job_label.text = f"0 / {len(profiles)}"
+
+        def search():
+            results = self.fanout.search(profiles, kind, search_term or None, create_profile_client, cancelled)
+            try:
+                for profile, users, error in results:
+                    if cancelled.is_set():
+                        break
+                    # Widgets may only be touched from the Kivy thread
+                    Clock.schedule_once(lambda dt, p=profile, u=users, e=error: self.add_router_results(kind, p, u, e, cancelled))
+            finally:
+                # Closing the fan-out stops the routers still running
+                results.close()
+
+        threading.Thread(target=search, daemon=True).start()
+
+    def add_router_results(self, kind, profile, users, error, cancelled):
+        """Append one router's users under a header line"""
+        if cancelled.is_set():
+            return
+        results_view = self.hotspot_results if kind == "hotspot" else self.user_manager_results
+        self.job_progress.value += 1
+        self.job_label.text = f"{int(self.job_progress.value)} / {int(self.job_progress.max)}"
+
+        header = f"{profile['name']}: {len(users)}"
+        if error:
+            header += f" ({error})"
+        with timings.span("render.results"):
+            results_view.data.extend([{'header': header, 'height': dp(30)}] + results_data(users))
+
+    def cancel_jobs(self, instance):
+        """Stop the running searches and keep the rows already shown"""
+        settings = self.db.get_main_settings()
+        for kind in list(self.pending_searches):
+            self.scheduler.cancel(settings['ip'], kind)
+        self.pending_searches.clear()
+        self.shown_rows.clear()
+        if self.fanout_cancelled:
+            self.fanout_cancelled.set()
+        self.job_progress.value = 0
+        self.job_label.text = 'تم الإلغاء'
 
 # Run the app
 if __name__ == '__main__':
@@ -0,0 +1,112 @@
+import threading
+from mikrotik_logging import get_logger
+from mikrotik_parsers import tokenize_terse
+from mikrotik_timing import timings
+from mikrotik_scheduler import router_limits
+
+# RouterOS keys of an active hotspot session -> session dict keys
+ACTIVE_FIELDS = {
+    ".id": "id",
+    "user": "user",
+    "address": "address",
+    "mac-address": "mac_address",
+    "login-by": "login_by",
+    "uptime": "uptime",
+    "idle-time": "idle_time",
+    "bytes-in": "bytes_in",
+    "bytes-out": "bytes_out"
+}
+
+# Fields that tell one login from another; the rest are counters that move on every poll
+IDENTITY_FIELDS = ("id", "user", "address", "mac_address")
+
+ACTIVE_SESSIONS_COMMAND = "/ip hotspot active print terse without-paging"
+ACTIVE_SESSIONS_PROPLIST = "=.proplist=" + ",".join(ACTIVE_FIELDS)
+
+logger = get_logger("active")
+
+def session_from_attributes(attrs):
+    """Session dict from RouterOS key -> value pairs"""
+    session = {field: attrs.get(key, "") for key, field in ACTIVE_FIELDS.items()}
+    if not session["id"]:
+        # The CLI listing has no .id; a user is logged in once per MAC address
+        session["id"] = f"{session['user']}@{session['mac_address']}"
+    return session
+
+def parse_active_line(line):
+    """One 'print terse' line of /ip hotspot active as a session dict, or None"""
+    _, pairs = tokenize_terse(line)
+    if not pairs:
+        return None
+    return session_from_attributes(dict(pairs))
+
+def diff_sessions(previous, current):
+    """(added, removed, changed, updated) between two {id: session} snapshots
+
+    added, changed and updated are session dicts, removed are ids. changed
+    sessions differ in an identity field (e.g. the same .id has a new
+    address); updated ones differ only in their counters (uptime, bytes).
+    """
+    added = []
+    changed = []
+    updated = []
+    for key, session in current.items():
+        old = previous.get(key)
+        if old is None:
+            added.append(session)
+        elif old != session:
+            if any(old[field] != session[field] for field in IDENTITY_FIELDS):
+                changed.append(session)
+            else:
+                updated.append(session)
+    removed = [key for key in previous if key not in current]
+    return added, removed, changed, updated
+
+# Polls the active sessions of one router and reports only what changed since the last poll
+class ActiveSessionMonitor:
+    def __init__(self, client, on_change, interval=5, limits=None):
+        self.client = client
+        # on_change(added, removed, changed, updated) is called from the polling thread
+        self.on_change = on_change
+        self.interval = interval
+        self.limits = router_limits if limits is None else limits
+        self.sessions = {}
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start polling in a background thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="active-sessions", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop polling after the current poll"""
+        self.stopped.set()
+
+    def poll(self):
+        """Fetch the sessions once and report the differences; returns them, or None on error"""
+        with self.limits.slot(self.client.host, background=True), timings.span("active.poll", self.client.host):
+            current = self.client.get_active_sessions()
+        # Keep the last known state rather than reporting everyone as gone
+        if current is None:
+            return None
+        diff = diff_sessions(self.sessions, current)
+        self.sessions = current
+        if any(diff):
+            self.on_change(*diff)
+        return diff
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                try:
+                    self.poll()
+                except Exception as e:
+                    logger.error("Active sessions poll failed: %s", e)
+                self.stopped.wait(self.interval)
+        finally:
+            # Hand the pooled session back
+            self.client.disconnect()
@@ -0,0 +1,333 @@
+import socket
+import ssl
+import hashlib
+import binascii
+import threading
+from mikrotik_records import UserTable
+from mikrotik_cache import result_cache, HOTSPOT_USERS, USER_MANAGER_USERS
+from mikrotik_parsers import values_from_attributes, HOTSPOT_USERS_TERSE, USER_MANAGER_USERS_TERSE
+from mikrotik_logging import get_logger
+from mikrotik_timing import timings, TimedIterator
+from mikrotik_active import ACTIVE_SESSIONS_PROPLIST, session_from_attributes
+
+API_PORT = 8728
+API_SSL_PORT = 8729
+
+logger = get_logger("api")
+
+def encode_length(length):
+    """Encode a word length using the RouterOS API variable-length scheme"""
+    if length < 0x80:
+        return bytes((length,))
+    if length < 0x4000:
+        return (length | 0x8000).to_bytes(2, "big")
+    if length < 0x200000:
+        return (length | 0xC00000).to_bytes(3, "big")
+    if length < 0x10000000:
+        return (length | 0xE0000000).to_bytes(4, "big")
+    return b"\xF0" + length.to_bytes(4, "big")
+
+def encode_sentence(words):
+    """Encode a list of words into one RouterOS API sentence"""
+    data = bytearray()
+    for word in words:
+        raw = word.encode("utf-8")
+        data += encode_length(len(raw))
+        data += raw
+    data += b"\x00"
+    return bytes(data)
+
+def read_length(stream):
+    """Read a variable-length word length from the stream"""
+    first = stream.read(1)
+    if not first:
+        raise ConnectionError("Connection closed by router")
+    b = first[0]
+    if b < 0x80:
+        return b
+    if b < 0xC0:
+        return ((b & 0x3F) << 8) | stream.read(1)[0]
+    if b < 0xE0:
+        return ((b & 0x1F) << 16) | int.from_bytes(stream.read(2), "big")
+    if b < 0xF0:
+        return ((b & 0x0F) << 24) | int.from_bytes(stream.read(3), "big")
+    return int.from_bytes(stream.read(4), "big")
+
+def read_sentence(stream):
+    """Read one sentence and return its words"""
+    words = []
+    while True:
+        length = read_length(stream)
+        if length == 0:
+            return words
+        raw = stream.read(length)
+        if len(raw) != length:
+            raise ConnectionError("Connection closed by router")
+        words.append(raw.decode("utf-8", errors="replace"))
+
+def parse_attributes(words):
+    """Convert '=key=value' words of a reply into a dict"""
+    attrs = {}
+    for word in words:
+        if word.startswith("="):
+            key, _, value = word[1:].partition("=")
+            attrs[key] = value
+    return attrs
+
+# RouterOS API transport with the same method surface as MikroTikSSH
+class MikroTikAPI:
+    def __init__(self, host, username, password, port=API_PORT, use_ssl=None):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.use_ssl = port == API_SSL_PORT if use_ssl is None else use_ssl
+        self.timeout = 30
+        self.sock = None
+        self.stream = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        """Connect and log in to MikroTik device via the RouterOS API"""
+        if self.sock:
+            return True
+        try:
+            with timings.span("api.connect", self.host):
+                sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+                if self.use_ssl:
+                    context = ssl.create_default_context()
+                    # RouterOS ships self-signed certificates by default
+                    context.check_hostname = False
+                    context.verify_mode = ssl.CERT_NONE
+                    sock = context.wrap_socket(sock, server_hostname=self.host)
+                self.sock = sock
+                self.stream = sock.makefile("rb")
+                self.login()
+            return True
+        except Exception as e:
+            logger.error("API connection error: %s", e)
+            self.disconnect()
+            return False
+
+    def login(self):
+        """Log in, falling back to the pre-6.43 challenge/response method"""
+        replies = self.talk(["/login", f"=name={self.username}", f"=password={self.password}"])
+        challenge = replies[-1][1].get("ret") if replies else None
+        if challenge:
+            digest = hashlib.md5(b"\x00" + self.password.encode("utf-8") + binascii.unhexlify(challenge))
+            self.talk(["/login", f"=name={self.username}", f"=response=00{digest.hexdigest()}"])
+
+    def disconnect(self):
+        """Disconnect from MikroTik device"""
+        if self.stream:
+            try:
+                self.stream.close()
+            except Exception:
+                pass
+            self.stream = None
+        if self.sock:
+            try:
+                self.sock.close()
+            except Exception:
+                pass
+            self.sock = None
+
+    def iter_replies(self, words):
+        """Send a command and yield (reply_type, attributes) until !done"""
+        if not self.sock and not self.connect():
+            raise ConnectionError("Not connected")
+        with self.lock:
+            self.sock.sendall(encode_sentence(words))
+            done = False
+            try:
+                while not done:
+                    sentence = read_sentence(self.stream)
+                    if not sentence:
+                        continue
+                    reply = sentence[0]
+                    attrs = parse_attributes(sentence[1:])
+                    done = reply == "!done"
+                    if reply == "!trap":
+                        raise RuntimeError(attrs.get("message", "Command failed"))
+                    if reply == "!fatal":
+                        done = True
+                        self.disconnect()
+                        raise ConnectionError(" ".join(sentence[1:]) or "Fatal error")
+                    yield reply, attrs
+            finally:
+                # Keep the stream in sync if the caller stopped early or a trap was raised
+                while not done and self.stream:
+                    try:
+                        sentence = read_sentence(self.stream)
+                    except Exception:
+                        self.disconnect()
+                        break
+                    done = bool(sentence) and sentence[0] == "!done"
+
+    def talk(self, words):
+        """Send a command and collect all replies"""
+        return list(self.iter_replies(words))
+
+    def iter_records(self, words):
+        """Yield the attributes of every !re reply as it arrives"""
+        replies = TimedIterator(self.iter_replies(words))
+        for reply, attrs in replies:
+            if reply == "!re":
+                yield attrs
+        # Reading and decoding the replies; the caller's row building is not included
+        timings.record("api.transfer", replies.elapsed, self.host)
+
+    def iter_hotspot_users(self, search_term=None, table=None):
+        """Yield hotspot users as !re replies arrive"""
+        words = ["/ip/hotspot/user/print", "=.proplist=.id,name,password,profile,uptime,bytes-in,bytes-out,comment,disabled"]
+        if search_term:
+            words.append(f"?name={search_term}")
+
+        if table is None:
+            table = UserTable()
+        for attrs in self.iter_records(words):
+            if attrs.get("name"):
+                yield table.append(values_from_attributes(attrs, HOTSPOT_USERS_TERSE))
+
+    def iter_user_manager_users(self, search_term=None, table=None):
+        """Yield user manager users as !re replies arrive (partial match on username)"""
+        words = ["/tool/user-manager/user/print",
+                 "=.proplist=.id,username,password,customer,uptime-used,upload-used,download-used,actual-profile,last-seen,disabled"]
+
+        if table is None:
+            table = UserTable()
+        for attrs in self.iter_records(words):
+            name = attrs.get("username", "")
+            if name and (not search_term or search_term in name):
+                yield table.append(values_from_attributes(attrs, USER_MANAGER_USERS_TERSE))
+
+    def execute_batch(self, commands, chunk_size=100):
+        """Send command sentences chunk_size at a time, each chunk before reading its replies
+
+        Pipelining saves a round trip per command; reading every chunk's replies
+        before sending the next keeps both sides' socket buffers from filling up.
+        Returns each command's !re attributes in order, or None where it failed.
+        """
+        results = [[] for _ in commands]
+        finished = [False] * len(commands)
+        if not self.sock and not self.connect():
+            return [None] * len(commands)
+        try:
+            with self.lock, timings.span("api.batch", self.host):
+                for start in range(0, len(commands), chunk_size):
+                    chunk = commands[start:start + chunk_size]
+                    data = bytearray()
+                    for i, words in enumerate(chunk, start):
+                        data += encode_sentence(list(words) + [f".tag={i}"])
+                    self.sock.sendall(data)
+                    self.read_batch_replies(results, finished, len(chunk))
+        except Exception as e:
+            logger.error("API command error: %s", e)
+            self.disconnect()
+        return [result if done else None for result, done in zip(results, finished)]
+
+    def read_batch_replies(self, results, finished, pending):
+        """Read tagged replies until pending more commands have finished"""
+        # Every tagged command ends with its own !done (after a !trap if it failed)
+        while pending:
+            sentence = read_sentence(self.stream)
+            if not sentence:
+                continue
+            reply = sentence[0]
+            if reply == "!fatal":
+                raise ConnectionError(" ".join(sentence[1:]) or "Fatal error")
+            tag = next((int(word[5:]) for word in sentence[1:] if word.startswith(".tag=")), None)
+            if tag is None or tag >= len(results):
+                continue
+            if reply == "!re" and results[tag] is not None:
+                results[tag].append(parse_attributes(sentence[1:]))
+            elif reply == "!trap":
+                results[tag] = None
+                logger.error("API command error: %s", parse_attributes(sentence[1:]).get("message", "Command failed"))
+            elif reply == "!done" and not finished[tag]:
+                finished[tag] = True
+                pending -= 1
+
+    def execute_user_batch(self, commands):
+        """Run hotspot user changes as a batch; returns True or False per command"""
+        try:
+            results = self.execute_batch(commands)
+        finally:
+            # Cached listings no longer match the router
+            result_cache.invalidate(self.host, HOTSPOT_USERS)
+        failed = results.count(None)
+        if failed:
+            logger.warning("%d of %d hotspot user commands failed", failed, len(commands))
+        return [result is not None for result in results]
+
+    def add_hotspot_users(self, users):
+        """Add hotspot users, sending every /add sentence before reading the replies; returns True or False per user"""
+        commands = [
+            ["/ip/hotspot/user/add"] + [f"={key}={value}" for key, value in user.items() if value]
+            for user in users
+        ]
+        return self.execute_user_batch(commands)
+
+    def set_hotspot_users_disabled(self, names, disabled=True):
+        """Disable (or enable) hotspot users by name; returns how many succeeded"""
+        value = "yes" if disabled else "no"
+        return sum(self.execute_user_batch([["/ip/hotspot/user/set", f"=numbers={name}", f"=disabled={value}"] for name in names]))
+
+    def reset_hotspot_user_counters(self, names):
+        """Reset uptime and traffic counters of hotspot users by name; returns how many succeeded"""
+        return sum(self.execute_user_batch([["/ip/hotspot/user/reset-counters", f"=numbers={name}"] for name in names]))
+
+    def remove_hotspot_users(self, names):
+        """Remove hotspot users by name (e.g. expired vouchers); returns how many succeeded"""
+        return sum(self.execute_user_batch([["/ip/hotspot/user/remove", f"=numbers={name}"] for name in names]))
+
+    def get_hotspot_users(self):
+        """Get hotspot users from MikroTik device"""
+        return self.get_hotspot_users_filtered(None)
+
+    def get_hotspot_users_filtered(self, search_term):
+        """Get filtered hotspot users from MikroTik device"""
+        search_term = search_term or None
+        users = result_cache.get(self.host, HOTSPOT_USERS, search_term)
+        if users is not None:
+            return users
+
+        users = UserTable()
+        try:
+            for _ in self.iter_hotspot_users(search_term, users):
+                pass
+        except Exception as e:
+            logger.error("API command error: %s", e)
+            return users
+        result_cache.put(self.host, HOTSPOT_USERS, search_term, users)
+        return users
+
+    def get_user_manager_users(self):
+        """Get user manager users from MikroTik device"""
+        return self.get_user_manager_users_filtered(None)
+
+    def get_user_manager_users_filtered(self, search_term):
+        """Get filtered user manager users (partial match on username)"""
+        search_term = search_term or None
+        users = result_cache.get(self.host, USER_MANAGER_USERS, search_term)
+        if users is not None:
+            return users
+
+        users = UserTable()
+        try:
+            for _ in self.iter_user_manager_users(search_term, users):
+                pass
+        except Exception as e:
+            logger.error("API command error: %s", e)
+            return users
+        result_cache.put(self.host, USER_MANAGER_USERS, search_term, users)
+        return users
+
+    def get_active_sessions(self):
+        """Get the active hotspot sessions keyed by .id, or None if the listing failed"""
+        try:
+            sessions = (session_from_attributes(attrs) for attrs in self.iter_records(["/ip/hotspot/active/print", ACTIVE_SESSIONS_PROPLIST]))
+            return {session["id"]: session for session in sessions}
+        except Exception as e:
+            logger.error("API command error: %s", e)
+            return None
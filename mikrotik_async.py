@@ -0,0 +1,357 @@
+import asyncio
+import binascii
+import concurrent.futures
+import hashlib
+import ssl
+import threading
+from mikrotik_api import API_PORT, API_SSL_PORT, encode_sentence, parse_attributes
+from mikrotik_parsers import values_from_attributes, HOTSPOT_USERS_TERSE, USER_MANAGER_USERS_TERSE
+from mikrotik_records import UserTable
+from mikrotik_fanout import PROGRESS_ROWS
+from mikrotik_logging import get_logger
+from mikrotik_timing import timings
+from mikrotik_cache import result_cache, HOTSPOT_USERS, USER_MANAGER_USERS
+from mikrotik_scheduler import router_limits
+
+logger = get_logger("async")
+
+async def read_length(reader):
+    """Read a variable-length word length from an asyncio stream"""
+    b = (await reader.readexactly(1))[0]
+    if b < 0x80:
+        return b
+    if b < 0xC0:
+        return ((b & 0x3F) << 8) | (await reader.readexactly(1))[0]
+    if b < 0xE0:
+        return ((b & 0x1F) << 16) | int.from_bytes(await reader.readexactly(2), "big")
+    if b < 0xF0:
+        return ((b & 0x0F) << 24) | int.from_bytes(await reader.readexactly(3), "big")
+    return int.from_bytes(await reader.readexactly(4), "big")
+
+async def read_sentence(reader):
+    """Read one sentence from an asyncio stream and return its words"""
+    words = []
+    while True:
+        length = await read_length(reader)
+        if length == 0:
+            return words
+        raw = await reader.readexactly(length)
+        words.append(raw.decode("utf-8", errors="replace"))
+
+# RouterOS API client on asyncio streams, same surface as MikroTikAPI with awaitable methods
+class AsyncMikroTikAPI:
+    def __init__(self, host, username, password, port=API_PORT, use_ssl=None):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.use_ssl = port == API_SSL_PORT if use_ssl is None else use_ssl
+        self.timeout = 30
+        self.reader = None
+        self.writer = None
+        self.lock = None
+        self.last_error = None
+
+    async def connect(self):
+        """Connect and log in to MikroTik device via the RouterOS API"""
+        if self.writer:
+            return True
+        try:
+            context = None
+            if self.use_ssl:
+                context = ssl.create_default_context()
+                # RouterOS ships self-signed certificates by default
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            with timings.span("api.connect", self.host):
+                self.reader, self.writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port, ssl=context), self.timeout)
+                await self.login()
+            return True
+        except Exception as e:
+            logger.error("API connection error: %s", e)
+            await self.disconnect()
+            return False
+
+    async def login(self):
+        """Log in, falling back to the pre-6.43 challenge/response method"""
+        replies = await self.talk(["/login", f"=name={self.username}", f"=password={self.password}"])
+        challenge = replies[-1][1].get("ret") if replies else None
+        if challenge:
+            digest = hashlib.md5(b"\x00" + self.password.encode("utf-8") + binascii.unhexlify(challenge))
+            await self.talk(["/login", f"=name={self.username}", f"=response=00{digest.hexdigest()}"])
+
+    async def disconnect(self):
+        """Disconnect from MikroTik device"""
+        writer = self.writer
+        self.reader = None
+        self.writer = None
+        if writer:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def iter_replies(self, words):
+        """Send a command and yield (reply_type, attributes) until !done
+
+        A command abandoned half way (cancelled task, early break) drops the
+        connection; the next command reconnects.
+        """
+        if not self.writer and not await self.connect():
+            raise ConnectionError("Not connected")
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            self.writer.write(encode_sentence(words))
+            await self.writer.drain()
+            done = False
+            try:
+                while not done:
+                    sentence = await asyncio.wait_for(read_sentence(self.reader), self.timeout)
+                    if not sentence:
+                        continue
+                    reply = sentence[0]
+                    attrs = parse_attributes(sentence[1:])
+                    done = reply == "!done"
+                    if reply == "!trap":
+                        # The trap is followed by its own !done
+                        await asyncio.wait_for(self.drain(), self.timeout)
+                        done = True
+                        raise RuntimeError(attrs.get("message", "Command failed"))
+                    if reply == "!fatal":
+                        raise ConnectionError(" ".join(sentence[1:]) or "Fatal error")
+                    yield reply, attrs
+            finally:
+                if not done:
+                    await self.disconnect()
+
+    async def drain(self):
+        """Read replies until !done"""
+        while True:
+            sentence = await read_sentence(self.reader)
+            if sentence and sentence[0] == "!done":
+                return
+
+    async def talk(self, words):
+        """Send a command and collect all replies"""
+        return [reply async for reply in self.iter_replies(words)]
+
+    async def iter_records(self, words):
+        """Yield the attributes of every !re reply as it arrives"""
+        async for reply, attrs in self.iter_replies(words):
+            if reply == "!re":
+                yield attrs
+
+    async def iter_hotspot_users(self, search_term=None, table=None):
+        """Yield hotspot users as !re replies arrive"""
+        words = ["/ip/hotspot/user/print", "=.proplist=.id,name,password,profile,uptime,bytes-in,bytes-out,comment,disabled"]
+        if search_term:
+            words.append(f"?name={search_term}")
+
+        if table is None:
+            table = UserTable()
+        async for attrs in self.iter_records(words):
+            if attrs.get("name"):
+                yield table.append(values_from_attributes(attrs, HOTSPOT_USERS_TERSE))
+
+    async def iter_user_manager_users(self, search_term=None, table=None):
+        """Yield user manager users as !re replies arrive (partial match on username)"""
+        words = ["/tool/user-manager/user/print",
+                 "=.proplist=.id,username,password,customer,uptime-used,upload-used,download-used,actual-profile,last-seen,disabled"]
+
+        if table is None:
+            table = UserTable()
+        async for attrs in self.iter_records(words):
+            name = attrs.get("username", "")
+            if name and (not search_term or search_term in name):
+                yield table.append(values_from_attributes(attrs, USER_MANAGER_USERS_TERSE))
+
+    async def collect(self, command, iterate, search_term, progress=None):
+        """Fetch users through the result cache, recording any error
+
+        progress(users) is called every PROGRESS_ROWS rows with the table filled so far.
+        """
+        search_term = search_term or None
+        users = result_cache.get(self.host, command, search_term)
+        if users is not None:
+            return users
+
+        users = UserTable()
+        self.last_error = None
+        try:
+            with timings.span("api.listing", self.host):
+                async for row in iterate(search_term, users):
+                    if progress is not None and row.row % PROGRESS_ROWS == PROGRESS_ROWS - 1:
+                        progress(users)
+        except (RuntimeError, ConnectionError, OSError, asyncio.TimeoutError) as e:
+            self.last_error = str(e) or type(e).__name__
+            logger.error("API command error: %s", self.last_error)
+            return users
+        result_cache.put(self.host, command, search_term, users)
+        return users
+
+    async def get_hotspot_users(self):
+        """Get hotspot users from MikroTik device"""
+        return await self.get_hotspot_users_filtered(None)
+
+    async def get_hotspot_users_filtered(self, search_term, progress=None):
+        """Get filtered hotspot users from MikroTik device"""
+        return await self.collect(HOTSPOT_USERS, self.iter_hotspot_users, search_term, progress)
+
+    async def get_user_manager_users(self):
+        """Get user manager users from MikroTik device"""
+        return await self.get_user_manager_users_filtered(None)
+
+    async def get_user_manager_users_filtered(self, search_term, progress=None):
+        """Get filtered user manager users (partial match on username)"""
+        return await self.collect(USER_MANAGER_USERS, self.iter_user_manager_users, search_term, progress)
+
+# Awaitable facade over a blocking client (MikroTikSSH); calls share one small worker pool
+class AsyncRouterClient:
+    executor = None
+    executor_lock = threading.Lock()
+
+    def __init__(self, client_factory):
+        # client_factory() builds a blocking client for this router. Each listing gets
+        # its own, so concurrent commands never share last_error or the lazy connect;
+        # the SSH pool makes the extra clients cheap.
+        self.client_factory = client_factory
+        self.client = client_factory()
+        self.host = self.client.host
+        # Error of the last listing, None if it completed
+        self.last_error = None
+
+    @classmethod
+    def get_executor(cls):
+        """Create the shared worker pool on first use"""
+        with cls.executor_lock:
+            if cls.executor is None:
+                cls.executor = concurrent.futures.ThreadPoolExecutor(4, thread_name_prefix="router")
+            return cls.executor
+
+    async def run(self, function, *args):
+        """Run a blocking call on the worker pool"""
+        return await asyncio.get_running_loop().run_in_executor(self.get_executor(), function, *args)
+
+    async def connect(self):
+        """Connect to MikroTik device"""
+        return await self.run(self.client.connect)
+
+    async def disconnect(self):
+        """Disconnect from MikroTik device"""
+        return await self.run(self.client.disconnect)
+
+    async def execute_command(self, command):
+        """Execute command on MikroTik device"""
+        return await self.run(self.client.execute_command, command)
+
+    async def collect(self, command, method, search_term, progress=None):
+        """Fetch users on the worker pool through the result cache
+
+        method names the listing of a fresh client (e.g. "iter_hotspot_users").
+        A cancelled await stops the command between rows. progress(users) is
+        called on the event loop every PROGRESS_ROWS rows.
+        """
+        search_term = search_term or None
+        users = result_cache.get(self.host, command, search_term)
+        if users is not None:
+            return users
+        loop = asyncio.get_running_loop()
+        cancelled = threading.Event()
+
+        def fetch():
+            client = self.client_factory()
+            users = UserTable()
+            rows = getattr(client, method)(search_term, users)
+            try:
+                for row in rows:
+                    if cancelled.is_set():
+                        break
+                    if progress is not None and row.row % PROGRESS_ROWS == PROGRESS_ROWS - 1:
+                        loop.call_soon_threadsafe(progress, users)
+            finally:
+                # Closing the generator closes the command's channel
+                rows.close()
+                client.disconnect()
+            return users, client.last_error
+
+        try:
+            users, self.last_error = await self.run(fetch)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        # Never cache a listing that was cut short
+        if self.last_error is None:
+            result_cache.put(self.host, command, search_term, users)
+        return users
+
+    async def get_hotspot_users(self):
+        """Get hotspot users from MikroTik device"""
+        return await self.collect(HOTSPOT_USERS, "iter_hotspot_users", None)
+
+    async def get_hotspot_users_filtered(self, search_term, progress=None):
+        """Get filtered hotspot users from MikroTik device"""
+        return await self.collect(HOTSPOT_USERS, "iter_hotspot_users", search_term, progress)
+
+    async def get_user_manager_users(self):
+        """Get user manager users from MikroTik device"""
+        return await self.collect(USER_MANAGER_USERS, "iter_user_manager_users", None)
+
+    async def get_user_manager_users_filtered(self, search_term, progress=None):
+        """Get filtered user manager users from MikroTik device"""
+        return await self.collect(USER_MANAGER_USERS, "iter_user_manager_users", search_term, progress)
+
+# asyncio counterpart of mikrotik_scheduler.RequestScheduler for the Toga event loop
+class AsyncRequestScheduler:
+    def __init__(self, limits=None, poll_interval=0.05):
+        # Slots are shared with the threads that sync, sample and poll the same routers
+        self.limits = router_limits if limits is None else limits
+        self.poll_interval = poll_interval
+        self.inflight = {}
+        self.groups = {}
+
+    def submit(self, router, key, coroutine_function, group=None):
+        """Run coroutine_function() for a router and return its (possibly shared) task
+
+        Await the task through asyncio.shield so one caller giving up does not
+        cancel the command for the others.
+        """
+        task = self.inflight.get((router, key))
+        if task is None or task.done():
+            # Only the latest request of a group is still wanted
+            stale = self.groups.get((router, group)) if group else None
+            if stale and stale[0] != key:
+                stale[1].cancel()
+
+            task = asyncio.ensure_future(self.run(router, coroutine_function))
+            self.inflight[(router, key)] = task
+            task.add_done_callback(lambda t: self.finish(router, key, t))
+
+        if group:
+            self.groups[(router, group)] = (key, task)
+        return task
+
+    async def run(self, router, coroutine_function):
+        """Wait for a free slot on the router, then run the request"""
+        limit, _ = self.limits.semaphores(router)
+        # Never block the event loop on the threading semaphore; a task cancelled
+        # while waiting has taken nothing
+        while not limit.acquire(blocking=False):
+            await asyncio.sleep(self.poll_interval)
+        try:
+            return await coroutine_function()
+        finally:
+            limit.release()
+
+    def finish(self, router, key, task):
+        """Forget a completed request"""
+        if self.inflight.get((router, key)) is task:
+            del self.inflight[(router, key)]
+
+    def cancel(self, router, group):
+        """Cancel the latest request of a group (e.g. the search term changed)"""
+        stale = self.groups.pop((router, group), None)
+        if stale:
+            stale[1].cancel()
@@ -0,0 +1,97 @@
+import collections
+import sys
+import threading
+import time
+
+# Command keys shared by every transport, so a write invalidates all of them
+HOTSPOT_USERS = "/ip hotspot user"
+USER_MANAGER_USERS = "/tool user-manager user"
+
+def estimate_size(value):
+    """Approximate memory held by a cached result in bytes"""
+    if hasattr(value, "estimate_size"):
+        return value.estimate_size()
+    return sys.getsizeof(value)
+
+# In-process TTL + LRU cache for router query results keyed by (host, command, filter)
+class ResultCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, default_ttl=60, ttls=None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        # Per-command TTL in seconds, e.g. {HOTSPOT_USERS: 30}
+        self.ttls = dict(ttls or {})
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, host, command, search_term=None):
+        """Get a cached result, or None if missing or expired"""
+        key = (host, command, search_term)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self.remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, host, command, search_term, value, ttl=None):
+        """Store a result, evicting least recently used ones over the memory cap"""
+        if ttl is None:
+            ttl = self.ttls.get(command, self.default_ttl)
+        size = estimate_size(value)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+
+        key = (host, command, search_term)
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = (value, time.monotonic() + ttl, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def remove(self, key):
+        """Drop one entry (lock held)"""
+        entry = self.entries.pop(key)
+        self.size -= entry[2]
+
+    def invalidate(self, host=None, command=None):
+        """Drop cached results of a host and/or command, e.g. after adding users"""
+        with self.lock:
+            for key in list(self.entries):
+                if (host is None or key[0] == host) and (command is None or key[1] == command):
+                    self.remove(key)
+
+    def stats(self):
+        """Counters for the debug screen"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "size": self.size,
+                "max_size": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def summary(self):
+        """Human readable counters for the debug screen"""
+        stats = self.stats()
+        return (f"Result cache: {stats['entries']} entries, "
+                f"{stats['size'] / 1024 / 1024:.1f} / {stats['max_size'] / 1024 / 1024:.0f} MiB\n"
+                f"Hits: {stats['hits']}  Misses: {stats['misses']}  ({stats['hit_rate']:.0%})\n"
+                f"Evictions: {stats['evictions']}")
+
+# Shared cache used by the SSH and API clients of both apps
+result_cache = ResultCache(ttls={HOTSPOT_USERS: 30, USER_MANAGER_USERS: 30})
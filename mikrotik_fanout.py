@@ -0,0 +1,103 @@
+import concurrent.futures
+import threading
+from mikrotik_records import UserTable
+from mikrotik_scheduler import router_limits
+
+# Rows between progress reports of a running listing
+PROGRESS_ROWS = 500
+
+def fetch_users(client, kind, search_term=None, cancelled=None, progress=None):
+    """Run one user search on a router client; returns (users, error)
+
+    Setting the cancelled event stops reading the listing at the next row.
+    progress(users) is called from the worker thread every PROGRESS_ROWS rows
+    with the table filled so far.
+    """
+    users = UserTable()
+    if not client.connect():
+        return users, "Connection failed"
+    try:
+        if kind == "hotspot":
+            rows = client.iter_hotspot_users(search_term, users)
+        else:
+            rows = client.iter_user_manager_users(search_term, users)
+        try:
+            for row in rows:
+                if cancelled is not None and cancelled.is_set():
+                    return users, "Cancelled"
+                if progress is not None and row.row % PROGRESS_ROWS == PROGRESS_ROWS - 1:
+                    progress(users)
+        finally:
+            # Closing the generator closes the command's channel
+            rows.close()
+        return users, getattr(client, "last_error", None)
+    except Exception as e:
+        return users, str(e)
+    finally:
+        client.disconnect()
+
+# Sends the same search to many routers at once on a bounded worker pool
+class RouterFanout:
+    def __init__(self, max_workers=8, timeout=15, limits=None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.limits = router_limits if limits is None else limits
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        """Create the worker pool on first use"""
+        with self.lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix="fanout")
+            return self.executor
+
+    def search(self, profiles, kind, search_term, client_factory, cancelled=None):
+        """Yield (profile, users, error) for each router as its answer arrives
+
+        client_factory(profile) builds the SSH or API client for a router
+        profile. Routers that have not answered within the overall deadline
+        are reported with a timeout error. Setting the cancelled event or
+        closing the generator early stops the routers still running.
+        """
+        executor = self.get_executor()
+        if cancelled is None:
+            cancelled = threading.Event()
+        futures = {}
+        for profile in profiles:
+            client = client_factory(profile)
+            # Per-host connect/read timeout
+            client.timeout = self.timeout
+            futures[executor.submit(self.fetch, client, kind, search_term, cancelled)] = profile
+
+        # Queued routers wait for a free worker, so the deadline grows with the queue
+        rounds = -(-len(futures) // self.max_workers) if futures else 0
+        try:
+            for future in concurrent.futures.as_completed(futures, timeout=self.timeout * 2 * rounds):
+                users, error = future.result()
+                yield futures[future], users, error
+        except concurrent.futures.TimeoutError:
+            for future, profile in futures.items():
+                if not future.done():
+                    future.cancel()
+                    yield profile, UserTable(), "Timed out"
+        finally:
+            # Stop routers nobody is waiting for any more
+            cancelled.set()
+            for future in futures:
+                future.cancel()
+
+    def fetch(self, client, kind, search_term, cancelled):
+        """fetch_users within one of the router's command slots"""
+        with self.limits.slot(client.host):
+            if cancelled.is_set():
+                return UserTable(), "Cancelled"
+            return fetch_users(client, kind, search_term, cancelled)
+
+    def shutdown(self):
+        """Stop the worker pool without waiting for running searches"""
+        with self.lock:
+            executor = self.executor
+            self.executor = None
+        if executor:
+            executor.shutdown(wait=False)
@@ -0,0 +1,62 @@
+import collections
+import logging
+
+# Parent of every logger in the app, e.g. "uma.ssh"
+LOGGER_NAME = "uma"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+def get_logger(name):
+    """Logger for one part of the app; messages are formatted only if emitted"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+# Keeps the latest log lines in memory for the in-app log viewer
+class RingBufferHandler(logging.Handler):
+    def __init__(self, capacity=500):
+        super().__init__()
+        self.lines = collections.deque(maxlen=capacity)
+
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        self.lines.append(line)
+
+    def text(self, count=None):
+        """The buffered lines, oldest first (only the last count if given)"""
+        with self.lock:
+            lines = list(self.lines)
+        if count is not None:
+            lines = lines[-count:]
+        return "\n".join(lines)
+
+    def clear(self):
+        """Forget the buffered lines"""
+        with self.lock:
+            self.lines.clear()
+
+# Shared buffer shown by the debug tab of both apps
+log_buffer = RingBufferHandler()
+
+def setup_logging(debug=False):
+    """Send app logs to the console and the log viewer; debug messages are off by default"""
+    logger = logging.getLogger(LOGGER_NAME)
+    if log_buffer not in logger.handlers:
+        formatter = logging.Formatter(LOG_FORMAT, "%H:%M:%S")
+        console = logging.StreamHandler()
+        console.setFormatter(formatter)
+        log_buffer.setFormatter(formatter)
+        logger.addHandler(console)
+        logger.addHandler(log_buffer)
+        logger.propagate = False
+    set_debug(debug)
+    return logger
+
+def set_debug(enabled):
+    """Turn debug messages on or off at runtime"""
+    logging.getLogger(LOGGER_NAME).setLevel(logging.DEBUG if enabled else logging.INFO)
+
+def debug_enabled():
+    """Whether debug messages are currently emitted"""
+    return logging.getLogger(LOGGER_NAME).isEnabledFor(logging.DEBUG)
@@ -0,0 +1,245 @@
+import codecs
+import re
+import secrets
+from mikrotik_records import UserTable, UserRow, USER_FIELDS, USER_DEFAULTS
+from mikrotik_logging import get_logger
+
+# Rows parsed before they are added to the table; small enough to keep listings streaming
+TERSE_CHUNK_ROWS = 250
+
+logger = get_logger("parsers")
+
+def iter_channel_lines(channel, chunk_size=32768, encoding="utf-8"):
+    """Read a paramiko channel in chunks and yield complete lines as they arrive"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    while True:
+        chunk = channel.recv(chunk_size)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        if "\n" not in pending:
+            continue
+        lines = pending.split("\n")
+        # The last piece is an incomplete line; keep it for the next chunk
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+def closes_quote(text):
+    """Check if text ends a quoted value (a quote that is not escaped)"""
+    if not text.endswith('"'):
+        return False
+    # An odd run of backslashes escapes the quote; an even one is escaped backslashes
+    body = text[:-1]
+    return (len(body) - len(body.rstrip("\\"))) % 2 == 0
+
+def unquote(value):
+    """Strip RouterOS quoting from a value"""
+    if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+        value = value[1:-1]
+        if "\\" in value:
+            value = re.sub(r"\\(.)", r"\1", value)
+    return value
+
+def quote_value(value):
+    """Quote a value for a RouterOS CLI command"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("$", "\\$") + '"'
+
+def new_batch_marker():
+    """Random prefix of the status lines of one batch script"""
+    return f"UMA-{secrets.token_hex(4)}"
+
+def batch_script(commands, marker):
+    """Join commands into one script that prints a status line after each of them
+
+    Every command runs in its own :do block, so a failing one prints an error
+    line instead of aborting the rest of the script.
+    """
+    return "; ".join(
+        f':do {{ {command} }} on-error={{ :put "{marker} {i} error" }}; :put "{marker} {i} done"'
+        for i, command in enumerate(commands)
+    )
+
+def split_batch_output(lines, marker, count):
+    """Split the output of batch_script per command; failed or unfinished commands give None"""
+    outputs = [None] * count
+    current = []
+    failed = False
+    for line in lines:
+        if not line.startswith(marker):
+            current.append(line)
+            continue
+        _, index, status = line.split()
+        if status == "error":
+            failed = True
+            continue
+        index = int(index)
+        if index < count and not failed:
+            outputs[index] = "\n".join(current)
+        current = []
+        failed = False
+    return outputs
+
+def read_quoted(value, parts):
+    """Join the next space-separated parts onto value up to its closing quote, then unquote it"""
+    while len(value) == 1 or not closes_quote(value):
+        part = next(parts, None)
+        if part is None:
+            break
+        value += " " + part
+    return unquote(value)
+
+def tokenize_terse(line):
+    """Split a 'print terse' line into (flags, [(key, value), ...]) in a single pass
+
+    Quoted values may contain spaces; a bare word that is not key=value belongs
+    to the previous value (e.g. an unquoted comment with spaces).
+    """
+    flags = []
+    pairs = []
+    parts = iter(line.split(" "))
+    for part in parts:
+        key, sep, value = part.partition("=")
+        if sep and key:
+            if value[:1] == '"':
+                value = read_quoted(value, parts)
+            pairs.append([key, value])
+        elif not part:
+            continue
+        elif pairs:
+            pairs[-1][1] += " " + part
+        else:
+            flags.append(part)
+    return flags, pairs
+
+# Maps RouterOS keys of a 'print terse' listing to UserTable columns
+class TerseSpec:
+    def __init__(self, fields, required="name"):
+        index = {field: i for i, field in enumerate(USER_FIELDS)}
+        # Precomputed dispatch table: router key -> slot position
+        self.dispatch = {key: index[field] for key, field in fields.items()}
+        self.required_index = index[required]
+        self.disabled_index = index["disabled"]
+        self.id_index = index["id"]
+
+def parse_terse_line(line, dispatch, defaults):
+    """Tokenize one 'print terse' line straight into a values list
+
+    Returns (flags, values) or (None, None) for lines without key=value data.
+    """
+    first = line.find("=")
+    if first < 0:
+        return None, None
+    start = line.rfind(" ", 0, first) + 1
+    flags = line[:start]
+    values = list(defaults)
+
+    # Same rules as tokenize_terse, written into the slots without building pairs:
+    # a bare word belongs to the previous value
+    i = None
+    if '"' not in line:
+        # Fast path: no quoted values to join
+        for part in line[start:].split():
+            key, sep, value = part.partition("=")
+            if sep and key:
+                i = dispatch.get(key)
+                if i is not None:
+                    values[i] = value
+            elif i is not None:
+                values[i] += " " + part
+    else:
+        parts = iter(line[start:].split(" "))
+        for part in parts:
+            key, sep, value = part.partition("=")
+            if sep and key:
+                if value[:1] == '"':
+                    value = read_quoted(value, parts)
+                i = dispatch.get(key)
+                if i is not None:
+                    values[i] = value
+            elif part and i is not None:
+                values[i] += " " + part
+    return flags, values
+
+def iter_terse_values(lines, spec):
+    """Yield one values list (USER_FIELDS order) per 'print terse' line"""
+    dispatch = spec.dispatch
+    required_index = spec.required_index
+    disabled_index = spec.disabled_index
+    for line in lines:
+        flags, values = parse_terse_line(line, dispatch, USER_DEFAULTS)
+        if values is None or not values[required_index]:
+            continue
+        if "X" in flags:
+            values[disabled_index] = "true"
+        if "*" in flags:
+            # 'print show-ids' puts the .id (e.g. *1A) where the row number would be
+            for token in flags.split():
+                if token[0] == "*" and len(token) > 1:
+                    values[spec.id_index] = token
+        yield values
+
+def iter_terse_rows(lines, spec, table=None, chunk_rows=TERSE_CHUNK_ROWS):
+    """Append every 'print terse' line to table and yield the new row views
+
+    Rows are added chunk_rows at a time so each column converts its values in one pass.
+    """
+    if table is None:
+        table = UserTable()
+    start = table.size
+    chunk = []
+    for values in iter_terse_values(lines, spec):
+        chunk.append(values)
+        if len(chunk) == chunk_rows:
+            yield from append_chunk(table, chunk)
+            chunk = []
+    yield from append_chunk(table, chunk)
+    # One summary per listing; nothing is logged per line
+    logger.debug("Parsed %d terse rows", table.size - start)
+
+def append_chunk(table, chunk):
+    """Add parsed rows to table and yield their row views"""
+    start = table.size
+    table.extend(chunk)
+    for row in range(start, table.size):
+        yield UserRow(table, row)
+
+def values_from_attributes(attrs, spec):
+    """Map a RouterOS API reply (key -> value dict) to a values list"""
+    values = list(USER_DEFAULTS)
+    for key, value in attrs.items():
+        i = spec.dispatch.get(key)
+        if i is not None:
+            values[i] = value
+    return values
+
+HOTSPOT_USERS_TERSE = TerseSpec({
+    "name": "name",
+    "password": "password",
+    "profile": "profile",
+    "uptime": "uptime",
+    "bytes-in": "bytes_in",
+    "bytes-out": "bytes_out",
+    "comment": "comment",
+    "disabled": "disabled",
+    ".id": "id"
+})
+
+USER_MANAGER_USERS_TERSE = TerseSpec({
+    "username": "name",
+    "password": "password",
+    "customer": "group",
+    "uptime-used": "uptime",
+    "upload-used": "upload",
+    "download-used": "download",
+    "actual-profile": "profile",
+    "last-seen": "last_seen",
+    "comment": "comment",
+    "disabled": "disabled",
+    ".id": "id"
+})
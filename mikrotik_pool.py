@@ -0,0 +1,107 @@
+import threading
+import time
+import paramiko
+
+# Pooled SSH session for one (host, port, username)
+class PooledSession:
+    def __init__(self):
+        self.client = None
+        self.password = None
+        self.users = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def is_alive(self):
+        """Check if the pooled transport is still usable"""
+        if not self.client:
+            return False
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def close(self):
+        """Close the pooled SSH client"""
+        if self.client:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+            self.client = None
+
+# Connection pool keeping authenticated SSH sessions alive between searches
+class SSHConnectionPool:
+    def __init__(self, keepalive=30, idle_timeout=600):
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, host, port, username, password, timeout=30):
+        """Get a connected SSHClient, reusing the pooled one when it is still alive"""
+        key = (host, int(port), username)
+
+        with self.lock:
+            self.reap_idle()
+            session = self.sessions.get(key)
+            if session is None:
+                session = PooledSession()
+                self.sessions[key] = session
+            session.last_used = time.monotonic()
+
+        # Only the first caller for a router pays for the handshake
+        with session.lock:
+            if not session.is_alive() or session.password != password:
+                session.close()
+                client = paramiko.SSHClient()
+                client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                client.connect(host, port=int(port), username=username, password=password, timeout=timeout)
+                if self.keepalive:
+                    client.get_transport().set_keepalive(self.keepalive)
+                session.client = client
+                session.password = password
+
+            with self.lock:
+                session.users += 1
+                session.last_used = time.monotonic()
+            return session.client
+
+    def release(self, host, port, username):
+        """Return a session to the pool without closing it"""
+        with self.lock:
+            session = self.sessions.get((host, int(port), username))
+            if session:
+                session.users = max(0, session.users - 1)
+                session.last_used = time.monotonic()
+
+    def open_channel(self, host, port, username, password, timeout=30):
+        """Open a new session channel on the pooled transport"""
+        client = self.acquire(host, port, username, password, timeout)
+        try:
+            return client.get_transport().open_session(timeout=timeout)
+        finally:
+            self.release(host, port, username)
+
+    def discard(self, host, port, username):
+        """Close and forget the pooled session (e.g. after a timeout)"""
+        with self.lock:
+            session = self.sessions.pop((host, int(port), username), None)
+        if session:
+            session.close()
+
+    def reap_idle(self):
+        """Close sessions nobody has used for idle_timeout seconds (pool lock held)"""
+        now = time.monotonic()
+        for key, session in list(self.sessions.items()):
+            if session.users == 0 and now - session.last_used > self.idle_timeout:
+                session.close()
+                del self.sessions[key]
+
+    def close_all(self):
+        """Close every pooled session"""
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            session.close()
+
+# Shared pool used by both the Kivy and the Toga app
+ssh_pool = SSHConnectionPool()
@@ -0,0 +1,428 @@
+import re
+import sys
+from array import array
+from functools import lru_cache
+
+# Fields every user record carries, in column order
+USER_FIELDS = (
+    "name",
+    "password",
+    "profile",
+    "uptime",
+    "group",
+    "upload",
+    "download",
+    "bytes_in",
+    "bytes_out",
+    "last_seen",
+    "comment",
+    "disabled",
+    "id"
+)
+
+USER_DEFAULTS = ("", "", "", "", "", "", "", "", "", "", "", "false", "")
+
+# Few distinct values across thousands of users (voucher profiles, batch comments...)
+CATEGORY_FIELDS = ("profile", "group", "last_seen", "comment")
+
+# Parsed to integers when a user is added: seconds and bytes
+DURATION_FIELDS = ("uptime",)
+BYTE_FIELDS = ("upload", "download", "bytes_in", "bytes_out")
+
+# Stored for a value the router did not report (or that could not be read)
+MISSING = -1
+
+# RouterOS duration parts: "1w2d3h4m5s", "1d02:03:04", "500ms" (below a second is dropped)
+DURATION_UNITS = {"w": 604800, "d": 86400, "h": 3600, "m": 60, "s": 1}
+DURATION_PATTERN = re.compile(
+    r"(?:(\d+)w)?(?:(\d+)d)?"
+    r"(?:(\d+):(\d\d):(\d\d)|(?:(\d+)h)?(?:(\d+)m(?!s))?(?:(\d+)s)?)"
+    r"(?:\d+ms)?(?:\d+us)?(?:\d+ns)?",
+    re.ASCII
+)
+DURATION_SECONDS = (604800, 86400, 3600, 60, 1, 3600, 60, 1)
+
+# Byte sizes: plain counters, or "12.3MiB" / "5G" as printed by some listings and typed by users
+SIZE_PATTERN = re.compile(r"\s*(\d+(?:\.\d+)?)\s*([kmgt]?)(?:i?b)?\s*", re.IGNORECASE)
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+
+def format_transfer(upload, download):
+    """Total upload + download bytes in megabytes (user manager only)"""
+    if upload < 0 or download < 0:
+        return ""
+    total_mb = (upload + download) / (1024 * 1024)
+    return f"{total_mb:.2f} ميجا"
+
+def parse_duration(text):
+    """Seconds in a RouterOS duration, or MISSING"""
+    if text.isdecimal():
+        return int(text)
+    if not text.isalnum():
+        # Clock parts, signs, spaces or empty text
+        return parse_duration_text(text)
+    # Listings print "1w2d3h4m5s" / "45s": split on the unit letters, no regex or cache.
+    # Anything else (sub-second parts, units out of order) makes int() fail and takes the slow path.
+    rest = text
+    seconds = 0
+    try:
+        if "w" in rest:
+            number, _, rest = rest.partition("w")
+            seconds += int(number) * 604800
+        if "d" in rest:
+            number, _, rest = rest.partition("d")
+            seconds += int(number) * 86400
+        if "h" in rest:
+            number, _, rest = rest.partition("h")
+            seconds += int(number) * 3600
+        if "m" in rest:
+            number, _, rest = rest.partition("m")
+            seconds += int(number) * 60
+        if not rest:
+            return seconds
+        if rest[-1] == "s":
+            return seconds + int(rest[:-1])
+    except ValueError:
+        pass
+    return parse_duration_text(text)
+
+@lru_cache(maxsize=4096)
+def parse_duration_text(text):
+    """Seconds in a duration with clock or sub-second parts ("1d02:03:04", "1s200ms"), or MISSING"""
+    match = DURATION_PATTERN.fullmatch(text) if text else None
+    if not match:
+        return MISSING
+    return sum(int(number) * unit for number, unit in zip(match.groups(), DURATION_SECONDS) if number)
+
+@lru_cache(maxsize=4096)
+def format_duration(seconds):
+    """RouterOS style duration ("1d2h3m4s") for a number of seconds"""
+    if seconds < 0:
+        return ""
+    parts = []
+    for unit in ("w", "d", "h", "m", "s"):
+        count, seconds = divmod(seconds, DURATION_UNITS[unit])
+        if count:
+            parts.append(f"{count}{unit}")
+    return "".join(parts) or "0s"
+
+@lru_cache(maxsize=4096)
+def parse_size(text):
+    """Bytes in a size such as "12.3MiB" or "5G", or MISSING"""
+    match = SIZE_PATTERN.fullmatch(text)
+    if not match:
+        return MISSING
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[unit.lower()])
+
+def parse_bytes(text):
+    """Bytes in a counter field; plain digits skip the cache"""
+    if text.isdecimal():
+        return int(text)
+    return parse_size(text) if text else MISSING
+
+def format_bytes(count):
+    """Counter field text for a number of bytes"""
+    return "" if count < 0 else str(count)
+
+# Dictionary-encoded text column: each distinct string is stored once
+class CategoryColumn:
+    __slots__ = ("codes", "values", "index")
+
+    def __init__(self):
+        self.codes = array("I")
+        self.values = []
+        self.index = {}
+
+    def append(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = len(self.values)
+            self.index[value] = code
+            self.values.append(value)
+        self.codes.append(code)
+
+    def extend(self, values):
+        index = self.index
+        for value in set(values).difference(index):
+            index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.extend(map(index.__getitem__, values))
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+    def __len__(self):
+        return len(self.codes)
+
+# true/false column packed into one byte per user
+class FlagColumn:
+    __slots__ = ("flags",)
+
+    def __init__(self):
+        self.flags = array("B")
+
+    def append(self, value):
+        self.flags.append(value == "true")
+
+    def extend(self, values):
+        self.flags.extend(map("true".__eq__, values))
+
+    def __getitem__(self, row):
+        return "true" if self.flags[row] else "false"
+
+    def __len__(self):
+        return len(self.flags)
+
+# Integer column parsed once when a user is added; rows read back as display text
+class NumberColumn:
+    __slots__ = ("numbers",)
+
+    parse = staticmethod(int)
+    render = staticmethod(str)
+
+    def __init__(self):
+        self.numbers = array("q")
+
+    def append(self, value):
+        self.numbers.append(self.parse(value))
+
+    def extend(self, values):
+        self.numbers.extend(map(self.parse, values))
+
+    def __getitem__(self, row):
+        return self.render(self.numbers[row])
+
+    def number(self, row):
+        """Integer value of a row (MISSING when not reported)"""
+        return self.numbers[row]
+
+    def __len__(self):
+        return len(self.numbers)
+
+# Durations in seconds (uptime)
+class DurationColumn(NumberColumn):
+    __slots__ = ()
+
+    parse = staticmethod(parse_duration)
+    render = staticmethod(format_duration)
+
+    def append(self, value):
+        # "45s" (User Manager uptime-used) without a parser call
+        if value[:-1].isdecimal() and value[-1] == "s":
+            self.numbers.append(int(value[:-1]))
+        else:
+            self.numbers.append(parse_duration(value))
+
+# Byte counters (upload/download, bytes in/out)
+class ByteColumn(NumberColumn):
+    __slots__ = ()
+
+    parse = staticmethod(parse_bytes)
+    render = staticmethod(format_bytes)
+
+    def append(self, value):
+        # Plain and empty counters without a parser call
+        if value.isdecimal():
+            self.numbers.append(int(value))
+        elif value:
+            self.numbers.append(parse_size(value))
+        else:
+            self.numbers.append(MISSING)
+
+    def extend(self, values):
+        # A chunk of plain counters is converted in one pass; otherwise value by value
+        if "".join(values).isdecimal() and "" not in values:
+            self.numbers.extend(map(int, values))
+        else:
+            self.numbers.extend(map(parse_bytes, values))
+
+def new_column(field):
+    """Create the storage for one user field"""
+    if field == "disabled":
+        return FlagColumn()
+    if field in DURATION_FIELDS:
+        return DurationColumn()
+    if field in BYTE_FIELDS:
+        return ByteColumn()
+    if field in CATEGORY_FIELDS:
+        return CategoryColumn()
+    return []
+
+# Lazy view of one table row; supports user["name"] and user.get("last-seen") like the old dicts
+class UserRow:
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getattr__(self, field):
+        column = self.table.columns.get(field)
+        if column is None:
+            raise AttributeError(field)
+        return column[self.row]
+
+    @property
+    def transfer(self):
+        """Total upload + download in megabytes (user manager only)"""
+        columns = self.table.columns
+        return format_transfer(columns["upload"].number(self.row), columns["download"].number(self.row))
+
+    def get(self, key, default=None):
+        """Get a field by its record or RouterOS name (e.g. 'bytes-out')"""
+        try:
+            return getattr(self, key.replace("-", "_"))
+        except AttributeError:
+            return default
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key.replace("-", "_"))
+        except AttributeError:
+            raise KeyError(key)
+
+    def values(self):
+        """Return the row as a tuple in USER_FIELDS order"""
+        row = self.row
+        return tuple(column[row] for column in self.table.column_list)
+
+    def as_dict(self):
+        """Return the row as a plain dict"""
+        return {field: column[self.row] for field, column in self.table.columns.items()}
+
+    def __repr__(self):
+        return f"UserRow(name={self.name!r}, profile={self.profile!r})"
+
+# Columnar store of parsed users; filtered/sorted results are index views over the same columns
+class UserTable:
+    def __init__(self):
+        self.columns = {field: new_column(field) for field in USER_FIELDS}
+        self.column_list = tuple(self.columns[field] for field in USER_FIELDS)
+        # Bound once: appending runs per field of every parsed user
+        self.appenders = tuple(column.append for column in self.column_list)
+        self.size = 0
+        # Row numbers of a filtered/sorted view, None for the whole table
+        self.order = None
+
+    def append(self, values):
+        """Append one user given as values in USER_FIELDS order and return its row view"""
+        for append, value in zip(self.appenders, values):
+            append(value)
+        self.size += 1
+        return UserRow(self, self.size - 1)
+
+    def extend(self, rows):
+        """Append users given as values lists, converting one column at a time"""
+        if not rows:
+            return
+        for column, values in zip(self.column_list, zip(*rows)):
+            column.extend(values)
+        self.size += len(rows)
+
+    def rows(self):
+        """Row numbers visible in this table or view"""
+        return range(self.size) if self.order is None else self.order
+
+    def __len__(self):
+        return self.size if self.order is None else len(self.order)
+
+    def __iter__(self):
+        for row in self.rows():
+            yield UserRow(self, row)
+
+    def __getitem__(self, position):
+        return UserRow(self, self.rows()[position])
+
+    def column(self, field):
+        """Values of one field for the visible rows"""
+        column = self.columns[field]
+        return [column[row] for row in self.rows()]
+
+    def estimate_size(self, sample=100):
+        """Approximate bytes held by the columns, measured on a sample of rows"""
+        if not self.size:
+            return sys.getsizeof(self.columns)
+        rows = range(0, self.size, max(1, self.size // sample))
+        per_row = 0
+        for column in self.column_list:
+            if isinstance(column, list):
+                per_row += sum(sys.getsizeof(column[row]) for row in rows) / len(rows) + 8
+            elif isinstance(column, CategoryColumn):
+                per_row += column.codes.itemsize
+            elif isinstance(column, NumberColumn):
+                per_row += column.numbers.itemsize
+            else:
+                per_row += 1
+        shared = sum(sys.getsizeof(value) for column in self.column_list
+                     if isinstance(column, CategoryColumn) for value in column.values)
+        return int(per_row * self.size) + shared
+
+    def view(self, order):
+        """Create a view over the same columns showing only the given row numbers"""
+        table = UserTable.__new__(UserTable)
+        table.columns = self.columns
+        table.column_list = self.column_list
+        table.appenders = self.appenders
+        table.size = self.size
+        table.order = array("I", order)
+        return table
+
+    def filter(self, field, predicate):
+        """View with the rows whose field value matches predicate"""
+        column = self.columns[field]
+        return self.view(row for row in self.rows() if predicate(column[row]))
+
+    def filter_range(self, field, minimum=None, maximum=None):
+        """View with the rows whose numeric field lies within [minimum, maximum]"""
+        numbers = self.columns[field].numbers
+        low = max(0, minimum) if minimum is not None else 0
+        return self.view(row for row in self.rows()
+                         if numbers[row] >= low and (maximum is None or numbers[row] <= maximum))
+
+    def total(self, field):
+        """Sum of a numeric field over the visible rows (unreported values count as 0)"""
+        numbers = self.columns[field].numbers
+        if self.order is None:
+            # Summed in C, then the MISSING markers taken back out
+            return sum(numbers) - MISSING * numbers.count(MISSING)
+        return sum(number for number in map(numbers.__getitem__, self.order) if number > 0)
+
+    def sort(self, field, reverse=False):
+        """View with the rows ordered by one field (numeric fields by value)"""
+        column = self.columns[field]
+        key = column.number if isinstance(column, NumberColumn) else column.__getitem__
+        return self.view(sorted(self.rows(), key=key, reverse=reverse))
+
+# Pages through a UserTable (sorted on the stored columns) for list/table widgets
+class UserPager:
+    def __init__(self, users, page_size=100, extra=None):
+        self.users = users
+        self.page_size = page_size
+        # Extra per-row columns keyed by field, indexed by row number (e.g. router name)
+        self.extra = extra or {}
+        self.view = users
+        self.page = 0
+
+    def page_count(self):
+        """Number of pages (at least one)"""
+        return max(1, -(-len(self.view) // self.page_size))
+
+    def set_page(self, page):
+        """Move to a page, clamped to the valid range"""
+        self.page = min(max(page, 0), self.page_count() - 1)
+
+    def sort(self, field, reverse=False):
+        """Order the rows by a field and go back to the first page"""
+        column = self.extra.get(field)
+        if column is None:
+            self.view = self.users.sort(field, reverse)
+        else:
+            self.view = self.users.view(sorted(self.users.rows(), key=column.__getitem__, reverse=reverse))
+        self.page = 0
+
+    def page_rows(self, fields):
+        """Rows of the current page as dicts holding only the given fields"""
+        start = self.page * self.page_size
+        rows = self.view.rows()[start:start + self.page_size]
+        columns = [self.extra[field] if field in self.extra else self.users.columns[field] for field in fields]
+        return [{field: column[row] for field, column in zip(fields, columns)} for row in rows]
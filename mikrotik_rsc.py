@@ -0,0 +1,152 @@
+import io
+from mikrotik_cache import result_cache, HOTSPOT_USERS
+from mikrotik_logging import get_logger
+from mikrotik_parsers import iter_channel_lines, quote_value, tokenize_terse
+from mikrotik_records import UserTable
+from mikrotik_timing import timings
+
+# File names on the router's flash; removed again once used
+IMPORT_FILE = "uma-import.rsc"
+EXPORT_FILE = "uma-export"
+
+# A large /import runs for minutes without printing anything
+IMPORT_TIMEOUT = 1800
+
+logger = get_logger("rsc")
+
+def hotspot_import_script(users):
+    """Build an .rsc script adding hotspot users (RouterOS key -> value dicts)
+
+    Each add runs in its own :do block, so an existing or invalid user is
+    skipped instead of stopping the import; verification reports it.
+    """
+    lines = ["/ip hotspot user"]
+    for user in users:
+        values = " ".join(f"{key}={quote_value(value)}" for key, value in user.items() if value)
+        lines.append(f":do {{ add {values} }} on-error={{}}")
+    return "\r\n".join(lines) + "\r\n"
+
+def iter_export_lines(lines):
+    """Join the backslash-continued lines of an export into whole commands"""
+    pending = ""
+    for line in lines:
+        if line.endswith("\\"):
+            pending += line[:-1].lstrip() if pending else line[:-1]
+            continue
+        yield pending + line.lstrip() if pending else line
+        pending = ""
+    if pending:
+        yield pending
+
+def parse_hotspot_export(lines):
+    """Read the 'add' commands of '/ip hotspot user export' as key -> value dicts"""
+    users = []
+    for line in iter_export_lines(lines):
+        if not line.startswith("add "):
+            continue
+        _, pairs = tokenize_terse(line[4:])
+        users.append(dict(pairs))
+    return users
+
+def open_sftp(client):
+    """Open an SFTP session on the client's pooled SSH transport"""
+    if not client.ssh and not client.connect():
+        raise ConnectionError("Failed to connect via SSH")
+    return client.ssh.open_sftp()
+
+def run_long_command(client, command, timeout=IMPORT_TIMEOUT):
+    """Run a command that may stay silent for a long time; returns its output lines"""
+    channel = client.open_channel()
+    try:
+        channel.settimeout(timeout)
+        channel.exec_command(command)
+        return list(iter_channel_lines(channel))
+    finally:
+        channel.close()
+
+def import_hotspot_users(client, users, progress=None):
+    """Upload users as one .rsc file over SFTP, /import it on the router and verify the result
+
+    progress(stage, done, total) is called for the "upload", "import" and
+    "verify" stages. Returns a dict with the number of users found on the
+    router and the names that are missing or differ from the local records.
+    """
+    users = list(users)
+    data = hotspot_import_script(users).encode("utf-8")
+    report = progress or (lambda stage, done, total: None)
+
+    sftp = open_sftp(client)
+    try:
+        with timings.span("rsc.upload", client.host):
+            sftp.putfo(io.BytesIO(data), IMPORT_FILE, file_size=len(data),
+                       callback=lambda sent, total: report("upload", sent, total))
+
+        report("import", 0, len(users))
+        try:
+            with timings.span("rsc.import", client.host):
+                output = run_long_command(client, f"/import file-name={IMPORT_FILE} verbose=no")
+        finally:
+            # Cached listings no longer match the router
+            result_cache.invalidate(client.host, HOTSPOT_USERS)
+        for line in output:
+            if line.strip():
+                logger.info("Import: %s", line)
+        report("import", len(users), len(users))
+
+        try:
+            sftp.remove(IMPORT_FILE)
+        except IOError as e:
+            logger.warning("Could not remove %s: %s", IMPORT_FILE, e)
+    finally:
+        sftp.close()
+
+    return verify_hotspot_users(client, users, report)
+
+def verify_hotspot_users(client, users, report):
+    """Compare the router's hotspot users with the local records by name, password and profile"""
+    table = UserTable()
+    for row in client.iter_hotspot_users(None, table):
+        if row.row % 1000 == 999:
+            report("verify", len(table), len(users))
+    if getattr(client, "last_error", None):
+        raise RuntimeError(client.last_error)
+
+    names = table.columns["name"]
+    index = {names[row]: row for row in range(len(table))}
+    missing = []
+    mismatched = []
+    for user in users:
+        row = index.get(user["name"])
+        if row is None:
+            missing.append(user["name"])
+        elif any(user.get(field) and table.columns[field][row] != user[field] for field in ("password", "profile")):
+            mismatched.append(user["name"])
+    report("verify", len(users), len(users))
+
+    if missing or mismatched:
+        logger.warning("Import check: %d missing, %d different", len(missing), len(mismatched))
+    return {"imported": len(users) - len(missing), "missing": missing, "mismatched": mismatched}
+
+def export_hotspot_users(client, progress=None):
+    """Export hotspot users to a file on the router and download it over SFTP
+
+    Returns the users as key -> value dicts, as written in the export.
+    """
+    report = progress or (lambda stage, done, total: None)
+    with timings.span("rsc.export", client.host):
+        run_long_command(client, f"/ip hotspot user export file={EXPORT_FILE}")
+
+    name = EXPORT_FILE + ".rsc"
+    sftp = open_sftp(client)
+    try:
+        data = io.BytesIO()
+        with timings.span("rsc.download", client.host):
+            sftp.getfo(name, data, callback=lambda received, total: report("download", received, total))
+        try:
+            sftp.remove(name)
+        except IOError as e:
+            logger.warning("Could not remove %s: %s", name, e)
+    finally:
+        sftp.close()
+
+    return parse_hotspot_export(data.getvalue().decode("utf-8", errors="replace").splitlines())
@@ -0,0 +1,115 @@
+import concurrent.futures
+import contextlib
+import threading
+
+# Per-router command slots shared by everything that talks to a router: searches,
+# mirror syncs, usage samples, session polls and the multi-router fan-out
+class RouterLimits:
+    def __init__(self, max_per_router=2):
+        self.max_per_router = max_per_router
+        self.limits = {}
+        self.lock = threading.Lock()
+
+    def semaphores(self, router):
+        """(all commands, background commands) semaphores of a router"""
+        with self.lock:
+            limits = self.limits.get(router)
+            if limits is None:
+                # Background work holds at most one slot, so a search can always start
+                limits = self.limits[router] = (threading.Semaphore(self.max_per_router), threading.Semaphore(1))
+            return limits
+
+    @contextlib.contextmanager
+    def slot(self, router, background=False):
+        """Hold one of the router's command slots for the duration of the block"""
+        limit, background_limit = self.semaphores(router)
+        if background:
+            with background_limit, limit:
+                yield
+        else:
+            with limit:
+                yield
+
+router_limits = RouterLimits()
+
+# A request the scheduler has started or queued
+class ScheduledRequest:
+    def __init__(self, key, future, cancelled):
+        self.key = key
+        self.future = future
+        self.cancelled = cancelled
+
+    def cancel(self):
+        """Drop the request if queued, or ask a running one to stop"""
+        self.cancelled.set()
+        self.future.cancel()
+
+# Per-router request scheduler: identical in-flight requests share one router
+# command, a newer request in the same group cancels the stale one, and each
+# request waits for a command slot of its router
+class RequestScheduler:
+    def __init__(self, max_workers=8, limits=None):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="scheduler")
+        self.limits = router_limits if limits is None else limits
+        self.inflight = {}
+        self.groups = {}
+        self.lock = threading.Lock()
+
+    def submit(self, router, key, function, group=None):
+        """Run function(cancelled) for a router and return a concurrent Future
+
+        cancelled is a threading.Event the function should check between rows.
+        """
+        stale = None
+        started = None
+        with self.lock:
+            request = self.inflight.get((router, key))
+            if request is None or request.future.done():
+                # Only the latest request of a group is still wanted
+                stale = self.groups.get((router, group)) if group else None
+                if stale and stale.key == key:
+                    stale = None
+
+                cancelled = threading.Event()
+                future = self.executor.submit(self.run, router, function, cancelled)
+                request = started = ScheduledRequest(key, future, cancelled)
+                self.inflight[(router, key)] = request
+
+            if group:
+                self.groups[(router, group)] = request
+
+        # Outside the lock: a queued or finished future runs its callbacks (finish) right here
+        if stale:
+            stale.cancel()
+        if started:
+            started.future.add_done_callback(lambda f: self.finish(router, key, f))
+        return request.future
+
+    def run(self, router, function, cancelled):
+        """Wait for a free slot on the router, then run the request"""
+        with self.limits.slot(router):
+            if cancelled.is_set():
+                raise concurrent.futures.CancelledError()
+            return function(cancelled)
+
+    def finish(self, router, key, future):
+        """Forget a completed request"""
+        with self.lock:
+            request = self.inflight.get((router, key))
+            if request and request.future is future:
+                del self.inflight[(router, key)]
+
+    def cancel(self, router, group):
+        """Cancel the latest request of a group (e.g. the search term was cleared)"""
+        with self.lock:
+            request = self.groups.pop((router, group), None)
+        if request:
+            request.cancel()
+
+    def shutdown(self):
+        """Cancel queued requests and stop the worker pool"""
+        with self.lock:
+            requests = list(self.inflight.values())
+        for request in requests:
+            request.cancel()
+        self.executor.shutdown(wait=False)
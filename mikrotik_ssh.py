@@ -0,0 +1,274 @@
+import time
+from mikrotik_pool import ssh_pool
+from mikrotik_cache import result_cache, HOTSPOT_USERS, USER_MANAGER_USERS
+from mikrotik_api import MikroTikAPI, API_PORT, API_SSL_PORT
+from mikrotik_parsers import iter_channel_lines, iter_terse_rows, quote_value, new_batch_marker, batch_script, split_batch_output, HOTSPOT_USERS_TERSE, USER_MANAGER_USERS_TERSE
+from mikrotik_records import UserTable
+from mikrotik_logging import get_logger
+from mikrotik_timing import timings, TimedChannel, TimedIterator
+from mikrotik_active import ACTIVE_SESSIONS_COMMAND, parse_active_line
+
+logger = get_logger("ssh")
+
+# MikroTik SSH handler
+class MikroTikSSH:
+    def __init__(self, host, username, password, port=22, user_manager_match="="):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        # Operator of the User Manager 'where username' filter: "=" exact, "~" partial (regex)
+        self.user_manager_match = user_manager_match
+        self.timeout = 30
+        self.ssh = None
+        # Error of the last streamed command, None if it completed
+        self.last_error = None
+        # Seconds the last streamed command spent on the router and the wire
+        self.command_time = 0.0
+
+    def connect(self):
+        """Connect to MikroTik device via SSH (reuses a pooled session if available)"""
+        if self.ssh:
+            return True
+        try:
+            with timings.span("ssh.connect", self.host):
+                self.ssh = ssh_pool.acquire(self.host, self.port, self.username, self.password, timeout=self.timeout)
+            return True
+        except Exception as e:
+            logger.error("Connection error: %s", e)
+            return False
+
+    def disconnect(self):
+        """Disconnect from MikroTik device (the session stays in the pool)"""
+        if self.ssh:
+            ssh_pool.release(self.host, self.port, self.username)
+            self.ssh = None
+
+    def open_channel(self):
+        """Open a new channel on the pooled SSH transport"""
+        return ssh_pool.open_channel(self.host, self.port, self.username, self.password, timeout=self.timeout)
+
+    def execute_command(self, command):
+        """Execute command on MikroTik device"""
+        logger.debug("Executing command: %s", command)
+        if not self.ssh:
+            logger.debug("No SSH connection, attempting to connect...")
+            if not self.connect():
+                logger.error("Failed to connect via SSH")
+                return None
+            logger.debug("SSH connection established")
+
+        try:
+            with timings.span("ssh.execute", self.host):
+                stdin, stdout, stderr = self.ssh.exec_command(command)
+                # Set a timeout for reading output
+                stdout.channel.settimeout(10)  # 10 seconds timeout
+                output = stdout.read().decode('utf-8')
+                error = stderr.read().decode('utf-8')
+
+            logger.debug("Command output: %.200s...", output)
+            if error:
+                logger.error("Command error: %s", error)
+                return None
+
+            return output
+        except Exception as e:
+            logger.error("Command execution error: %s", e)
+            # Check if it's a timeout error
+            if "timed out" in str(e).lower():
+                logger.warning("Command execution timed out")
+                # Drop the pooled session and reconnect
+                try:
+                    self.disconnect()
+                    ssh_pool.discard(self.host, self.port, self.username)
+                    self.connect()
+                except:
+                    pass
+            return None
+
+    def iter_command_lines(self, command):
+        """Execute command and yield output lines as they arrive"""
+        logger.debug("Executing command: %.200s", command)
+        self.last_error = None
+        self.command_time = 0.0
+        if not self.ssh:
+            logger.debug("No SSH connection, attempting to connect...")
+            if not self.connect():
+                logger.error("Failed to connect via SSH")
+                self.last_error = "Failed to connect via SSH"
+                return
+            logger.debug("SSH connection established")
+
+        channel = None
+        timed = None
+        start = time.perf_counter()
+        try:
+            channel = self.ssh.get_transport().open_session(timeout=self.timeout)
+            # Timeout between chunks rather than for the whole output
+            channel.settimeout(10)
+            channel.exec_command(command)
+            timed = TimedChannel(channel)
+            yield from iter_channel_lines(timed)
+
+            error = b""
+            while channel.recv_stderr_ready():
+                error += channel.recv_stderr(4096)
+            if error:
+                self.last_error = error.decode('utf-8', errors='replace')
+                logger.error("Command error: %s", self.last_error)
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error("Command execution error: %s", e)
+            if "timed out" in str(e).lower():
+                logger.warning("Command execution timed out")
+                # Drop the pooled session and reconnect
+                try:
+                    self.disconnect()
+                    ssh_pool.discard(self.host, self.port, self.username)
+                    self.connect()
+                except:
+                    pass
+        finally:
+            if channel:
+                channel.close()
+            if timed:
+                # Channel setup, the router's own processing, then waiting for the output
+                self.command_time = timed.started - start + timed.elapsed
+                timings.record("ssh.open", timed.started - start, self.host)
+                if timed.first_byte is not None:
+                    timings.record("router.print", timed.first_byte, self.host)
+                timings.record("ssh.transfer", timed.elapsed, self.host)
+
+    def iter_parsed_rows(self, command, spec, table):
+        """Stream a terse listing into table, timing the parser apart from the command"""
+        rows = TimedIterator(iter_terse_rows(self.iter_command_lines(command), spec, table))
+        yield from rows
+        # Whatever the command itself did not take was spent parsing
+        timings.record("parse.terse", max(0.0, rows.elapsed - self.command_time), self.host)
+
+    def iter_hotspot_users(self, search_term=None, table=None):
+        """Yield hotspot users while the print output is still streaming in"""
+        command = "/ip hotspot user print terse without-paging"
+        if search_term:
+            # Use server-side filtering with where clause
+            command += f' where name="{search_term}"'
+
+        yield from self.iter_parsed_rows(command, HOTSPOT_USERS_TERSE, table)
+
+    def iter_user_manager_users(self, search_term=None, table=None):
+        """Yield user manager users while the print output is still streaming in"""
+        command = "/tool user-manager user print terse without-paging"
+        if search_term:
+            # Use server-side filtering with where clause
+            command += f' where username{self.user_manager_match}"{search_term}"'
+
+        yield from self.iter_parsed_rows(command, USER_MANAGER_USERS_TERSE, table)
+
+    def execute_batch(self, commands, chunk_size=100):
+        """Run many commands as a few scripts, one channel each
+
+        Returns every command's output in order, or None where it failed.
+        """
+        outputs = []
+        for start in range(0, len(commands), chunk_size):
+            chunk = commands[start:start + chunk_size]
+            marker = new_batch_marker()
+            with timings.span("ssh.batch", self.host):
+                outputs.extend(split_batch_output(self.iter_command_lines(batch_script(chunk, marker)), marker, len(chunk)))
+        return outputs
+
+    def execute_user_batch(self, commands):
+        """Run hotspot user changes as a batch; returns True or False per command"""
+        try:
+            outputs = self.execute_batch(commands)
+        finally:
+            # Cached listings no longer match the router
+            result_cache.invalidate(self.host, HOTSPOT_USERS)
+        failed = outputs.count(None)
+        if failed:
+            logger.warning("%d of %d hotspot user commands failed", failed, len(commands))
+        return [output is not None for output in outputs]
+
+    def add_hotspot_users(self, users):
+        """Add hotspot users (RouterOS key -> value dicts) in a few batch scripts; returns True or False per user"""
+        commands = [
+            "/ip hotspot user add " + " ".join(f"{key}={quote_value(value)}" for key, value in user.items() if value)
+            for user in users
+        ]
+        return self.execute_user_batch(commands)
+
+    def set_hotspot_users_disabled(self, names, disabled=True):
+        """Disable (or enable) hotspot users by name; returns how many succeeded"""
+        value = "yes" if disabled else "no"
+        return sum(self.execute_user_batch([f"/ip hotspot user set [find name={quote_value(name)}] disabled={value}" for name in names]))
+
+    def reset_hotspot_user_counters(self, names):
+        """Reset uptime and traffic counters of hotspot users by name; returns how many succeeded"""
+        return sum(self.execute_user_batch([f"/ip hotspot user reset-counters [find name={quote_value(name)}]" for name in names]))
+
+    def remove_hotspot_users(self, names):
+        """Remove hotspot users by name (e.g. expired vouchers); returns how many succeeded"""
+        return sum(self.execute_user_batch([f"/ip hotspot user remove [find name={quote_value(name)}]" for name in names]))
+
+    def get_hotspot_users(self):
+        """Get hotspot users from MikroTik device"""
+        return self.get_hotspot_users_filtered(None)
+
+    def get_hotspot_users_filtered(self, search_term):
+        """Get filtered hotspot users from MikroTik device (served from the result cache while fresh)"""
+        search_term = search_term or None
+        users = result_cache.get(self.host, HOTSPOT_USERS, search_term)
+        if users is not None:
+            logger.debug("Returning %d cached users", len(users))
+            return users
+
+        users = UserTable()
+        for _ in self.iter_hotspot_users(search_term, users):
+            pass
+        # Never cache a listing that was cut short
+        if self.last_error is None:
+            result_cache.put(self.host, HOTSPOT_USERS, search_term, users)
+        logger.debug("Returning %d users", len(users))
+        return users
+
+    def get_user_manager_users(self):
+        """Get user manager users from MikroTik device"""
+        return self.get_user_manager_users_filtered(None)
+
+    def get_user_manager_users_filtered(self, search_term):
+        """Get filtered user manager users from MikroTik device (served from the result cache while fresh)"""
+        search_term = search_term or None
+        users = result_cache.get(self.host, USER_MANAGER_USERS, search_term)
+        if users is not None:
+            logger.debug("Returning %d cached users", len(users))
+            return users
+
+        users = UserTable()
+        for _ in self.iter_user_manager_users(search_term, users):
+            pass
+        # Never cache a listing that was cut short
+        if self.last_error is None:
+            result_cache.put(self.host, USER_MANAGER_USERS, search_term, users)
+        logger.debug("Returning %d users", len(users))
+        return users
+
+    def get_active_sessions(self):
+        """Get the active hotspot sessions keyed by id, or None if the listing failed"""
+        sessions = {}
+        for line in self.iter_command_lines(ACTIVE_SESSIONS_COMMAND):
+            session = parse_active_line(line)
+            if session:
+                sessions[session["id"]] = session
+        return None if self.last_error else sessions
+
+def create_router_client(host, username, password, port=22, connection_type="ssh", user_manager_match="="):
+    """Create an SSH or RouterOS API client depending on connection type and port"""
+    if connection_type in ("api", "api-ssl") or port in (API_PORT, API_SSL_PORT):
+        use_ssl = connection_type == "api-ssl" or port == API_SSL_PORT
+        return MikroTikAPI(host, username, password, port, use_ssl=use_ssl)
+    return MikroTikSSH(host, username, password, port, user_manager_match)
+
+def create_profile_client(profile, user_manager_match="="):
+    """Create the client for a saved router profile"""
+    return create_router_client(profile["ip"], profile["username"], profile["password"], profile["port"],
+                                profile["connection_type"], user_manager_match)
@@ -0,0 +1,144 @@
+import collections
+import contextlib
+import json
+import threading
+import time
+
+# Router name used for spans that do not talk to a router (e.g. rendering)
+LOCAL = "local"
+
+# Recent durations of one stage on one router
+class StageHistogram:
+    def __init__(self, capacity=500):
+        self.samples = collections.deque(maxlen=capacity)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def as_dict(self):
+        """Count, total and p50/p95/max over the recent samples, in milliseconds"""
+        samples = sorted(self.samples)
+        last = len(samples) - 1
+
+        def percentile(fraction):
+            return round(samples[min(last, int(fraction * len(samples)))] * 1000, 3)
+
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(samples[last] * 1000, 3)
+        }
+
+# Timing spans aggregated per (router, stage) for the performance panel
+class Timings:
+    def __init__(self, capacity=500):
+        self.capacity = capacity
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds, router=LOCAL):
+        """Add one duration to a stage's histogram"""
+        key = (router or LOCAL, stage)
+        with self.lock:
+            histogram = self.stages.get(key)
+            if histogram is None:
+                histogram = self.stages[key] = StageHistogram(self.capacity)
+            histogram.add(seconds)
+
+    @contextlib.contextmanager
+    def span(self, stage, router=LOCAL):
+        """Time the body of a with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, router)
+
+    def stats(self):
+        """One dict per (router, stage), sorted by router then stage"""
+        with self.lock:
+            items = sorted(self.stages.items())
+            return [dict(router=router, stage=stage, **histogram.as_dict()) for (router, stage), histogram in items]
+
+    def summary(self):
+        """Human readable table for the performance panel"""
+        stats = self.stats()
+        if not stats:
+            return "No timings yet"
+        lines = []
+        router = None
+        for row in stats:
+            if row["router"] != router:
+                router = row["router"]
+                lines.append(router)
+            lines.append(f"  {row['stage']:<18} n={row['count']:<5} p50={row['p50_ms']:.1f}ms "
+                         f"p95={row['p95_ms']:.1f}ms max={row['max_ms']:.1f}ms")
+        return "\n".join(lines)
+
+    def to_json(self):
+        """The current statistics as a JSON document"""
+        return json.dumps({"exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "stages": self.stats()},
+                          ensure_ascii=False, indent=2)
+
+    def export_json(self, path):
+        """Write the current statistics to a JSON file and return its path"""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
+        return path
+
+    def reset(self):
+        """Forget every recorded span"""
+        with self.lock:
+            self.stages.clear()
+
+# Channel wrapper adding up the time spent waiting for router output
+class TimedChannel:
+    def __init__(self, channel):
+        self.channel = channel
+        self.started = time.perf_counter()
+        # Seconds until the router sent its first output (its own processing time)
+        self.first_byte = None
+        self.elapsed = 0.0
+
+    def recv(self, size):
+        start = time.perf_counter()
+        data = self.channel.recv(size)
+        end = time.perf_counter()
+        self.elapsed += end - start
+        if self.first_byte is None:
+            self.first_byte = end - self.started
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.channel, name)
+
+# Iterator wrapper adding up the time spent producing items (not consuming them)
+class TimedIterator:
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.elapsed = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self.iterator)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+    def close(self):
+        """Close the wrapped generator (e.g. to stop a streaming command)"""
+        close = getattr(self.iterator, "close", None)
+        if close:
+            close()
+
+# Shared spans recorded by the router clients and both apps
+timings = Timings()
@@ -0,0 +1,56 @@
+import contextlib
+import sqlite3
+import threading
+
+# Small pool of long-lived SQLite connections shared by the UI and background threads
+class SQLiteConnectionPool:
+    def __init__(self, db_path, size=4, timeout=30, cached_statements=256):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def open(self):
+        """Open a new connection in WAL mode"""
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        # WAL lets the UI read while a background sync writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def acquire(self):
+        """Get an idle connection, opening one only if none is free"""
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        return self.open()
+
+    def release(self, conn):
+        """Return a connection to the pool, closing it if the pool is full"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self.lock:
+            idle = self.idle
+            self.idle = []
+        for conn in idle:
+            conn.close()
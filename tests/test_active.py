@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mikrotik_active import diff_sessions, parse_active_line, ActiveSessionMonitor
+from mikrotik_scheduler import RouterLimits
+
+def session(user, address="10.0.0.2", mac="AA:BB", uptime="1m", bytes_in="100"):
+    return parse_active_line(f"0 user={user} address={address} mac-address={mac} uptime={uptime} bytes-in={bytes_in}")
+
+def snapshot(*sessions):
+    return {s["id"]: s for s in sessions}
+
+def test_counters_alone_are_not_a_change():
+    previous = snapshot(session("ann"), session("bob", mac="CC:DD"))
+    current = snapshot(session("ann", uptime="2m", bytes_in="900"), session("bob", mac="CC:DD"))
+    added, removed, changed, updated = diff_sessions(previous, current)
+    assert (added, removed, changed) == ([], [], [])
+    assert [s["user"] for s in updated] == ["ann"]
+
+def test_identity_changes_and_logins():
+    previous = snapshot(session("ann"), session("bob", mac="CC:DD"))
+    current = snapshot(session("ann", address="10.0.0.9", uptime="2m"), session("eve", mac="EE:FF"))
+    added, removed, changed, updated = diff_sessions(previous, current)
+    assert [s["user"] for s in added] == ["eve"]
+    assert removed == ["bob@CC:DD"]
+    assert [s["address"] for s in changed] == ["10.0.0.9"]
+    assert updated == []
+
+class FakeClient:
+    host = "fake-router"
+
+    def __init__(self, polls):
+        self.polls = iter(polls)
+
+    def get_active_sessions(self):
+        return next(self.polls)
+
+def test_monitor_reports_only_polls_that_differ():
+    first = snapshot(session("ann"))
+    calls = []
+    monitor = ActiveSessionMonitor(FakeClient([first, dict(first), None, snapshot(session("ann", uptime="3m"))]),
+                                   lambda *diff: calls.append(diff), limits=RouterLimits())
+    for _ in range(4):
+        monitor.poll()
+    assert [tuple(map(len, diff)) for diff in calls] == [(1, 0, 0, 0), (0, 0, 0, 1)]
@@ -0,0 +1,88 @@
+import os
+import socket
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import pytest
+
+from mikrotik_api import MikroTikAPI
+from mikrotik_cache import result_cache
+from fake_api_router import FakeApiRouter
+
+@pytest.fixture
+def router():
+    with FakeApiRouter(hotspot_users=3000, user_manager_users=200, password="secret", chunk_size=4096) as router:
+        yield router
+
+def connect(router, password="secret"):
+    return MikroTikAPI("127.0.0.1", "admin", password, router.sock.getsockname()[1])
+
+def test_login(router):
+    client = connect(router)
+    try:
+        assert client.connect()
+    finally:
+        client.disconnect()
+
+    rejected = connect(router, password="wrong")
+    assert not rejected.connect()
+    assert rejected.sock is None
+
+def test_streamed_listing(router):
+    client = connect(router)
+    try:
+        seen = []
+        for row in client.iter_hotspot_users():
+            seen.append(row.row)
+        users = row.table
+        assert seen == list(range(3000))
+        assert users[2999].name == "user2999"
+        assert users[5].bytes_out == "20480"
+        assert users[0].disabled == "true"
+
+        result_cache.invalidate()
+        found = client.get_hotspot_users_filtered("user42")
+        assert [user.name for user in found] == ["user42"]
+
+        result_cache.invalidate()
+        assert len(client.get_user_manager_users_filtered("um1")) == 111
+    finally:
+        client.disconnect()
+
+def test_trap_then_done_keeps_the_connection_usable(router):
+    client = connect(router)
+    try:
+        with pytest.raises(RuntimeError, match="no such command"):
+            client.talk(["/nonexistent/command"])
+        # The !done after the !trap was consumed, so the next command reads its own replies
+        assert client.talk(["/ip/hotspot/active/print"]) == [("!done", {})]
+
+        results = client.execute_batch([
+            ["/ip/hotspot/user/remove", "=numbers=user1"],
+            ["/ip/hotspot/user/remove", "=numbers=missing"],
+            ["/ip/hotspot/user/remove", "=numbers=user2"]
+        ])
+        assert results == [[], None, []]
+        assert "user1" not in router.hotspot_users and "user2" not in router.hotspot_users
+    finally:
+        client.disconnect()
+
+def test_large_batch_reads_replies_while_sending():
+    # Tiny socket buffers on both ends: a client that writes every sentence before
+    # reading any reply stalls once the router blocks on its own replies
+    with FakeApiRouter(hotspot_users=300, password="secret", buffer_size=4096) as router:
+        client = connect(router)
+        client.timeout = 5
+        try:
+            assert client.connect()
+            client.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            client.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+            commands = [["/ip/hotspot/user/print", f"?name=user{i % 300}"] for i in range(1000)]
+
+            results = client.execute_batch(commands)
+            assert [result[0]["name"] for result in results] == [f"user{i % 300}" for i in range(1000)]
+        finally:
+            client.disconnect()
@@ -0,0 +1,54 @@
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mikrotik_async import AsyncRouterClient
+from mikrotik_cache import result_cache, HOTSPOT_USERS
+from mikrotik_records import USER_DEFAULTS
+
+TIMEOUT = 5
+
+# Blocking client whose "bad" listing fails while a "good" one starts on another thread
+class FakeClient:
+    host = "fake-router"
+    failed = threading.Event()
+    started = threading.Event()
+
+    def __init__(self):
+        self.last_error = None
+
+    def iter_hotspot_users(self, search_term, table):
+        self.last_error = None
+        if search_term == "good":
+            self.started.set()
+        yield table.append(("user",) + USER_DEFAULTS[1:])
+        if search_term == "bad":
+            self.last_error = "channel closed"
+            self.failed.set()
+            # Finish only after the other command has started (and reset its error)
+            self.started.wait(TIMEOUT)
+        else:
+            self.failed.wait(TIMEOUT)
+
+    def disconnect(self):
+        pass
+
+def test_concurrent_listings_keep_their_own_error():
+    result_cache.invalidate()
+    client = AsyncRouterClient(FakeClient)
+
+    async def search():
+        return await asyncio.wait_for(asyncio.gather(
+            client.get_hotspot_users_filtered("bad"),
+            client.get_hotspot_users_filtered("good")
+        ), TIMEOUT)
+
+    bad, good = asyncio.run(search())
+    assert len(bad) == len(good) == 1
+    # A listing that was cut short is never cached, whatever the other command did
+    assert result_cache.get("fake-router", HOTSPOT_USERS, "bad") is None
+    assert result_cache.get("fake-router", HOTSPOT_USERS, "good") is good
+    result_cache.invalidate()
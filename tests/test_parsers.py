@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mikrotik_parsers import tokenize_terse, closes_quote, parse_terse_line, HOTSPOT_USERS_TERSE
+from mikrotik_records import USER_FIELDS, USER_DEFAULTS
+
+def test_closes_quote_counts_backslashes():
+    assert closes_quote('C:"')
+    assert not closes_quote('C:\\"')
+    assert closes_quote('C:\\\\"')
+    assert not closes_quote('C:\\\\\\"')
+    assert not closes_quote("C:")
+
+def test_quoted_value_ending_in_escaped_backslash():
+    flags, pairs = tokenize_terse('comment="path C:\\\\" name=bob profile=p1')
+    assert flags == []
+    assert pairs == [["comment", "path C:\\"], ["name", "bob"], ["profile", "p1"]]
+
+def test_escaped_quote_keeps_value_open():
+    _, pairs = tokenize_terse('comment="say \\" hi" name=bob')
+    assert pairs == [["comment", 'say " hi'], ["name", "bob"]]
+
+def terse_values(line, spec=HOTSPOT_USERS_TERSE):
+    _, values = parse_terse_line(line, spec.dispatch, USER_DEFAULTS)
+    return {field: value for field, value, default in zip(USER_FIELDS, values, USER_DEFAULTS) if value != default}
+
+def test_bare_words_join_the_previous_value_on_both_paths():
+    # Without a quote anywhere the line takes the split() fast path
+    assert terse_values("0 name=bob comment=hello world profile=p1") == \
+        {"name": "bob", "comment": "hello world", "profile": "p1"}
+    assert terse_values('0 name=bob comment=hello world profile="p 1"') == \
+        {"name": "bob", "comment": "hello world", "profile": "p 1"}
+    assert tokenize_terse("0 name=bob comment=hello world")[1] == [["name", "bob"], ["comment", "hello world"]]
+
+def test_bare_words_after_an_unknown_key_are_dropped():
+    assert terse_values("0 name=bob server=hs one two") == {"name": "bob"}
+    assert terse_values('0 name=bob server="hs" one two') == {"name": "bob"}
+
+def test_parse_terse_line_matches_tokenize_terse():
+    lines = [
+        '0 X name=bob password="p w" comment="path C:\\\\" profile=p1',
+        '1 name=ann comment=a  b   c uptime=1h',
+        '2 name=sam comment="x" y bytes-in=5',
+        '3 name="unclosed value',
+        '4 name=eve comment="say \\" hi" disabled=yes',
+    ]
+    for line in lines:
+        _, pairs = tokenize_terse(line)
+        expected = {}
+        for key, value in pairs:
+            if key in HOTSPOT_USERS_TERSE.dispatch:
+                expected[USER_FIELDS[HOTSPOT_USERS_TERSE.dispatch[key]]] = value
+        assert terse_values(line) == expected, line
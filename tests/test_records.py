@@ -0,0 +1,107 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from mikrotik_records import (UserTable, UserPager, USER_FIELDS, USER_DEFAULTS, MISSING,
+                              parse_duration, format_duration, parse_bytes)
+
+def user_values(**fields):
+    values = list(USER_DEFAULTS)
+    for field, value in fields.items():
+        values[USER_FIELDS.index(field)] = value
+    return values
+
+def test_empty_pager_with_extra_column():
+    # The all-routers search shows its pager before any router has replied
+    pager = UserPager(UserTable(), extra={"router": []})
+    assert pager.page_rows(["router", "name"]) == []
+    pager.sort("router")
+    assert pager.page_rows(["router", "name"]) == []
+
+def test_pager_reads_extra_columns():
+    users = UserTable()
+    users.append(user_values(name="b"))
+    users.append(user_values(name="a"))
+    pager = UserPager(users, extra={"router": ["r1", "r2"]})
+    pager.sort("name")
+    assert pager.page_rows(["router", "name"]) == [{"router": "r2", "name": "a"}, {"router": "r1", "name": "b"}]
+
+@pytest.mark.parametrize("text, seconds", [
+    ("45", 45),
+    ("45s", 45),
+    ("1w2d3h4m5s", 788645),
+    ("3h", 10800),
+    ("5m30s", 330),
+    ("1d02:03:04", 93784),
+    ("00:05:00", 300),
+    ("1s200ms", 1),
+    ("500ms", 0),
+    ("2m10us", 120),
+])
+def test_parse_duration(text, seconds):
+    assert parse_duration(text) == seconds
+
+@pytest.mark.parametrize("text", ["", "1wx", "x", "w", "1h-5s", "-5s", " 5s", "1_0s", "2m1h", "1d1d", "1:2:3", "1h 5m", "5ms1s"])
+def test_parse_duration_rejects_malformed_text(text):
+    assert parse_duration(text) == MISSING
+
+def test_format_duration():
+    assert format_duration(788645) == "1w2d3h4m5s"
+    assert format_duration(0) == "0s"
+    assert format_duration(MISSING) == ""
+
+@pytest.mark.parametrize("text, count", [
+    ("12345", 12345),
+    ("", MISSING),
+    ("1KiB", 1024),
+    ("5G", 5 * 1024 ** 3),
+    ("12.5MiB", int(12.5 * 1024 ** 2)),
+    ("2 mb", 2 * 1024 ** 2),
+    ("abc", MISSING),
+    ("5X", MISSING),
+    ("-5", MISSING),
+])
+def test_parse_bytes(text, count):
+    assert parse_bytes(text) == count
+
+def counter_table():
+    users = UserTable()
+    for name, uptime, upload in (("a", "1h", "300"), ("b", "", "5G"), ("c", "2m", ""), ("d", "1d", "100")):
+        users.append(user_values(name=name, uptime=uptime, upload=upload))
+    return users
+
+def test_numbers_render_back_to_text():
+    users = counter_table()
+    assert [user.uptime for user in users] == ["1h", "", "2m", "1d"]
+    assert [user.upload for user in users] == ["300", str(5 * 1024 ** 3), "", "100"]
+    assert users.columns["upload"].number(2) == MISSING
+
+def test_filter_range_skips_missing_values():
+    users = counter_table()
+    assert [user.name for user in users.filter_range("upload", minimum=100)] == ["a", "b", "d"]
+    assert [user.name for user in users.filter_range("upload", maximum=300)] == ["a", "d"]
+    assert [user.name for user in users.filter_range("uptime", 60, 3600)] == ["a", "c"]
+    # Filtering a sorted view keeps its order
+    assert [user.name for user in users.sort("upload").filter_range("upload", minimum=0)] == ["d", "a", "b"]
+
+def test_total_counts_missing_as_zero():
+    users = counter_table()
+    assert users.total("upload") == 400 + 5 * 1024 ** 3
+    assert users.filter("name", lambda name: name in ("c", "d")).total("upload") == 100
+    assert UserTable().total("upload") == 0
+
+def test_extend_matches_append():
+    rows = [user_values(name="a", uptime="1h2m", upload="10", profile="p1", disabled="true"),
+            user_values(name="b", uptime="45s", upload="1KiB", profile="p2"),
+            user_values(name="c", uptime="", upload="", profile="p1", comment="x y")]
+    appended = UserTable()
+    for values in rows:
+        appended.append(values)
+    extended = UserTable()
+    extended.extend(rows[:1])
+    extended.extend(rows[1:])
+    assert [user.values() for user in extended] == [user.values() for user in appended]
+    assert extended.columns["profile"].values == ["p1", "p2"]
@@ -0,0 +1,92 @@
+import asyncio
+import concurrent.futures
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mikrotik_scheduler import RequestScheduler, RouterLimits
+from mikrotik_async import AsyncRequestScheduler
+
+TIMEOUT = 5
+
+def submit_within(scheduler, timeout, *args, **kwargs):
+    """Call scheduler.submit on another thread and fail if it does not return in time"""
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(future=scheduler.submit(*args, **kwargs)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "submit() did not return (deadlock)"
+    return result["future"]
+
+def test_cancelling_a_queued_request_does_not_deadlock():
+    scheduler = RequestScheduler(max_workers=1, limits=RouterLimits(max_per_router=1))
+    release = threading.Event()
+    try:
+        # Occupies the only worker so the next searches stay queued
+        busy = scheduler.submit("r", "busy", lambda cancelled: release.wait(TIMEOUT))
+        futures = [submit_within(scheduler, TIMEOUT, "r", f"search {i}", lambda cancelled: i, group="search")
+                   for i in range(10)]
+        release.set()
+
+        assert busy.result(TIMEOUT)
+        assert all(future.cancelled() for future in futures[:-1])
+        assert futures[-1].result(TIMEOUT) == 9
+    finally:
+        release.set()
+        scheduler.shutdown()
+
+def test_request_finishing_before_submit_returns_is_forgotten():
+    scheduler = RequestScheduler(limits=RouterLimits())
+    try:
+        for i in range(20):
+            future = submit_within(scheduler, TIMEOUT, "r", "fast", lambda cancelled: "done", group="search")
+            assert future.result(TIMEOUT) == "done"
+        concurrent.futures.wait([future], TIMEOUT)
+        with scheduler.lock:
+            assert all(request.future.done() for request in scheduler.inflight.values())
+    finally:
+        scheduler.shutdown()
+
+def test_background_work_leaves_a_slot_for_searches():
+    limits = RouterLimits(max_per_router=2)
+    with limits.slot("r", background=True):
+        second = threading.Event()
+
+        def background():
+            with limits.slot("r", background=True):
+                second.set()
+
+        thread = threading.Thread(target=background, daemon=True)
+        thread.start()
+        # Only one background command per router; a search still gets the other slot
+        assert not second.wait(0.2)
+        with limits.slot("r"):
+            pass
+    assert second.wait(TIMEOUT)
+    thread.join(TIMEOUT)
+
+def test_async_scheduler_waits_for_slots_held_by_threads():
+    limits = RouterLimits(max_per_router=1)
+    scheduler = AsyncRequestScheduler(limits=limits, poll_interval=0.01)
+    release = threading.Event()
+    held = threading.Event()
+
+    def sync():
+        with limits.slot("r", background=True):
+            held.set()
+            release.wait(TIMEOUT)
+
+    async def search():
+        task = scheduler.submit("r", "search", lambda: asyncio.sleep(0, "done"))
+        await asyncio.sleep(0.1)
+        assert not task.done()
+        release.set()
+        return await asyncio.wait_for(task, TIMEOUT)
+
+    thread = threading.Thread(target=sync, daemon=True)
+    thread.start()
+    assert held.wait(TIMEOUT)
+    assert asyncio.run(search()) == "done"
+    thread.join(TIMEOUT)
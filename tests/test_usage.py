@@ -0,0 +1,45 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from usage_store import UsageSampler
+
+class FakeClient:
+    host = "fake-router"
+    disconnected = 0
+
+    def disconnect(self):
+        FakeClient.disconnected += 1
+
+# Syncer whose mirror only holds the hotspot listing
+class FakeSyncer:
+    def __init__(self):
+        self.started = []
+        self.event = threading.Event()
+
+    def synced(self, router, kind):
+        return kind == "hotspot"
+
+    def start(self, client, kind, force=False, disconnect=False):
+        self.started.append(kind)
+        self.event.set()
+        return True
+
+def test_sample_skips_listings_never_mirrored():
+    syncer = FakeSyncer()
+    FakeClient.disconnected = 0
+    UsageSampler(syncer, FakeClient).sample()
+    assert syncer.started == ["hotspot"]
+    assert FakeClient.disconnected == 1
+
+def test_first_sample_waits_one_interval():
+    syncer = FakeSyncer()
+    sampler = UsageSampler(syncer, FakeClient, interval=0.2)
+    sampler.start()
+    try:
+        assert not syncer.event.wait(0.1)
+        assert syncer.event.wait(5)
+    finally:
+        sampler.stop()
@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uma_db import UMA_DB
+import vouchers
+
+def voucher_db(tmp_path, accounts):
+    db = UMA_DB(str(tmp_path / "uma.db"))
+    with db.pool.connection() as conn:
+        conn.execute("INSERT INTO print_POS (p_accounte, p_days, p_profile) VALUES (?, '1', 'p1')", (accounts,))
+        conn.commit()
+    return db
+
+def statuses(db):
+    with db.pool.connection() as conn:
+        return dict(conn.execute("SELECT r_code, r_status FROM ready_code_POS"))
+
+# Router that rejects some names and records what it was asked to add
+class FakeClient:
+    def __init__(self, rejected=()):
+        self.rejected = set(rejected)
+        self.added = []
+
+    def add_hotspot_users(self, users):
+        results = [user["name"] not in self.rejected for user in users]
+        self.added.extend(user["name"] for user, ok in zip(users, results) if ok)
+        return results
+
+def test_push_marks_only_the_codes_the_router_added(tmp_path):
+    db = voucher_db(tmp_path, "5")
+    template, codes = db.create_vouchers(1)
+    assert len(codes) == 5
+    client = FakeClient(rejected=codes[1:3])
+    with db.pool.connection() as conn:
+        assert vouchers.push_vouchers(conn, client, template, codes, chunk_size=2) == 3
+    assert statuses(db) == {code: "new" if code in codes[1:3] else "pushed" for code in codes}
+    db.close()
+
+def test_push_stops_when_a_whole_chunk_fails(tmp_path):
+    db = voucher_db(tmp_path, "4")
+    template, codes = db.create_vouchers(1)
+    client = FakeClient(rejected=codes[:2])
+    with db.pool.connection() as conn:
+        assert vouchers.push_vouchers(conn, client, template, codes, chunk_size=2) == 0
+    assert client.added == []
+    db.close()
+
+def test_invalid_number_of_accounts_creates_nothing(tmp_path):
+    db = voucher_db(tmp_path, "ten")
+    template, codes = db.create_vouchers(1)
+    assert template["accounts"] == "ten"
+    assert codes == []
+    assert statuses(db) == {}
+    assert db.create_vouchers(1, count=2)[1] != []
+    db.close()
+
+def test_empty_number_of_accounts_means_none():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE print_POS (p_no INTEGER PRIMARY KEY, p_accounte, p_days, p_houer, p_price, p_defuser, p_profile, p_printin)")
+    conn.execute("CREATE TABLE ready_code_POS (r_no INTEGER PRIMARY KEY, r_code, r_comdate, r_getdate, r_status)")
+    conn.execute("INSERT INTO print_POS (p_no, p_accounte) VALUES (1, '')")
+    assert vouchers.create_vouchers(conn, 1)[1] == []
+    assert vouchers.create_vouchers(conn, 2) == (None, [])
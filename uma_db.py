@@ -0,0 +1,282 @@
+import threading
+from sqlite_pool import SQLiteConnectionPool
+import users_cache
+import usage_store
+import vouchers
+
+# Database class for handling SQLite operations
+class UMA_DB:
+    def __init__(self, db_path="uma_database.db"):
+        self.db_path = db_path
+        self.pool = SQLiteConnectionPool(db_path)
+        # In-memory copy of main settings, None until first read or after a save
+        self.settings = None
+        self.settings_lock = threading.Lock()
+        self.init_db()
+        self.users_sync = users_cache.UsersCacheSyncer(self.pool, on_listing=usage_store.record_usage)
+        self.search_index = users_cache.UserSearchIndex()
+
+    def init_db(self):
+        """Initialize the database with required tables"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+
+            # Create main_POS table
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS main_POS (
+                m_no INTEGER PRIMARY KEY AUTOINCREMENT,
+                m_name TEXT,
+                mvalue1 TEXT,
+                mvalue2 TEXT,
+                mvalue3 TEXT,
+                mvalue4 TEXT,
+                mvalue5 TEXT,
+                mvalue6 TEXT,
+                mvalue7 TEXT,
+                mvalue8 TEXT
+            )
+            """)
+
+            # Create help_POS table
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS help_POS (
+                h_no INTEGER PRIMARY KEY AUTOINCREMENT,
+                h_name TEXT,
+                hvalue1 TEXT,
+                hvalue2 TEXT,
+                hvalue3 TEXT,
+                hvalue4 TEXT,
+                hvalue5 TEXT,
+                hvalue6 TEXT,
+                hvalue7 TEXT,
+                hvalue8 TEXT
+            )
+            """)
+
+            # Create print_POS table
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS print_POS (
+                p_no INTEGER PRIMARY KEY AUTOINCREMENT,
+                p_accounte TEXT,
+                p_days TEXT,
+                p_houer TEXT,
+                p_price TEXT,
+                p_defuser TEXT,
+                p_profile TEXT,
+                p_printin TEXT
+            )
+            """)
+
+            # Create ready_code_POS table
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ready_code_POS (
+                r_no INTEGER PRIMARY KEY AUTOINCREMENT,
+                r_code TEXT,
+                r_comdate TEXT,
+                r_getdate TEXT,
+                r_status TEXT,
+                r_buttom TEXT
+            )
+            """)
+
+            # Create users_cache tables (local mirror of router users)
+            users_cache.init_users_cache(cursor)
+
+            # Create usage tables (byte counter samples and rollups)
+            usage_store.init_usage_store(cursor)
+
+            conn.commit()
+
+    def close(self):
+        """Close pooled database connections"""
+        self.pool.close_all()
+
+    def get_help_value(self, h_no, h_value):
+        """Get help value from database"""
+        column_map = {
+            1: "hvalue1",
+            2: "hvalue2",
+            3: "hvalue3",
+            4: "hvalue4",
+            5: "hvalue5",
+            6: "hvalue6",
+            7: "hvalue7",
+            8: "hvalue8"
+        }
+
+        column = column_map.get(h_value, "hvalue1")
+
+        with self.pool.connection() as conn:
+            result = conn.execute(f"SELECT {column} FROM help_POS WHERE h_no = ?", (h_no,)).fetchone()
+
+        if result:
+            return result[0]
+        return ""
+
+    def get_help_value_main(self, m_no, m_value):
+        """Get main value from database"""
+        column_map = {
+            1: "mvalue1",
+            2: "mvalue2",
+            3: "mvalue3",
+            4: "mvalue4",
+            5: "mvalue5",
+            6: "mvalue6",
+            7: "mvalue7",
+            8: "mvalue8"
+        }
+
+        column = column_map.get(m_value, "mvalue1")
+
+        with self.pool.connection() as conn:
+            result = conn.execute(f"SELECT {column} FROM main_POS WHERE m_no = ?", (m_no,)).fetchone()
+
+        if result:
+            return result[0]
+        return ""
+
+    def save_main_settings(self, ip, username, password, connection_type, port=22):
+        """Save main settings to database"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+
+            # Check if record exists
+            cursor.execute("SELECT 1 FROM main_POS WHERE m_no = 1")
+            exists = cursor.fetchone()
+
+            if exists:
+                # Update existing record
+                cursor.execute("""
+                UPDATE main_POS SET
+                    mvalue1 = ?, mvalue2 = ?, mvalue3 = ?, mvalue4 = ?, mvalue5 = ?
+                WHERE m_no = 1
+                """, (ip, username, password, connection_type, str(port)))
+            else:
+                # Insert new record
+                cursor.execute("""
+                INSERT INTO main_POS (m_name, mvalue1, mvalue2, mvalue3, mvalue4, mvalue5)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """, ("settings", ip, username, password, connection_type, str(port)))
+
+            conn.commit()
+
+        # Next read reloads the snapshot
+        with self.settings_lock:
+            self.settings = None
+
+    def get_main_settings(self):
+        """Get main settings (served from memory after the first read)"""
+        with self.settings_lock:
+            if self.settings is None:
+                self.settings = self.load_main_settings()
+            return dict(self.settings)
+
+    def load_main_settings(self):
+        """Read main settings from database"""
+        with self.pool.connection() as conn:
+            result = conn.execute("SELECT mvalue1, mvalue2, mvalue3, mvalue4, mvalue5 FROM main_POS WHERE m_no = 1").fetchone()
+
+        if result:
+            return {
+                "ip": result[0],
+                "username": result[1],
+                "password": result[2],
+                "connection_type": result[3],
+                "port": int(result[4]) if result[4] else 22
+            }
+        return {
+            "ip": "",
+            "username": "",
+            "password": "",
+            "connection_type": "ssh",
+            "port": 22
+        }
+
+    def get_router_profiles(self):
+        """Get every saved router, the main settings router first"""
+        with self.pool.connection() as conn:
+            rows = conn.execute("""
+            SELECT m_no, m_name, mvalue1, mvalue2, mvalue3, mvalue4, mvalue5, mvalue6 FROM main_POS
+            WHERE m_name IN ('settings', 'router') AND mvalue1 != ''
+            ORDER BY m_no
+            """).fetchall()
+
+        profiles = []
+        seen = set()
+        for row in rows:
+            port = int(row[6]) if row[6] else 22
+            # The main settings router may also be saved as a profile
+            if (row[2], port) in seen:
+                continue
+            seen.add((row[2], port))
+            profiles.append({
+                "no": row[0],
+                "name": row[7] or row[2],
+                "ip": row[2],
+                "username": row[3],
+                "password": row[4],
+                "connection_type": row[5] or "ssh",
+                "port": port
+            })
+        return profiles
+
+    def save_router_profile(self, name, ip, username, password, connection_type, port=22):
+        """Add a router profile, or update the one with the same IP and port"""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT m_no FROM main_POS WHERE m_name = 'router' AND mvalue1 = ? AND mvalue5 = ?", (ip, str(port)))
+            exists = cursor.fetchone()
+
+            if exists:
+                cursor.execute("""
+                UPDATE main_POS SET
+                    mvalue2 = ?, mvalue3 = ?, mvalue4 = ?, mvalue6 = ?
+                WHERE m_no = ?
+                """, (username, password, connection_type, name, exists[0]))
+            else:
+                cursor.execute("""
+                INSERT INTO main_POS (m_name, mvalue1, mvalue2, mvalue3, mvalue4, mvalue5, mvalue6)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, ("router", ip, username, password, connection_type, str(port), name))
+
+            conn.commit()
+
+    def delete_router_profile(self, m_no):
+        """Delete a router profile (the main settings row is kept)"""
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM main_POS WHERE m_no = ? AND m_name = 'router'", (m_no,))
+            conn.commit()
+
+    def search_users_cache(self, router, kind, search_term=None, partial=False):
+        """Search users in the local mirror (None if the router was never synced)"""
+        with self.pool.connection() as conn:
+            return users_cache.search_users_cache(conn, router, kind, search_term, partial)
+
+    def typeahead_users(self, router, kind, search_term, limit=50):
+        """Prefix then substring matches from the local mirror (None if never synced)"""
+        with self.pool.connection() as conn:
+            return self.search_index.search(conn, router, kind, search_term, limit)
+
+    def create_vouchers(self, p_no, count=None):
+        """Generate a batch of voucher codes from a print_POS template"""
+        with self.pool.connection() as conn:
+            return vouchers.create_vouchers(conn, p_no, count)
+
+    def push_vouchers(self, client, template, codes):
+        """Add generated vouchers to the router and mark them pushed"""
+        with self.pool.connection() as conn:
+            return vouchers.push_vouchers(conn, client, template, codes)
+
+    def import_vouchers(self, client, template, codes, progress=None):
+        """Add a large voucher batch through one .rsc upload (SSH only)"""
+        with self.pool.connection() as conn:
+            return vouchers.import_vouchers(conn, client, template, codes, progress)
+
+    def sync_users_cache(self, client, kind, force=False, disconnect=False):
+        """Refresh the local users mirror from the router in the background"""
+        return self.users_sync.start(client, kind, force, disconnect)
+
+    def top_consumers(self, router, kind, days=30, limit=10):
+        """Users with the most bytes used over the last days"""
+        with self.pool.connection() as conn:
+            return usage_store.top_consumers(conn, router, kind, days, limit)
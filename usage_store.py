@@ -0,0 +1,232 @@
+import threading
+import time
+from mikrotik_logging import get_logger
+from mikrotik_records import MISSING
+
+# Byte counter fields of each listing type: (upload, download) as seen by the user
+COUNTER_FIELDS = {
+    "hotspot": ("bytes_in", "bytes_out"),
+    "userman": ("upload", "download")
+}
+
+# Rollup tables: hourly buckets, and daily buckets starting at local midnight
+HOURLY = "usage_hourly"
+DAILY = "usage_daily"
+
+# How long each resolution is kept, in seconds
+RAW_RETENTION = 2 * 86400
+HOURLY_RETENTION = 35 * 86400
+DAILY_RETENTION = 400 * 86400
+
+# Seconds between two forced full listings of the sampler
+SAMPLE_INTERVAL = 900
+
+logger = get_logger("usage")
+
+def init_usage_store(cursor):
+    """Create the usage samples and their hourly and daily rollups"""
+    # Append-only: one row per user whose counters moved since the previous sample
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS usage_samples (
+        us_no INTEGER PRIMARY KEY AUTOINCREMENT,
+        us_router TEXT,
+        us_type TEXT,
+        us_user TEXT,
+        us_time REAL,
+        us_upload INTEGER,
+        us_download INTEGER
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS usage_samples_time ON usage_samples (us_time)")
+
+    # Last counter values per user, to turn the next sample into bytes used
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS usage_last (
+        ul_router TEXT,
+        ul_type TEXT,
+        ul_user TEXT,
+        ul_upload INTEGER,
+        ul_download INTEGER,
+        ul_changed REAL,
+        PRIMARY KEY (ul_router, ul_type, ul_user)
+    ) WITHOUT ROWID
+    """)
+
+    # Bytes used per user and bucket
+    for table in (HOURLY, DAILY):
+        cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            b_router TEXT,
+            b_type TEXT,
+            b_start INTEGER,
+            b_user TEXT,
+            b_upload INTEGER,
+            b_download INTEGER,
+            PRIMARY KEY (b_router, b_type, b_start, b_user)
+        ) WITHOUT ROWID
+        """)
+
+def hour_start(timestamp):
+    """Start of the hour holding timestamp"""
+    return int(timestamp) // 3600 * 3600
+
+def day_start(timestamp):
+    """Local midnight of the day holding timestamp"""
+    return int(time.mktime(time.localtime(timestamp)[:3] + (0, 0, 0, 0, 0, -1)))
+
+def counter_delta(previous, current):
+    """Bytes used between two readings of a counter that may have been reset"""
+    if current >= previous:
+        return current - previous
+    # Reset (reset-counters, router reboot): everything counted since then is new
+    return current
+
+def record_usage(conn, router, kind, users, now=None):
+    """Sample the byte counters of a full user listing and fold the usage into the rollups
+
+    users is a UserTable; the first sample of a user only sets its baseline.
+    Returns the number of users whose counters moved.
+    """
+    fields = COUNTER_FIELDS.get(kind)
+    if fields is None or not len(users):
+        return 0
+    now = time.time() if now is None else now
+    names = users.columns["name"]
+    # Counters were parsed to integers when the listing was read
+    uploads = users.columns[fields[0]].numbers
+    downloads = users.columns[fields[1]].numbers
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT ul_user, ul_upload, ul_download FROM usage_last WHERE ul_router = ? AND ul_type = ?",
+                   (router, kind))
+    last = {user: (upload, download) for user, upload, download in cursor}
+
+    samples = []
+    used = []
+    for row in users.rows():
+        upload = uploads[row]
+        download = downloads[row]
+        if upload == MISSING or download == MISSING:
+            continue
+        name = names[row]
+        previous = last.get(name)
+        if previous == (upload, download):
+            continue
+        samples.append((router, kind, name, now, upload, download))
+        if previous is not None:
+            used.append((counter_delta(previous[0], upload), counter_delta(previous[1], download), name))
+
+    if samples:
+        cursor.executemany("""
+        INSERT INTO usage_samples (us_router, us_type, us_user, us_time, us_upload, us_download)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, samples)
+        cursor.executemany("""
+        INSERT INTO usage_last (ul_router, ul_type, ul_user, ul_changed, ul_upload, ul_download)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (ul_router, ul_type, ul_user) DO UPDATE SET
+            ul_upload = excluded.ul_upload, ul_download = excluded.ul_download, ul_changed = excluded.ul_changed
+        """, samples)
+    if used:
+        # Rolled up as samples arrive, so reports never scan raw samples
+        for table, start in ((HOURLY, hour_start(now)), (DAILY, day_start(now))):
+            cursor.executemany(f"""
+            INSERT INTO {table} (b_router, b_type, b_start, b_upload, b_download, b_user)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (b_router, b_type, b_start, b_user) DO UPDATE SET
+                b_upload = b_upload + excluded.b_upload, b_download = b_download + excluded.b_download
+            """, [(router, kind, start) + values for values in used])
+    prune_usage(cursor, now)
+    conn.commit()
+    logger.debug("Usage sample (%s, %s): %d changed, %d with usage", router, kind, len(samples), len(used))
+    return len(samples)
+
+def prune_usage(cursor, now):
+    """Drop samples and buckets past their retention"""
+    cursor.execute("DELETE FROM usage_samples WHERE us_time < ?", (now - RAW_RETENTION,))
+    cursor.execute(f"DELETE FROM {HOURLY} WHERE b_start < ?", (now - HOURLY_RETENTION,))
+    cursor.execute(f"DELETE FROM {DAILY} WHERE b_start < ?", (now - DAILY_RETENTION,))
+    # A user idle that long starts again from a fresh baseline
+    cursor.execute("DELETE FROM usage_last WHERE ul_changed < ?", (now - DAILY_RETENTION,))
+
+def top_consumers(conn, router, kind, days=30, limit=10, now=None):
+    """Users with the most bytes used over the last days, from the daily rollup
+
+    Returns dicts with name, upload, download and total, largest first.
+    """
+    now = time.time() if now is None else now
+    cursor = conn.cursor()
+    cursor.execute(f"""
+    SELECT b_user, SUM(b_upload), SUM(b_download), SUM(b_upload + b_download) AS total
+    FROM {DAILY}
+    WHERE b_router = ? AND b_type = ? AND b_start >= ?
+    GROUP BY b_user
+    ORDER BY total DESC
+    LIMIT ?
+    """, (router, kind, day_start(now - (days - 1) * 86400), limit))
+    return [{"name": name, "upload": upload, "download": download, "total": total}
+            for name, upload, download, total in cursor]
+
+def format_listing_usage(users, kind):
+    """Upload + download of every user in a listing, in megabytes"""
+    fields = COUNTER_FIELDS.get(kind)
+    if fields is None:
+        return ""
+    total = users.total(fields[0]) + users.total(fields[1])
+    return f"{total / (1024 * 1024):.2f} ميجا"
+
+def format_top_consumers(consumers, width=20):
+    """Text bar chart of top_consumers() rows, in megabytes"""
+    if not consumers:
+        return "لا توجد بيانات استهلاك بعد"
+    largest = consumers[0]["total"] or 1
+    lines = []
+    for consumer in consumers:
+        bar = "█" * max(1, round(consumer["total"] / largest * width)) if consumer["total"] else ""
+        lines.append(f"{consumer['name']:<16} {bar} {consumer['total'] / (1024 * 1024):.2f} ميجا")
+    return "\n".join(lines)
+
+# Forces a full listing of every type at a fixed interval so usage is sampled without searches
+class UsageSampler:
+    def __init__(self, syncer, client_factory, kinds=("hotspot", "userman"), interval=SAMPLE_INTERVAL):
+        self.syncer = syncer
+        # client_factory() returns a new router client, or None when no router is set up
+        self.client_factory = client_factory
+        self.kinds = kinds
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start sampling in a background thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="usage-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop sampling after the current round"""
+        self.stopped.set()
+
+    def sample(self):
+        """Start one full sync per listing type the router has; the syncer records the usage
+
+        A type is sampled once a search has mirrored it, so a router without
+        User Manager is never asked for its users.
+        """
+        for kind in self.kinds:
+            client = self.client_factory()
+            if client is None:
+                return
+            if not self.syncer.synced(client.host, kind) or not self.syncer.start(client, kind, force=True, disconnect=True):
+                # Not mirrored yet, or a sync of this type is already running and will record the sample
+                client.disconnect()
+
+    def run(self):
+        # The first sample waits one interval, off the busy app launch
+        while not self.stopped.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error("Usage sampling failed: %s", e)
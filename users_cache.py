@@ -0,0 +1,294 @@
+import bisect
+import sqlite3
+import threading
+import time
+import zlib
+from mikrotik_records import UserTable, USER_FIELDS
+from mikrotik_logging import get_logger
+from mikrotik_scheduler import router_limits
+
+# users_cache column for every user field (u_name, u_profile, ...)
+CACHE_COLUMNS = tuple(f"u_{field}" for field in USER_FIELDS)
+NAME_INDEX = USER_FIELDS.index("name")
+ID_INDEX = USER_FIELDS.index("id")
+
+logger = get_logger("users_cache")
+
+def init_users_cache(cursor):
+    """Create the local mirror of router users"""
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS users_cache (
+        u_no INTEGER PRIMARY KEY AUTOINCREMENT,
+        u_router TEXT,
+        u_type TEXT,
+        u_key TEXT,
+        {", ".join(f"{column} TEXT" for column in CACHE_COLUMNS)},
+        u_hash INTEGER,
+        u_synced REAL
+    )
+    """)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS users_cache_key ON users_cache (u_router, u_type, u_key)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS users_cache_name ON users_cache (u_router, u_type, u_name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS users_cache_profile ON users_cache (u_router, u_type, u_profile)")
+
+    # Trigram full-text index over user names for substring search
+    try:
+        cursor.execute("SELECT name FROM sqlite_master WHERE name = 'users_cache_fts'")
+        if not cursor.fetchone():
+            cursor.execute("""
+            CREATE VIRTUAL TABLE users_cache_fts USING fts5(
+                u_name, content='users_cache', content_rowid='u_no', tokenize='trigram'
+            )
+            """)
+            cursor.execute("INSERT INTO users_cache_fts (users_cache_fts) VALUES ('rebuild')")
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_cache_fts_insert AFTER INSERT ON users_cache BEGIN
+            INSERT INTO users_cache_fts (rowid, u_name) VALUES (new.u_no, new.u_name);
+        END
+        """)
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_cache_fts_delete AFTER DELETE ON users_cache BEGIN
+            INSERT INTO users_cache_fts (users_cache_fts, rowid, u_name) VALUES ('delete', old.u_no, old.u_name);
+        END
+        """)
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_cache_fts_update AFTER UPDATE OF u_name ON users_cache BEGIN
+            INSERT INTO users_cache_fts (users_cache_fts, rowid, u_name) VALUES ('delete', old.u_no, old.u_name);
+            INSERT INTO users_cache_fts (rowid, u_name) VALUES (new.u_no, new.u_name);
+        END
+        """)
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5/trigram: substring search falls back to LIKE
+        logger.warning("Full-text index unavailable: %s", e)
+
+    # One row per (router, type) that has completed a full sync
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS users_cache_sync (
+        s_router TEXT,
+        s_type TEXT,
+        s_synced REAL,
+        s_count INTEGER,
+        PRIMARY KEY (s_router, s_type)
+    )
+    """)
+
+def row_digest(values):
+    """Cheap fingerprint of a user row used for change detection"""
+    return zlib.crc32("\x1f".join(values).encode("utf-8"))
+
+def sync_users_cache(conn, router, kind, rows):
+    """Mirror a full user listing, writing only new or changed rows
+
+    rows are UserRow views of a complete (unfiltered) listing. Rows are keyed
+    by RouterOS .id when the transport reports it, otherwise by name.
+    Returns (changed, removed).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT u_key, u_hash FROM users_cache WHERE u_router = ? AND u_type = ?", (router, kind))
+    known = dict(cursor.fetchall())
+
+    now = time.time()
+    seen = set()
+    changed = []
+    for row in rows:
+        values = row.values()
+        key = values[ID_INDEX] or values[NAME_INDEX]
+        seen.add(key)
+        digest = row_digest(values)
+        if known.get(key) != digest:
+            changed.append((router, kind, key) + values + (digest, now))
+
+    removed = [(router, kind, key) for key in known.keys() - seen]
+
+    # Upsert keeps u_no stable, so the full-text index only sees real changes
+    placeholders = ", ".join("?" * (len(CACHE_COLUMNS) + 5))
+    updates = ", ".join(f"{column} = excluded.{column}" for column in CACHE_COLUMNS + ("u_hash", "u_synced"))
+    cursor.executemany(f"""
+    INSERT INTO users_cache (u_router, u_type, u_key, {", ".join(CACHE_COLUMNS)}, u_hash, u_synced)
+    VALUES ({placeholders})
+    ON CONFLICT (u_router, u_type, u_key) DO UPDATE SET {updates}
+    """, changed)
+    cursor.executemany("DELETE FROM users_cache WHERE u_router = ? AND u_type = ? AND u_key = ?", removed)
+    cursor.execute("INSERT OR REPLACE INTO users_cache_sync (s_router, s_type, s_synced, s_count) VALUES (?, ?, ?, ?)",
+                   (router, kind, now, len(seen)))
+    conn.commit()
+    return len(changed), len(removed)
+
+def last_users_sync(conn, router, kind):
+    """Time of the last full sync, or None if this router was never synced"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT s_synced FROM users_cache_sync WHERE s_router = ? AND s_type = ?", (router, kind))
+    result = cursor.fetchone()
+    return result[0] if result else None
+
+def search_users_cache(conn, router, kind, search_term=None, partial=False):
+    """Answer a user search from the local mirror as a UserTable
+
+    Returns None when the router has never been synced, so callers can fall
+    back to asking the router.
+    """
+    if last_users_sync(conn, router, kind) is None:
+        return None
+
+    query = f"SELECT {', '.join(CACHE_COLUMNS)} FROM users_cache WHERE u_router = ? AND u_type = ?"
+    params = [router, kind]
+    if search_term:
+        if partial and len(search_term) >= 3 and has_fts(conn):
+            query += " AND u_no IN (SELECT rowid FROM users_cache_fts WHERE users_cache_fts MATCH ?)"
+            params.append(fts_phrase(search_term))
+        elif partial:
+            query += " AND u_name LIKE ? ESCAPE '\\'"
+            params.append(f"%{escape_like(search_term)}%")
+        else:
+            query += " AND u_name = ?"
+            params.append(search_term)
+
+    users = UserTable()
+    users.extend(conn.execute(query, params).fetchall())
+    return users
+
+def has_fts(conn):
+    """Check if the trigram full-text index exists in this database"""
+    cursor = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'users_cache_fts'")
+    return cursor.fetchone() is not None
+
+def fts_phrase(search_term):
+    """Quote a search term as an FTS5 phrase"""
+    return '"' + search_term.replace('"', '""') + '"'
+
+def escape_like(search_term):
+    """Escape LIKE wildcards in a search term"""
+    return search_term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def fetch_users_by_number(conn, numbers):
+    """Load cached users by u_no, keeping the order of numbers"""
+    users = UserTable()
+    if not numbers:
+        return users
+    placeholders = ", ".join("?" * len(numbers))
+    cursor = conn.execute(f"SELECT u_no, {', '.join(CACHE_COLUMNS)} FROM users_cache WHERE u_no IN ({placeholders})", numbers)
+    found = {row[0]: row[1:] for row in cursor}
+    for number in numbers:
+        if number in found:
+            users.append(found[number])
+    return users
+
+# Type-ahead index: per router a sorted array of case-folded names for prefix
+# lookups with bisect, topped up with substring hits from the FTS5 table
+class UserSearchIndex:
+    def __init__(self):
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def load(self, conn, router, kind):
+        """Get the (names, numbers) arrays for a router, rebuilding them after a sync"""
+        synced = last_users_sync(conn, router, kind)
+        if synced is None:
+            return None
+
+        key = (router, kind)
+        with self.lock:
+            entry = self.indexes.get(key)
+            if entry and entry[0] == synced:
+                return entry[1], entry[2]
+
+        cursor = conn.execute("SELECT u_name, u_no FROM users_cache WHERE u_router = ? AND u_type = ?", (router, kind))
+        pairs = sorted((name.casefold(), number) for name, number in cursor)
+        names = [name for name, _ in pairs]
+        numbers = [number for _, number in pairs]
+        with self.lock:
+            self.indexes[key] = (synced, names, numbers)
+        return names, numbers
+
+    def search(self, conn, router, kind, search_term, limit=50):
+        """Users whose name starts with, then contains, search_term (None if never synced)"""
+        index = self.load(conn, router, kind)
+        if index is None:
+            return None
+        names, numbers = index
+
+        # Prefix matches: one contiguous run in the sorted array
+        folded = search_term.casefold()
+        start = bisect.bisect_left(names, folded)
+        matches = []
+        i = start
+        while i < len(names) and len(matches) < limit and names[i].startswith(folded):
+            matches.append(numbers[i])
+            i += 1
+
+        # Substring matches fill the remaining slots
+        if len(matches) < limit and len(search_term) >= 3 and has_fts(conn):
+            cursor = conn.execute("""
+            SELECT u_no FROM users_cache
+            WHERE u_no IN (SELECT rowid FROM users_cache_fts WHERE users_cache_fts MATCH ?)
+            AND u_router = ? AND u_type = ?
+            LIMIT ?
+            """, (fts_phrase(search_term), router, kind, limit + len(matches)))
+            seen = set(matches)
+            for (number,) in cursor:
+                if number not in seen and len(matches) < limit:
+                    matches.append(number)
+
+        return fetch_users_by_number(conn, matches)
+
+# Runs full user syncs in background threads, one at a time per router and type
+class UsersCacheSyncer:
+    def __init__(self, pool, min_interval=60, on_listing=None, limits=None):
+        self.pool = pool
+        self.min_interval = min_interval
+        # on_listing(conn, router, kind, users) also gets every complete listing (e.g. usage sampling)
+        self.on_listing = on_listing
+        self.limits = router_limits if limits is None else limits
+        self.running = set()
+        self.lock = threading.Lock()
+
+    def start(self, client, kind, force=False, disconnect=False):
+        """Start a background sync unless one is running or the last one is recent"""
+        key = (client.host, kind)
+        with self.lock:
+            if key in self.running:
+                return False
+            self.running.add(key)
+
+        thread = threading.Thread(target=self.run, args=(client, kind, force, disconnect), daemon=True)
+        thread.start()
+        return True
+
+    def synced(self, router, kind):
+        """Whether a full listing of this type was ever mirrored from the router"""
+        with self.pool.connection() as conn:
+            return last_users_sync(conn, router, kind) is not None
+
+    def run(self, client, kind, force, disconnect):
+        """Fetch the full listing from the router and mirror it"""
+        conn = self.pool.acquire()
+        try:
+            synced = last_users_sync(conn, client.host, kind)
+            if not force and synced and time.time() - synced < self.min_interval:
+                return
+
+            users = UserTable()
+            # A background command: waits for a free slot and leaves one for searches
+            with self.limits.slot(client.host, background=True):
+                if kind == "hotspot":
+                    rows = client.iter_hotspot_users(None, users)
+                else:
+                    rows = client.iter_user_manager_users(None, users)
+                for _ in rows:
+                    pass
+
+            # Never mirror a listing that was cut short; it would delete users
+            if getattr(client, "last_error", None):
+                raise RuntimeError(client.last_error)
+            changed, removed = sync_users_cache(conn, client.host, kind, users)
+            logger.info("Users cache sync (%s, %s): %d changed, %d removed", client.host, kind, changed, removed)
+            if self.on_listing:
+                self.on_listing(conn, client.host, kind, users)
+        except Exception as e:
+            logger.error("Users cache sync error: %s", e)
+        finally:
+            self.pool.release(conn)
+            if disconnect:
+                client.disconnect()
+            with self.lock:
+                self.running.discard((client.host, kind))
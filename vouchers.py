@@ -0,0 +1,126 @@
+import secrets
+import time
+from mikrotik_logging import get_logger
+import mikrotik_rsc
+
+# Codes are read off printed cards: no 0/o, 1/l/i look-alikes
+VOUCHER_ALPHABET = "23456789abcdefghjkmnpqrstuvwxyz"
+
+logger = get_logger("vouchers")
+
+def load_voucher_template(conn, p_no):
+    """Read one print_POS row as a dict, or None if it does not exist"""
+    result = conn.execute("""
+    SELECT p_accounte, p_days, p_houer, p_price, p_defuser, p_profile, p_printin
+    FROM print_POS WHERE p_no = ?
+    """, (p_no,)).fetchone()
+    if not result:
+        return None
+    return {
+        "no": p_no,
+        "accounts": result[0] or "",
+        "days": result[1] or "",
+        "hours": result[2] or "",
+        "price": result[3] or "",
+        "prefix": result[4] or "",
+        "profile": result[5] or "default",
+        "printin": result[6] or ""
+    }
+
+def limit_uptime(days, hours):
+    """RouterOS limit-uptime (e.g. 3d12h) from the template's days and hours"""
+    try:
+        days = int(days or 0)
+        hours = int(hours or 0)
+    except ValueError:
+        return ""
+    text = ""
+    if days:
+        text += f"{days}d"
+    if hours:
+        text += f"{hours}h"
+    return text
+
+def new_codes(count, existing, length=8, prefix=""):
+    """Generate count random codes that are not in existing (existing is updated)"""
+    codes = []
+    while len(codes) < count:
+        code = prefix + "".join(secrets.choice(VOUCHER_ALPHABET) for _ in range(length))
+        if code not in existing:
+            existing.add(code)
+            codes.append(code)
+    return codes
+
+def create_vouchers(conn, p_no, count=None, length=8):
+    """Generate a batch of unique codes from a print_POS template into ready_code_POS
+
+    count defaults to the template's number of accounts. Returns
+    (template, codes), or (None, []) if the template does not exist, or
+    (template, []) if its number of accounts is not a whole number.
+    """
+    template = load_voucher_template(conn, p_no)
+    if template is None:
+        return None, []
+    if count is None:
+        accounts = template["accounts"].strip() or "0"
+        if not accounts.isdecimal():
+            logger.warning("Voucher template %s has an invalid number of accounts: %r", p_no, template["accounts"])
+            return template, []
+        count = int(accounts)
+
+    existing = {code for (code,) in conn.execute("SELECT r_code FROM ready_code_POS")}
+    codes = new_codes(count, existing, length, template["prefix"])
+
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    conn.executemany("""
+    INSERT INTO ready_code_POS (r_code, r_comdate, r_getdate, r_status)
+    VALUES (?, ?, '', 'new')
+    """, [(code, now) for code in codes])
+    conn.commit()
+    return template, codes
+
+def voucher_users(template, codes):
+    """Hotspot user attributes (RouterOS key -> value) for each code"""
+    uptime = limit_uptime(template["days"], template["hours"])
+    comment = f"vc-{template['no']} {template['price']} {time.strftime('%Y-%m-%d')}".strip()
+    return [{
+        "name": code,
+        "password": code,
+        "profile": template["profile"],
+        "limit-uptime": uptime,
+        "comment": comment
+    } for code in codes]
+
+def push_vouchers(conn, client, template, codes, chunk_size=200):
+    """Add vouchers to the router in chunks and mark them pushed
+
+    Each chunk is a single script (SSH) or a pipelined batch (API) instead
+    of one command per user. Only the codes whose own command succeeded are
+    marked pushed; a chunk where none did stops the push. Returns the
+    number of codes pushed.
+    """
+    pushed = 0
+    for start in range(0, len(codes), chunk_size):
+        chunk = codes[start:start + chunk_size]
+        added = [code for code, ok in zip(chunk, client.add_hotspot_users(voucher_users(template, chunk))) if ok]
+        conn.executemany("UPDATE ready_code_POS SET r_status = 'pushed' WHERE r_code = ?",
+                         [(code,) for code in added])
+        conn.commit()
+        pushed += len(added)
+        if not added:
+            logger.warning("Voucher push stopped after %d of %d codes", pushed, len(codes))
+            break
+    return pushed
+
+def import_vouchers(conn, client, template, codes, progress=None):
+    """Add a large voucher batch with one SFTP upload and /import (SSH only)
+
+    Only the codes found on the router afterwards are marked pushed. Returns
+    the verification result of mikrotik_rsc.import_hotspot_users.
+    """
+    result = mikrotik_rsc.import_hotspot_users(client, voucher_users(template, codes), progress)
+    missing = set(result["missing"]) | set(result["mismatched"])
+    conn.executemany("UPDATE ready_code_POS SET r_status = 'pushed' WHERE r_code = ?",
+                     [(code,) for code in codes if code not in missing])
+    conn.commit()
+    return result